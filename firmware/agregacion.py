@@ -0,0 +1,97 @@
+"""
+agregacion.py
+Agregación en el nodo de las lecturas por ventanas de tiempo fijas
+(5 minutos por defecto) antes de subirlas.
+
+Cada variable mantiene solo contadores (algoritmo de Welford), así que la
+memoria por ventana es O(1) sin importar cuántas lecturas lleguen.
+"""
+
+import math
+
+
+class Estadistico:
+    """Media, mínimo, máximo y desviación estándar incrementales.
+
+    Con `logaritmico=True` (niveles en dB) la media se calcula en energía,
+    es decir, es el Leq de la ventana y no el promedio aritmético de dB.
+    """
+
+    def __init__(self, logaritmico=False):
+        self.logaritmico = logaritmico
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.n = 0
+        self._media = 0.0
+        self._m2 = 0.0
+        self._energia = 0.0
+        self.minimo = math.inf
+        self.maximo = -math.inf
+
+    def agregar(self, x):
+        if x is None: return
+        x = float(x)
+        self.n += 1
+        delta = x - self._media
+        self._media += delta / self.n
+        self._m2 += delta * (x - self._media)
+        if self.logaritmico:
+            self._energia += (10 ** (x / 10) - self._energia) / self.n
+        self.minimo = min(self.minimo, x)
+        self.maximo = max(self.maximo, x)
+
+    def resultado(self):
+        if not self.n:
+            return None
+        media = self._media
+        if self.logaritmico:
+            media = 10 * math.log10(self._energia) if self._energia > 0 else 0.0
+        return {
+            "mean": media,
+            "min": self.minimo,
+            "max": self.maximo,
+            "std": math.sqrt(self._m2 / (self.n - 1)) if self.n > 1 else 0.0,
+            "n": self.n,
+        }
+
+
+class AgregadorVentanas:
+    """Acumula lecturas en ventanas alineadas a múltiplos de `ventana_s`.
+
+    `agregar()` devuelve el resumen de la ventana anterior en cuanto llega la
+    primera lectura de la siguiente; en otro caso devuelve None.
+    """
+
+    def __init__(self, variables, ventana_s=300, logaritmicas=()):
+        self.ventana_s = ventana_s
+        self.estadisticos = {v: Estadistico(logaritmico=v in logaritmicas) for v in variables}
+        self._inicio = None
+
+    def agregar(self, ts, **valores):
+        inicio = math.floor(ts / self.ventana_s) * self.ventana_s
+        cerrada = None
+        if self._inicio is not None and inicio != self._inicio:
+            cerrada = self.cerrar()
+        if self._inicio is None:
+            self._inicio = inicio
+        for variable, valor in valores.items():
+            if variable in self.estadisticos:
+                self.estadisticos[variable].agregar(valor)
+        return cerrada
+
+    def cerrar(self):
+        """Cierra la ventana actual y devuelve su resumen (o None si está vacía)."""
+        if self._inicio is None:
+            return None
+        resumen = {
+            "inicio": self._inicio,
+            "fin": self._inicio + self.ventana_s,
+            "variables": {v: e.resultado() for v, e in self.estadisticos.items()},
+        }
+        for e in self.estadisticos.values():
+            e.reiniciar()
+        self._inicio = None
+        if not any(resumen["variables"].values()):
+            return None
+        return resumen
@@ -0,0 +1,496 @@
+"""
+drivers.py
+Capa de abstracción de hardware del nodo.
+
+El firmware solo habla con estas interfaces (por duck typing):
+
+- Sensor ambiente (AHT20): `medir() -> (temp, hum)`
+- Sensor de gas (ENS160): `dato_nuevo()`, `leer() -> {co2, tvoc, aqi}`,
+  `compensar(temp, hum)`
+- PIR: propiedad `motion_detected`
+- LEDs y buzzer: propiedades `value` (y `frequency` en el buzzer), `off()`
+- LCD: `cursor_pos`, `write_string()`, `clear()`, `close()`, `backlight_enabled`
+- Micrófono: `abrir(callback, rate, chunk, canales)`, `cerrar()`; el callback
+  recibe bloques int16 con la firma de PyAudio
+- Cliente de subida: `table(nombre).insert(filas).execute()` (Supabase,
+  `ClienteSimulado` o, con SKILIKET_BACKEND=local, `skiliket.local_backend`)
+
+`crear_hardware_real()` construye los drivers del Raspberry Pi (las librerías
+de hardware se importan solo ahí) y `crear_hardware_simulado()` construye
+drivers falsos que reproducen datos sintéticos o grabados, de modo que el
+firmware corre sin cablear nada y, con `Reloj(escala)`, en tiempo acelerado.
+"""
+
+import csv
+import math
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from ctypes import CFUNCTYPE, c_char_p, c_int, cdll
+from types import SimpleNamespace
+
+import numpy as np
+
+
+class Reloj:
+    """Reloj del firmware; con `escala` > 1 el tiempo simulado corre más rápido.
+
+    `time()` devuelve la hora (epoch) simulada y `periodo(s)` convierte una
+    duración simulada en segundos reales de espera.
+    """
+
+    def __init__(self, escala=1.0):
+        self.escala = float(escala)
+        self._t0 = time.time()
+        self._m0 = time.monotonic()
+
+    def time(self):
+        if self.escala == 1.0:
+            return time.time()
+        return self._t0 + (time.monotonic() - self._m0) * self.escala
+
+    def periodo(self, segundos):
+        return segundos / self.escala
+
+    def dormir(self, segundos):
+        time.sleep(self.periodo(segundos))
+
+
+def hardware_vacio():
+    return SimpleNamespace(aht=None, ens=None, pir=None, led_verde=None, led_amarillo=None,
+                           led_rojo=None, buzzer=None, lcd=None, microfono=None, cliente=None)
+
+
+# ==============================================================================
+# --- DRIVERS REALES (Raspberry Pi) ---
+# ==============================================================================
+
+ERROR_HANDLER_FUNC = CFUNCTYPE(None, c_char_p, c_int, c_char_p, c_int, c_char_p)
+def py_error_handler(filename, line, function, err, fmt):
+    pass
+c_error_handler = ERROR_HANDLER_FUNC(py_error_handler)
+
+@contextmanager
+def no_alsa_err():
+    """Silencia los mensajes de error de ALSA al abrir PyAudio."""
+    try:
+        asound = cdll.LoadLibrary('libasound.so.2')
+        asound.snd_lib_error_set_handler(c_error_handler)
+        yield
+        asound.snd_lib_error_set_handler(None)
+    except:
+        yield
+
+
+class AHT20:
+    def __init__(self, i2c):
+        import adafruit_ahtx0
+        self._dev = adafruit_ahtx0.AHTx0(i2c)
+
+    def medir(self):
+        if hasattr(self._dev, "_readdata"):
+            # Una medición para ambos valores (las propiedades miden cada una)
+            self._dev._readdata()
+            return self._dev._temp, self._dev._humidity
+        return self._dev.temperature, self._dev.relative_humidity
+
+
+class ENS160:
+    def __init__(self, i2c):
+        import adafruit_ens160
+        self._dev = adafruit_ens160.ENS160(i2c)
+        self._dev.reset()
+        time.sleep(0.5)
+        self._dev.mode = adafruit_ens160.MODE_STANDARD
+
+    def dato_nuevo(self):
+        return self._dev.new_data_available
+
+    def leer(self):
+        datos = self._dev.read_all_sensors()
+        return {"co2": datos["eCO2"], "tvoc": datos["TVOC"], "aqi": datos["AQI"]}
+
+    def compensar(self, temp, hum):
+        self._dev.temperature_compensation = temp
+        self._dev.humidity_compensation = hum
+
+
+class MicrofonoPyAudio:
+    """Micrófono USB vía PyAudio en modo callback."""
+
+    def __init__(self):
+        import pyaudio
+        self._pyaudio = pyaudio
+        with no_alsa_err():
+            self.audio = pyaudio.PyAudio()
+        self.dev_index = None
+        self.nombre = None
+        for i in range(self.audio.get_device_count()):
+            info = self.audio.get_device_info_by_index(i)
+            if "USB" in info.get('name', '') or "PnP" in info.get('name', ''):
+                self.dev_index = i
+                self.nombre = info['name']
+                break
+        self._stream = None
+
+    def abrir(self, callback, rate, chunk, canales):
+        with no_alsa_err():
+            self._stream = self.audio.open(format=self._pyaudio.paInt16, channels=canales,
+                                           rate=rate, input=True,
+                                           input_device_index=self.dev_index,
+                                           frames_per_buffer=chunk,
+                                           stream_callback=callback)
+        self._stream.start_stream()
+
+    def cerrar(self):
+        if self._stream:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+        self.audio.terminate()
+
+
+def cliente_local(**opciones):
+    """Cliente de `skiliket.local_backend` (SKILIKET_BACKEND=local)."""
+    # skiliket vive en la raíz del repositorio
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if raiz not in sys.path:
+        sys.path.append(raiz)
+    from skiliket.local_backend import client_from_env
+    cliente = client_from_env("public", **opciones)
+    print(f"[OK] Backend local ({cliente.path}).")
+    return cliente
+
+
+def crear_hardware_real(cfg):
+    """Inicializa el hardware del Raspberry Pi. `cfg` es el módulo de configuración."""
+    hw = hardware_vacio()
+
+    # A. Cliente Supabase
+    try:
+        if getattr(cfg, "BACKEND", "") == "local":
+            hw.cliente = cliente_local()
+        elif not cfg.SUPABASE_URL or not cfg.SUPABASE_KEY:
+            print("[ADVERTENCIA] Faltan SUPABASE_URL/KEY en .env (Modo Offline).")
+        else:
+            from supabase import create_client
+            from supabase.client import ClientOptions
+            # Inicializamos el cliente web estándar
+            hw.cliente = create_client(cfg.SUPABASE_URL, cfg.SUPABASE_KEY,
+                                       options=ClientOptions(schema="public"))
+            print("[OK] Cliente Supabase inicializado.")
+    except Exception as e:
+        print(f"[ERROR] Supabase Init: {e}")
+
+    # B. Bus I2C
+    import board
+    import busio
+    try:
+        i2c = busio.I2C(board.SCL, board.SDA)
+    except ValueError:
+        print("[ERROR FATAL] I2C no disponible.")
+        exit(1)
+
+    # C. Sensores I2C
+    try:
+        hw.aht = AHT20(i2c)
+        print("[OK] AHT20 listo.")
+    except: print("[ERROR] AHT20 no detectado.")
+
+    try:
+        hw.ens = ENS160(i2c)
+        print("[OK] ENS160 listo.")
+    except: print("[ERROR] ENS160 no detectado.")
+
+    # D. Pantalla LCD (RPLCD)
+    try:
+        from RPLCD.i2c import CharLCD
+        hw.lcd = CharLCD(i2c_expander='PCF8574', address=cfg.LCD_ADDRESS, port=cfg.LCD_PORT,
+                         cols=cfg.LCD_COLS, rows=cfg.LCD_ROWS, dotsize=8)
+        print(f"[OK] LCD lista en {hex(cfg.LCD_ADDRESS)} (RPLCD).")
+    except Exception as e:
+        print(f"[ERROR] LCD no detectada: {e}")
+
+    # E. Actuadores y Sensores GPIO
+    try:
+        from gpiozero import LED, PWMOutputDevice, MotionSensor
+        hw.led_verde = LED(cfg.PIN_LED_VERDE)
+        hw.led_amarillo = LED(cfg.PIN_LED_AMARILLO)
+        hw.led_rojo = LED(cfg.PIN_LED_ROJO)
+        hw.buzzer = PWMOutputDevice(cfg.PIN_BUZZER, initial_value=0.0)
+        hw.pir = MotionSensor(cfg.PIN_PIR, queue_len=1)
+        print(f"[OK] GPIO Configurado: LEDs(22-24), Buzzer(25), PIR({cfg.PIN_PIR}).")
+    except Exception as e:
+        print(f"[ERROR] GPIO: {e}")
+
+    # F. Audio
+    try:
+        hw.microfono = MicrofonoPyAudio()
+        if hw.microfono.nombre:
+            print(f"[OK] Micrófono USB detectado: {hw.microfono.nombre}")
+    except Exception as e:
+        print(f"[ERROR] Audio: {e}")
+
+    return hw
+
+
+# ==============================================================================
+# --- DRIVERS SIMULADOS ---
+# ==============================================================================
+
+class DatosSinteticos:
+    """Señales sintéticas con ciclo diario y ruido, en función de la hora simulada."""
+
+    def __init__(self, reloj, semilla=0):
+        self.reloj = reloj
+        self._rng = random.Random(semilla)
+        self._lock = threading.Lock()
+
+    def valores(self):
+        t = self.reloj.time()
+        hora = (t % 86400) / 3600
+        ocupacion = max(0.0, math.sin((hora - 7) / 14 * math.pi)) if 7 <= hora < 21 else 0.0
+        with self._lock:
+            g = self._rng.gauss
+            return {
+                "temp": 21 + 4 * math.sin((hora - 9) / 24 * 2 * math.pi) + g(0, 0.2),
+                "hum": 45 + 8 * ocupacion + g(0, 1.0),
+                "co2": max(400.0, 420 + 500 * ocupacion + g(0, 15)),
+                "tvoc": max(0.0, 50 + 200 * ocupacion + g(0, 10)),
+                "db": 40 + 30 * ocupacion + g(0, 3),
+                "mov": self._rng.random() < 0.1 + 0.6 * ocupacion,
+            }
+
+
+class DatosGrabados:
+    """Reproduce un CSV (p. ej. una exportación de `measures`) en orden.
+
+    Cada fila se mantiene `paso_s` segundos simulados y el archivo se repite
+    al llegar al final. Columnas reconocidas: temperature, humidity, co2, tvoc,
+    noise y motion; las que falten se completan con datos sintéticos.
+    """
+
+    COLUMNAS = {"temperature": "temp", "humidity": "hum", "co2": "co2",
+                "tvoc": "tvoc", "noise": "db", "motion": "mov"}
+
+    def __init__(self, ruta, reloj, paso_s=300, semilla=0):
+        with open(ruta, newline="") as f:
+            self._filas = [
+                {interna: float(fila[col]) for col, interna in self.COLUMNAS.items()
+                 if fila.get(col) not in (None, "")}
+                for fila in csv.DictReader(f)
+            ]
+        if not self._filas:
+            raise ValueError(f"{ruta} no tiene filas")
+        self.reloj = reloj
+        self.paso_s = paso_s
+        self._inicio = reloj.time()
+        self._sinteticos = DatosSinteticos(reloj, semilla)
+
+    def valores(self):
+        i = int((self.reloj.time() - self._inicio) / self.paso_s) % len(self._filas)
+        valores = self._sinteticos.valores()
+        valores.update(self._filas[i])
+        valores["mov"] = bool(valores["mov"])
+        return valores
+
+
+class AHT20Simulado:
+    def __init__(self, datos, reloj, latencia_s=0.08):
+        self.datos = datos
+        self.reloj = reloj
+        self.latencia_s = latencia_s
+
+    def medir(self):
+        self.reloj.dormir(self.latencia_s)
+        v = self.datos.valores()
+        return v["temp"], v["hum"]
+
+
+class ENS160Simulado:
+    """Genera un dato nuevo por segundo simulado, como el sensor real."""
+
+    def __init__(self, datos, reloj):
+        self.datos = datos
+        self.reloj = reloj
+        self._ultimo = 0
+        self.compensacion = None
+
+    def dato_nuevo(self):
+        return int(self.reloj.time()) != self._ultimo
+
+    def leer(self):
+        self._ultimo = int(self.reloj.time())
+        v = self.datos.valores()
+        aqi = 1 + min(4, int(max(0.0, v["co2"] - 400) // 250))
+        return {"co2": int(v["co2"]), "tvoc": int(v["tvoc"]), "aqi": aqi}
+
+    def compensar(self, temp, hum):
+        self.compensacion = (temp, hum)
+
+
+class PIRSimulado:
+    def __init__(self, datos):
+        self.datos = datos
+
+    @property
+    def motion_detected(self):
+        return self.datos.valores()["mov"]
+
+
+class SalidaSimulada:
+    """LED o buzzer: guarda el último valor y cuenta los cambios."""
+
+    def __init__(self):
+        self.value = 0.0
+        self.frequency = None
+        self.cambios = 0
+
+    def __setattr__(self, nombre, valor):
+        if nombre == "value" and getattr(self, "value", None) != valor:
+            object.__setattr__(self, "cambios", getattr(self, "cambios", 0) + 1)
+        object.__setattr__(self, nombre, valor)
+
+    def off(self):
+        self.value = 0.0
+
+
+class LCDSimulada:
+    """LCD en memoria; cuenta los caracteres enviados por el bus."""
+
+    def __init__(self, columnas=16, filas=2):
+        self.columnas = columnas
+        self.lineas = [[" "] * columnas for _ in range(filas)]
+        self.cursor_pos = (0, 0)
+        self.backlight_enabled = True
+        self.caracteres_enviados = 0
+
+    def write_string(self, texto):
+        fila, columna = self.cursor_pos
+        for c in texto:
+            if columna < self.columnas:
+                self.lineas[fila][columna] = c
+            columna += 1
+        self.cursor_pos = (fila, columna)
+        self.caracteres_enviados += len(texto)
+
+    def clear(self):
+        for linea in self.lineas:
+            linea[:] = [" "] * self.columnas
+        self.cursor_pos = (0, 0)
+
+    def close(self):
+        pass
+
+    def texto(self):
+        return ["".join(linea) for linea in self.lineas]
+
+
+class MicrofonoSimulado:
+    """Entrega bloques int16 con el nivel sintético al ritmo del reloj."""
+
+    # Amplitud RMS (unidades int16) para 0 dB con la calibración por defecto
+    RMS_REFERENCIA = 0.1
+
+    def __init__(self, datos, reloj, semilla=0):
+        self.datos = datos
+        self.reloj = reloj
+        self._rng = np.random.default_rng(semilla)
+        self._parada = threading.Event()
+        self._hilo = None
+
+    def abrir(self, callback, rate, chunk, canales):
+        self._hilo = threading.Thread(target=self._ciclo, args=(callback, rate, chunk * canales),
+                                      name="MICROFONO", daemon=True)
+        self._hilo.start()
+
+    def _ciclo(self, callback, rate, n):
+        duracion = self.reloj.periodo(n / rate)
+        proximo = time.monotonic()
+        ruido = np.empty(n, dtype=np.float64)
+        bloque = np.empty(n, dtype=np.int16)
+        while not self._parada.is_set():
+            rms = self.RMS_REFERENCIA * 10 ** (self.datos.valores()["db"] / 20)
+            ruido[:] = self._rng.standard_normal(n)
+            ruido *= rms
+            np.clip(ruido, -32768, 32767, out=ruido)
+            bloque[:] = ruido
+            callback(bloque.tobytes(), n, None, 0)
+            proximo += duracion
+            espera = proximo - time.monotonic()
+            if espera > 0:
+                self._parada.wait(espera)
+            else:
+                proximo = time.monotonic()
+
+    def cerrar(self):
+        self._parada.set()
+        if self._hilo and self._hilo.is_alive():
+            self._hilo.join(timeout=2)
+
+
+class ClienteSimulado:
+    """Sustituto del cliente Supabase: guarda lo insertado en memoria.
+
+    `latencia_s` y `prob_fallo` permiten probar la cola de envío bajo una red
+    lenta o intermitente.
+    """
+
+    def __init__(self, latencia_s=0.0, prob_fallo=0.0, semilla=0):
+        self.latencia_s = latencia_s
+        self.prob_fallo = prob_fallo
+        self.filas = {}
+        self.inserts = 0
+        self._rng = random.Random(semilla)
+        self._lock = threading.Lock()
+
+    def table(self, nombre):
+        return _ConsultaSimulada(self, nombre)
+
+
+class _ConsultaSimulada:
+    def __init__(self, cliente, tabla):
+        self.cliente = cliente
+        self.tabla = tabla
+        self._filas = []
+
+    def insert(self, filas):
+        self._filas = filas if isinstance(filas, list) else [filas]
+        return self
+
+    def execute(self):
+        c = self.cliente
+        if c.latencia_s:
+            time.sleep(c.latencia_s)
+        with c._lock:
+            if c._rng.random() < c.prob_fallo:
+                raise ConnectionError("fallo simulado de red")
+            c.filas.setdefault(self.tabla, []).extend(self._filas)
+            c.inserts += 1
+        return SimpleNamespace(data=self._filas)
+
+
+def crear_hardware_simulado(cfg, reloj, datos=None, semilla=0, latencia_api_s=0.0, prob_fallo_api=0.0):
+    """Drivers falsos alimentados por `datos` (sintéticos si no se indica)."""
+    datos = datos or DatosSinteticos(reloj, semilla)
+    hw = hardware_vacio()
+    if getattr(cfg, "BACKEND", "") == "local":
+        # Misma latencia y fallos inyectados, pero con la API de consultas completa
+        hw.cliente = cliente_local(latency_s=latencia_api_s, failure_rate=prob_fallo_api,
+                                   seed=semilla)
+    else:
+        hw.cliente = ClienteSimulado(latencia_api_s, prob_fallo_api, semilla)
+    hw.aht = AHT20Simulado(datos, reloj)
+    hw.ens = ENS160Simulado(datos, reloj)
+    hw.pir = PIRSimulado(datos)
+    hw.led_verde = SalidaSimulada()
+    hw.led_amarillo = SalidaSimulada()
+    hw.led_rojo = SalidaSimulada()
+    hw.buzzer = SalidaSimulada()
+    hw.lcd = LCDSimulada(cfg.LCD_COLS, cfg.LCD_ROWS)
+    hw.microfono = MicrofonoSimulado(datos, reloj, semilla)
+    print(f"[OK] Hardware simulado ({type(datos).__name__}, x{reloj.escala:g}).")
+    return hw
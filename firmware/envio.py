@@ -0,0 +1,191 @@
+"""
+envio.py
+Subida de lecturas a Supabase a prueba de cortes de red.
+
+Cada fila se escribe primero en una cola en disco (SQLite en modo WAL) y un
+hilo aparte la sube por lotes. Si la API falla, el hilo reintenta con espera
+exponencial y, cuando vuelve la conexión, vacía el atraso en orden de
+llegada. Las lecturas solo se borran de la cola cuando el insert se confirma.
+"""
+
+import json
+import random
+import sqlite3
+import threading
+import time
+
+
+class ColaPersistente:
+    """Cola FIFO en disco de filas pendientes de subir."""
+
+    def __init__(self, ruta):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(ruta, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pendientes ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " tabla TEXT NOT NULL,"
+            " fila TEXT NOT NULL,"
+            " creado REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def encolar(self, tabla, fila):
+        with self._lock:
+            self._conn.execute("INSERT INTO pendientes (tabla, fila, creado) VALUES (?, ?, ?)",
+                               (tabla, json.dumps(fila), time.time()))
+            self._conn.commit()
+
+    def siguiente_lote(self, maximo):
+        """Las filas más antiguas de una misma tabla: (tabla, [ids], [filas])."""
+        with self._lock:
+            primera = self._conn.execute(
+                "SELECT tabla FROM pendientes ORDER BY id LIMIT 1").fetchone()
+            if not primera:
+                return None, [], []
+            filas = self._conn.execute(
+                "SELECT id, fila FROM pendientes WHERE tabla = ? ORDER BY id LIMIT ?",
+                (primera[0], maximo)).fetchall()
+        return primera[0], [f[0] for f in filas], [json.loads(f[1]) for f in filas]
+
+    def confirmar(self, ids):
+        with self._lock:
+            self._conn.executemany("DELETE FROM pendientes WHERE id = ?", [(i,) for i in ids])
+            self._conn.commit()
+
+    def pendientes(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pendientes").fetchone()[0]
+
+    def cerrar(self):
+        with self._lock:
+            self._conn.close()
+
+
+def es_error_de_datos(e):
+    """Errores de PostgreSQL que no se arreglan reintentando (clases 22 y 23)."""
+    codigo = str(getattr(e, "code", "") or "")
+    return codigo.startswith("22") or codigo.startswith("23")
+
+
+def es_error_de_columna(e):
+    """Columna que la tabla no tiene (PostgREST PGRST204, PostgreSQL 42703).
+    No se arregla reintentando: hay que cambiar el payload."""
+    codigo = str(getattr(e, "code", "") or "")
+    return codigo in ("PGRST204", "42703")
+
+
+def es_tabla_inexistente(e):
+    """Tabla que la API no encuentra (PostgREST PGRST205, PostgreSQL 42P01).
+    Las filas son válidas: se conservan hasta que la tabla exista."""
+    codigo = str(getattr(e, "code", "") or "")
+    return codigo in ("PGRST205", "42P01")
+
+
+class Subidor:
+    """Hilo que vacía la cola persistente en Supabase por lotes.
+
+    `columnas_opcionales` son columnas que la tabla puede no tener todavía
+    (p. ej. `estimated`): si la API no las conoce se dejan de enviar y el lote
+    se reintenta sin ellas, en vez de bloquear la cola.
+    """
+
+    def __init__(self, cliente, cola, tamano_lote=100, periodo=5.0,
+                 espera_min=1.0, espera_max=300.0, metricas=None, columnas_opcionales=()):
+        self.cliente = cliente
+        self.columnas_opcionales = set(columnas_opcionales)
+        self.columnas_omitidas = set()
+        self.metricas = metricas
+        self.cola = cola
+        self.tamano_lote = tamano_lote
+        self.periodo = periodo
+        self.espera_min = espera_min
+        self.espera_max = espera_max
+        self.enviadas = 0
+        self.fallos = 0
+        self.descartadas = 0
+        self._espera = espera_min
+        self._hay_datos = threading.Event()
+        self._parada = threading.Event()
+        self._hilo = threading.Thread(target=self._ciclo, name="SUBIDOR", daemon=True)
+
+    def iniciar(self):
+        self._hilo.start()
+
+    def enviar(self, tabla, fila):
+        """Encola una fila; nunca bloquea esperando a la red."""
+        self.cola.encolar(tabla, fila)
+        self._hay_datos.set()
+
+    def detener(self, timeout=5):
+        self._parada.set()
+        self._hay_datos.set()
+        if self._hilo.is_alive():
+            self._hilo.join(timeout=timeout)
+
+    def _ciclo(self):
+        while not self._parada.is_set():
+            if not self.cliente:
+                # Modo offline: las filas se acumulan en disco
+                self._parada.wait(self.periodo)
+                continue
+            tabla, ids, filas = self.cola.siguiente_lote(self.tamano_lote)
+            if not ids:
+                self._hay_datos.wait(self.periodo)
+                self._hay_datos.clear()
+                continue
+            if self._subir(tabla, ids, filas):
+                self._espera = self.espera_min
+                continue  # Quedan filas: seguir vaciando el atraso sin esperar
+            # Espera exponencial con jitter para no saturar la red al volver
+            self._parada.wait(self._espera * random.uniform(0.5, 1.0))
+            self._espera = min(self._espera * 2, self.espera_max)
+
+    def _descartar(self, ids, e):
+        print(f"[ERROR API] Lote de {len(ids)} filas rechazado, se descarta: {e}")
+        self.cola.confirmar(ids)
+        self.descartadas += len(ids)
+        return True
+
+    def _subir(self, tabla, ids, filas):
+        if self.columnas_omitidas:
+            filas = [{k: v for k, v in f.items() if k not in self.columnas_omitidas}
+                     for f in filas]
+        inicio = time.perf_counter()
+        try:
+            self.cliente.table(tabla).insert(filas).execute()
+        except Exception as e:
+            if self.metricas: self.metricas.observar("subida", time.perf_counter() - inicio)
+            self.fallos += 1
+            err_str = str(e)
+            if "42501" in err_str or "permission denied" in err_str:
+                print("[ERROR RLS] Permiso denegado en Supabase.")
+                print(" -> SOLUCIÓN: Ve a Supabase > Table Editor > measures > RLS y desactívalo.")
+            elif es_tabla_inexistente(e):
+                # Falta la tabla (o la caché de esquema de la API no la ve aún):
+                # nada que descartar, se reintenta con la espera exponencial
+                print(f"[ERROR API] ¡La tabla '{tabla}' no existe! Se conservan "
+                      f"{self.cola.pendientes()} filas en cola, reintento en "
+                      f"~{self._espera:.0f} s. Créala en Supabase: {e}")
+            elif es_error_de_columna(e):
+                nuevas = {k for f in filas for k in f} & (self.columnas_opcionales
+                                                          - self.columnas_omitidas)
+                if nuevas:
+                    # Se reintenta ya sin ellas; el lote sigue en la cola
+                    print(f"[ERROR API] La tabla '{tabla}' no tiene {sorted(nuevas)}, "
+                          f"se dejan de enviar: {e}")
+                    self.columnas_omitidas |= nuevas
+                    return True
+                return self._descartar(ids, e)
+            elif es_error_de_datos(e):
+                return self._descartar(ids, e)
+            else:
+                print(f"[ERROR API] Fallo al enviar ({self.cola.pendientes()} en cola, "
+                      f"reintento en ~{self._espera:.0f} s): {e}")
+            return False
+        if self.metricas: self.metricas.observar("subida", time.perf_counter() - inicio)
+        self.cola.confirmar(ids)
+        self.enviadas += len(ids)
+        return True
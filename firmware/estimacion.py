@@ -0,0 +1,189 @@
+"""
+estimacion.py
+Estimación en el nodo de las variables sin sensor (o con el sensor caído).
+
+Carga los modelos por variable que entrena `model.py` (artefactos de
+`skiliket.artifacts`) y, al cerrar cada ventana de agregación, predice las
+variables ausentes a partir de las que sí se midieron: una predicción por
+modelo y ventana, no por lectura. Las features salen del mismo
+`FeaturePipeline` del entrenamiento, aplicado a un historial corto de
+ventanas del nodo. Las ventanas cerradas llegan por una cola a un hilo
+propio, así que la adquisición nunca espera a un modelo.
+
+Presupuesto en la Pi 4:
+- Memoria: los modelos se cargan en orden de prioridad mientras la suma de
+  su tamaño ya cargados (los arrays de los árboles, no el archivo, que puede
+  estar comprimido) quepa en `memoria_max_mb`; los demás se descartan con aviso.
+- CPU: cada modelo predice con un solo hilo. Al cargarlo se mide una
+  predicción de calibración en esta misma máquina y se descarta si ya supera
+  `cpu_max_s`. Si luego una predicción lo supera, su valor no se publica y el
+  modelo se desactiva.
+"""
+
+import collections
+import os
+import queue
+import sys
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+# skiliket (artefactos y features del entrenamiento) vive en la raíz del repositorio
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from skiliket.artifacts import list_models, load_model, model_nbytes
+from skiliket.func import numeric_frame
+
+
+class Estimador:
+    """Modelos cargados para las variables que el nodo puede necesitar estimar,
+    y el hilo que los aplica a las ventanas que llegan por `encolar()`."""
+
+    def __init__(self, directorio, columnas, memoria_max_mb=150.0, cpu_max_s=2.0, metricas=None,
+                 cola_max=16):
+        self.metricas = metricas
+        self.cpu_max_s = cpu_max_s
+        self.modelos = {}
+        self.costos_s = {}
+        self.memoria_mb = 0.0
+        self.estimaciones = 0
+        self.sin_estimar = 0
+        self._cola = queue.Queue(maxsize=cola_max)
+        self._hilo = threading.Thread(target=self._ciclo, name="ESTIMACION", daemon=True)
+        disponibles = set(list_models(directorio))
+        for columna in columnas:
+            if columna not in disponibles:
+                print(f"[ERROR ESTIMACIÓN] No hay modelo para '{columna}' en {directorio}")
+                continue
+            modelo = load_model(directorio, columna)
+            tamano_mb = self._tamano_mb(modelo)
+            if self.memoria_mb + tamano_mb > memoria_max_mb:
+                print(f"[ERROR ESTIMACIÓN] '{columna}' ({tamano_mb:.0f} MB) no cabe en "
+                      f"{memoria_max_mb:.0f} MB, se descarta")
+                continue
+            # Se carga ya (y no en la primera ventana) y predice con un solo hilo
+            modelo.estimator.set_params(n_jobs=1)
+            costo = self._calibrar(modelo)
+            if costo > cpu_max_s:
+                print(f"[ERROR ESTIMACIÓN] '{columna}' tarda {costo:.2f} s de CPU por "
+                      f"predicción (máx {cpu_max_s:.2f} s), se descarta")
+                continue
+            self.memoria_mb += tamano_mb
+            self.costos_s[columna] = costo
+            self.modelos[columna] = modelo
+
+        pipelines = [m.pipeline for m in self.modelos.values() if m.pipeline]
+        self.pipeline = pipelines[0] if pipelines else None
+        filas = self.pipeline.history_rows + 1 if self.pipeline else 1
+        self._historial = collections.deque(maxlen=filas)
+
+    @staticmethod
+    def _tamano_mb(modelo):
+        """Memoria del modelo cargado: la del sidecar o, en artefactos viejos,
+        la medida al cargarlo; el tamaño del archivo solo si no hay árboles."""
+        nbytes = modelo.metadata.get("memory_bytes")
+        if nbytes is None:
+            nbytes = model_nbytes(modelo.estimator)
+        if nbytes is None:
+            nbytes = os.path.getsize(modelo.path)
+        return nbytes / 2**20
+
+    @staticmethod
+    def _calibrar(modelo, repeticiones=3):
+        """Segundos de CPU de una predicción de una fila (la mediana, tras una de
+        calentamiento), medidos en esta máquina antes de aceptar el modelo."""
+        estimador = modelo.estimator
+        X = np.zeros((1, estimador.n_features_in_), dtype=np.float32)
+        if modelo.features:
+            X = pd.DataFrame(X, columns=modelo.features)
+        estimador.predict(X)
+        costos = []
+        for _ in range(repeticiones):
+            cpu = time.thread_time()
+            estimador.predict(X)
+            costos.append(time.thread_time() - cpu)
+        return float(np.median(costos))
+
+    @property
+    def columnas(self):
+        return list(self.modelos)
+
+    def iniciar(self):
+        self._hilo.start()
+
+    def encolar(self, fila, ausentes, entregar):
+        """Pasa una ventana cerrada al hilo de estimación sin esperar.
+
+        El hilo completa `fila` y llama a `entregar(fila, estimadas)`. Si la
+        cola está llena, la fila se entrega ya, sin estimar.
+        """
+        try:
+            self._cola.put_nowait((fila, list(ausentes), entregar))
+        except queue.Full:
+            self.sin_estimar += 1
+            print("[ERROR ESTIMACIÓN] Cola llena, la ventana se envía sin estimar")
+            entregar(fila, [])
+
+    def detener(self, timeout=5):
+        """Termina las ventanas pendientes y para el hilo."""
+        if self._hilo.is_alive():
+            self._cola.put(None)
+            self._hilo.join(timeout=timeout)
+
+    def _ciclo(self):
+        while True:
+            item = self._cola.get()
+            if item is None:
+                return
+            fila, ausentes, entregar = item
+            try:
+                estimadas = self.estimar(fila, ausentes)
+            except Exception as e:
+                print(f"[ERROR ESTIMACIÓN] {e}")
+                estimadas = []
+            entregar(fila, estimadas)
+
+    def estimar(self, fila, ausentes):
+        """Reemplaza en `fila` las columnas `ausentes` que tienen modelo.
+
+        `fila` es el payload de `measures` de la ventana (measured_at en ISO).
+        Devuelve la lista de columnas estimadas.
+        """
+        # Sin medición (None) es un faltante para el pipeline, igual que un ausente
+        base = {k: np.nan if v is None else v for k, v in fila.items()}
+        for columna in ausentes:
+            base[columna] = np.nan
+        self._historial.append(base)
+        objetivo = [c for c in ausentes if c in self.modelos]
+        if not objetivo:
+            return []
+
+        df = pd.DataFrame(list(self._historial))
+        df["measured_at"] = pd.to_datetime(df["measured_at"], utc=True, format="ISO8601")
+        if self.pipeline:
+            df = self.pipeline.transform(df)
+        ultima = numeric_frame(df.iloc[[-1]])
+
+        estimadas = []
+        for columna in objetivo:
+            modelo = self.modelos[columna]
+            X = ultima.reindex(columns=modelo.features).astype(np.float32)
+            inicio, cpu = time.perf_counter(), time.thread_time()
+            try:
+                valor = float(modelo.predict(X)[0])
+            except Exception as e:
+                print(f"[ERROR ESTIMACIÓN] {columna}: {e}")
+                continue
+            cpu = time.thread_time() - cpu
+            if self.metricas:
+                self.metricas.observar("estimacion", time.perf_counter() - inicio)
+            if cpu > self.cpu_max_s:
+                # Fuera de presupuesto: el valor no se publica
+                print(f"[ERROR ESTIMACIÓN] '{columna}' usó {cpu:.1f} s de CPU "
+                      f"(máx {self.cpu_max_s:.1f} s), se descarta y se desactiva")
+                del self.modelos[columna]
+                continue
+            fila[columna] = round(valor, 2)
+            estimadas.append(columna)
+        self.estimaciones += len(estimadas)
+        return estimadas
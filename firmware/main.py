@@ -1,20 +1,19 @@
 import time
-import board
-import busio
+import threading
+import argparse
+import sys
+from datetime import datetime, timezone
 import os
 import signal
-import math
-import numpy as np
-import pyaudio
-from ctypes import *
 from contextlib import contextmanager
-from gpiozero import LED, PWMOutputDevice, MotionSensor
-import adafruit_ens160
-import adafruit_ahtx0
-from RPLCD.i2c import CharLCD
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from dotenv import load_dotenv
-from supabase import create_client, Client
-from supabase.client import ClientOptions
+from drivers import Reloj, DatosGrabados, crear_hardware_real, crear_hardware_simulado
+from sonometro import CapturaAudio
+from envio import ColaPersistente, Subidor
+from agregacion import AgregadorVentanas
+from pantalla import PantallaLCD
+from sensores import PlanificadorSensores
 
 # ==============================================================================
 # --- 1. CONFIGURACIÓN Y UMBRALES ---
@@ -26,8 +25,29 @@ load_dotenv()
 # Credenciales Supabase (API REST)
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
+# "local": base SQLite que imita la API (skiliket/local_backend.py), para
+# medir la subida sin el proyecto de Supabase
+BACKEND = os.environ.get("SKILIKET_BACKEND", "supabase")
 NODE_ID = 1  
 
+# --- Cola de Envío ---
+# Las lecturas se guardan en disco antes de subirse; sobreviven a cortes de
+# red y a reinicios del nodo.
+COLA_ENVIO_DB = os.environ.get("COLA_ENVIO_DB",
+                               os.path.join(os.path.dirname(os.path.abspath(__file__)), "cola_envio.sqlite3"))
+TAMANO_LOTE_ENVIO = 100   # Filas por insert
+ESPERA_MAX_ENVIO = 300.0  # Tope de la espera exponencial entre reintentos (s)
+
+# --- Agregación ---
+# Solo se sube un resumen por ventana; las lecturas crudas son opcionales.
+VENTANA_AGREGACION_S = 300     # 5 minutos
+TABLA_MEDICIONES = "measures"  # Promedio de cada ventana
+TABLA_ESTADISTICAS = None      # min/max/std por ventana, p. ej. "measure_stats" (None = no se envía)
+TABLA_CRUDOS = None            # Lecturas crudas cada PERIODO_ENVIO, p. ej. "measures_raw" (None = no se envían)
+# Variable interna -> columna en Supabase
+COLUMNAS_AGREGADAS = {"temp": "temperature", "hum": "humidity", "co2": "co2",
+                      "tvoc": "tvoc", "db": "noise"}
+
 # --- Configuración de Pines GPIO ---
 # Semáforo de Ruido (Actuadores)
 PIN_LED_VERDE = 22    # Ruido < 75 dB
@@ -41,6 +61,7 @@ PIN_BUZZER = 25       # Alarma por CO2 (Pasivo/PWM)
 PIN_PIR = 17          # Movimiento
 
 # --- Umbrales de Lógica ---
+# Umbrales de ruido en dB con la ponderación configurada (dB(A) por defecto)
 UMBRAL_RUIDO_BAJO = 75.0
 UMBRAL_RUIDO_ALTO = 85.0
 ALERTA_CO2_PPM = 500 # Nivel perjudicial ajustado
@@ -51,268 +72,614 @@ LCD_ROWS = 2
 LCD_ADDRESS = 0x27 
 LCD_PORT = 1 
 
+# --- Periodos de las Tareas (s) ---
+PERIODO_ADQUISICION = 1.0  # Toma de la última lectura de cada sensor
+PERIODO_AHT20 = 2.0        # Medición conjunta de temperatura y humedad
+PERIODO_ENS160 = 1.0       # Cadencia de datos nuevos del ENS160
+REINTENTO_ENS160 = 0.1     # Nueva consulta del ENS160 si aún no tenía dato listo
+PERIODO_ACTUADORES = 0.2   # Semáforo y alarma CO2
+PERIODO_PAGINA_LCD = 6.0   # Tiempo por página en la LCD (cada cambio reescribe la pantalla)
+PERIODO_REFRESCO_LCD = PERIODO_ADQUISICION  # Consulta de la página visible; solo se redibuja si cambió
+PERIODO_ENVIO = 15.0       # Reporte en consola y envío a Supabase
+
 # --- Configuración Audio ---
 CHUNK = 1024
-FORMAT = pyaudio.paInt16
 CHANNELS = 1
 RATE = 44100
+BUFFER_AUDIO_S = 900           # Historial de niveles disponible para estadísticas
+VENTANA_RUIDO_S = 1.0          # Ventana del nivel que controla el semáforo
+VENTANA_REPORTE_S = PERIODO_ENVIO  # Ventana de Leq/L10/L90 reportados
+
+# --- Métricas ---
+PUERTO_METRICAS = 9101         # Endpoint HTTP /metrics (formato Prometheus); None = desactivado
+TABLA_METRICAS = None          # Fila periódica de métricas, p. ej. "node_metrics" (None = no se envía)
+PERIODO_METRICAS = 300.0       # Cada cuánto se envía la fila de métricas (s)
+
+# --- Sonómetro ---
+PONDERACION_FRECUENCIA = "A"   # A, C o Z (sin ponderar)
+PONDERACION_TIEMPO = "F"       # F (125 ms) o S (1 s)
+# Offset de calibración propio de cada micrófono (medido contra un sonómetro
+# de referencia). 20 dB reproduce la fórmula anterior sin calibrar.
+CALIBRACION_MIC_DB = float(os.environ.get("MIC_CALIBRACION_DB", 20.0))
+
+# --- Estimación de variables sin sensor ---
+# Modelos de model.py (p. ej. "public_models"); None = se envía 0.0 como antes
+MODELOS_DIR = os.environ.get("MODELOS_DIR")
+MEMORIA_MAX_MODELOS_MB = 150.0  # Suma máxima de los modelos cargados
+CPU_MAX_ESTIMACION_S = 2.0      # CPU máximo de una predicción (calibrado al cargar el modelo)
+COLUMNA_ESTIMADAS = "estimated" # Columna (text[]) de measures con las variables estimadas
+# Orden de prioridad al cargar modelos: uv no tiene sensor en ningún nodo
+COLUMNAS_ESTIMABLES = ("uv", "temperature", "humidity", "co2", "noise")
+
+# ==============================================================================
+# --- 2. MODO DE EJECUCIÓN ---
+# ==============================================================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Firmware del nodo Skiliket")
+    parser.add_argument("--simulado", action="store_true",
+                        help="usar drivers simulados (sin Raspberry Pi ni Supabase)")
+    parser.add_argument("--acelerar", type=float, default=1.0,
+                        help="factor de aceleración del tiempo en modo simulado")
+    parser.add_argument("--datos", type=str,
+                        help="CSV con lecturas grabadas a reproducir en modo simulado")
+    parser.add_argument("--paso-datos", type=float, default=300.0,
+                        help="segundos simulados que dura cada fila del CSV")
+    parser.add_argument("--semilla", type=int, default=0, help="semilla de los datos sintéticos")
+    parser.add_argument("--latencia-api", type=float, default=0.0,
+                        help="latencia (s) del cliente Supabase simulado")
+    parser.add_argument("--fallos-api", type=float, default=0.0,
+                        help="probabilidad de fallo de cada insert simulado")
+    parser.add_argument("--duracion", type=float,
+                        help="segundos reales tras los que el firmware se apaga solo")
+    parser.add_argument("--sin-reporte", action="store_true",
+                        help="no imprimir el reporte periódico en consola")
+    parser.add_argument("--sin-sensor", action="append", default=[],
+                        choices=["aht", "ens", "microfono"],
+                        help="simular un nodo sin ese sensor (repetible)")
+    parser.add_argument("--modelos", type=str, default=MODELOS_DIR,
+                        help="directorio de modelos para estimar las variables sin sensor")
+    return parser.parse_args(argv)
+
+args = parse_args()
+if args.acelerar != 1.0 and not args.simulado:
+    raise SystemExit("--acelerar solo está disponible con --simulado")
+reloj = Reloj(args.acelerar)
+
+# ==============================================================================
+# --- 3. MÉTRICAS ---
+# ==============================================================================
+
+class Histograma:
+    """Histograma acumulativo de duraciones (s) con límites fijos."""
+
+    LIMITES = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+    def __init__(self):
+        self.cuentas = [0] * (len(self.LIMITES) + 1)
+        self.suma = 0.0
+        self.n = 0
+        self.maximo = 0.0
+
+    def observar(self, segundos):
+        i = 0
+        while i < len(self.LIMITES) and segundos > self.LIMITES[i]:
+            i += 1
+        self.cuentas[i] += 1
+        self.suma += segundos
+        self.n += 1
+        self.maximo = max(self.maximo, segundos)
+
+    def percentil(self, p):
+        """Límite superior del cubo donde cae el percentil `p` (0-100)."""
+        if not self.n: return 0.0
+        objetivo, acumulado = p / 100 * self.n, 0
+        for limite, cuenta in zip(self.LIMITES + (self.maximo,), self.cuentas):
+            acumulado += cuenta
+            if acumulado >= objetivo:
+                return min(limite, self.maximo)
+        return self.maximo
+
+
+class Metricas:
+    """Tiempos por etapa, contadores y medidores del firmware.
+
+    Los componentes reciben este objeto y llaman a `observar(etapa, s)`; los
+    medidores (profundidad de la cola, desbordes de audio...) se leen al
+    exportar, sin costo en el camino de adquisición.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histogramas = {}
+        self.contadores = {}
+        self.medidores = {}
+
+    def observar(self, etapa, segundos):
+        with self._lock:
+            self.histogramas.setdefault(etapa, Histograma()).observar(segundos)
+
+    @contextmanager
+    def medir(self, etapa):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(etapa, time.perf_counter() - inicio)
+
+    def incrementar(self, nombre, n=1):
+        with self._lock:
+            self.contadores[nombre] = self.contadores.get(nombre, 0) + n
+
+    def medidor(self, nombre, funcion, tipo="gauge"):
+        """Registra un valor que se lee al exportar (`tipo`: gauge o counter)."""
+        self.medidores[nombre] = (funcion, tipo)
+
+    def _leer_medidores(self):
+        valores = {}
+        for nombre, (funcion, tipo) in self.medidores.items():
+            try:
+                valores[nombre] = (float(funcion()), tipo)
+            except Exception:
+                pass
+        return valores
+
+    def exportar_prometheus(self):
+        lineas = ["# TYPE skiliket_etapa_segundos histogram"]
+        with self._lock:
+            for etapa, h in sorted(self.histogramas.items()):
+                acumulado = 0
+                for limite, cuenta in zip(h.LIMITES, h.cuentas):
+                    acumulado += cuenta
+                    lineas.append(f'skiliket_etapa_segundos_bucket{{nodo="{NODE_ID}",etapa="{etapa}",le="{limite}"}} {acumulado}')
+                lineas.append(f'skiliket_etapa_segundos_bucket{{nodo="{NODE_ID}",etapa="{etapa}",le="+Inf"}} {h.n}')
+                lineas.append(f'skiliket_etapa_segundos_sum{{nodo="{NODE_ID}",etapa="{etapa}"}} {h.suma:.6f}')
+                lineas.append(f'skiliket_etapa_segundos_count{{nodo="{NODE_ID}",etapa="{etapa}"}} {h.n}')
+            contadores = dict(self.contadores)
+        for nombre, valor in sorted(contadores.items()):
+            lineas.append(f"# TYPE skiliket_{nombre}_total counter")
+            lineas.append(f'skiliket_{nombre}_total{{nodo="{NODE_ID}"}} {valor}')
+        for nombre, (valor, tipo) in sorted(self._leer_medidores().items()):
+            if tipo == "counter": nombre += "_total"
+            lineas.append(f"# TYPE skiliket_{nombre} {tipo}")
+            lineas.append(f'skiliket_{nombre}{{nodo="{NODE_ID}"}} {valor:g}')
+        return "\n".join(lineas) + "\n"
+
+    def resumen(self):
+        """Fila plana con p50/p95/máx por etapa, contadores y medidores."""
+        fila = {}
+        with self._lock:
+            for etapa, h in self.histogramas.items():
+                fila[f"{etapa}_p50_ms"] = round(h.percentil(50) * 1000, 2)
+                fila[f"{etapa}_p95_ms"] = round(h.percentil(95) * 1000, 2)
+                fila[f"{etapa}_max_ms"] = round(h.maximo * 1000, 2)
+            fila.update(self.contadores)
+        fila.update({nombre: valor for nombre, (valor, _) in self._leer_medidores().items()})
+        return fila
+
+
+def servir_metricas(metricas, puerto):
+    """Expone /metrics en un hilo aparte (servidor HTTP de la librería estándar)."""
+    class Manejador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            cuerpo = metricas.exportar_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(("0.0.0.0", puerto), Manejador)
+    threading.Thread(target=servidor.serve_forever, name="METRICAS", daemon=True).start()
+    return servidor
+
+
+metricas = Metricas()
 
 # ==============================================================================
-# --- 2. SILENCIADOR DE ERRORES ALSA ---
+# --- 4. INICIALIZACIÓN DE HARDWARE ---
 # ==============================================================================
-ERROR_HANDLER_FUNC = CFUNCTYPE(None, c_char_p, c_int, c_char_p, c_int, c_char_p)
-def py_error_handler(filename, line, function, err, fmt):
-    pass
-c_error_handler = ERROR_HANDLER_FUNC(py_error_handler)
 
-@contextmanager
-def no_alsa_err():
+print(f"\n--- INICIANDO SISTEMA SKILIKET (NODO {NODE_ID} - "
+      f"{'SIMULADO' if args.simulado else 'SUPABASE API'}) ---")
+
+if args.simulado:
+    datos_simulados = (DatosGrabados(args.datos, reloj, args.paso_datos, args.semilla)
+                       if args.datos else None)
+    hw = crear_hardware_simulado(sys.modules[__name__], reloj, datos_simulados, args.semilla,
+                                 args.latencia_api, args.fallos_api)
+    # La cola de la simulación no se mezcla con la del nodo real
+    COLA_ENVIO_DB = ":memory:"
+    for dispositivo in args.sin_sensor:
+        setattr(hw, dispositivo, None)
+else:
+    hw = crear_hardware_real(sys.modules[__name__])
+
+supabase = hw.cliente
+aht, ens, pir = hw.aht, hw.ens, hw.pir
+led_verde, led_amarillo, led_rojo, buzzer = hw.led_verde, hw.led_amarillo, hw.led_rojo, hw.buzzer
+lcd = hw.lcd
+
+cola_envio = ColaPersistente(COLA_ENVIO_DB)
+subidor = Subidor(supabase, cola_envio, tamano_lote=TAMANO_LOTE_ENVIO, espera_max=ESPERA_MAX_ENVIO,
+                  metricas=metricas, columnas_opcionales=(COLUMNA_ESTIMADAS,))
+print(f"[OK] Cola de envío en {COLA_ENVIO_DB} ({cola_envio.pendientes()} pendientes).")
+
+planificador = PlanificadorSensores(aht, ens, periodo_aht=reloj.periodo(PERIODO_AHT20),
+                                    periodo_ens=reloj.periodo(PERIODO_ENS160),
+                                    reintento_ens=reloj.periodo(REINTENTO_ENS160), metricas=metricas)
+
+pantalla = None
+if lcd:
+    try:
+        lcd.clear()
+        lcd.cursor_pos = (0, 0)
+        lcd.write_string('Skiliket IoT')
+        lcd.cursor_pos = (1, 0)
+        lcd.write_string('Conectando...')
+        pantalla = PantallaLCD(lcd, LCD_COLS, LCD_ROWS, reloj.periodo(PERIODO_PAGINA_LCD),
+                               reloj.periodo(PERIODO_REFRESCO_LCD), metricas=metricas)
+    except Exception as e:
+        print(f"[ERROR] LCD: {e}")
+
+captura = None
+if hw.microfono:
     try:
-        asound = cdll.LoadLibrary('libasound.so.2')
-        asound.snd_lib_error_set_handler(c_error_handler)
-        yield
-        asound.snd_lib_error_set_handler(None)
-    except:
-        yield
+        captura = CapturaAudio(hw.microfono, rate=RATE, chunk=CHUNK, canales=CHANNELS,
+                               ventana_max_s=BUFFER_AUDIO_S,
+                               ponderacion=PONDERACION_FRECUENCIA, tiempo=PONDERACION_TIEMPO,
+                               calibracion_db=CALIBRACION_MIC_DB, metricas=metricas)
+        captura.abrir()
+        print(f"[OK] Audio activo (captura continua, dB({PONDERACION_FRECUENCIA}) "
+              f"{PONDERACION_TIEMPO}, calibración {CALIBRACION_MIC_DB:+.1f} dB).")
+    except Exception as e:
+        captura = None
+        print(f"[ERROR] Audio: {e}")
+
+estimador = None
+if args.modelos:
+    try:
+        from estimacion import Estimador
+        estimador = Estimador(args.modelos, COLUMNAS_ESTIMABLES,
+                              memoria_max_mb=MEMORIA_MAX_MODELOS_MB,
+                              cpu_max_s=CPU_MAX_ESTIMACION_S, metricas=metricas)
+        print(f"[OK] Estimación activa para: {', '.join(estimador.columnas) or 'ninguna'} "
+              f"({estimador.memoria_mb:.1f} MB de modelos).")
+    except Exception as e:
+        estimador = None
+        print(f"[ERROR] Estimación: {e}")
 
 # ==============================================================================
-# --- 3. INICIALIZACIÓN DE HARDWARE ---
+# --- 5. ESTADO COMPARTIDO ---
 # ==============================================================================
 
-print("\n--- INICIANDO SISTEMA SKILIKET (NODO 1 - SUPABASE API) ---")
+class Lecturas:
+    """Últimas lecturas de sensores, compartidas entre las tareas.
 
-# A. Cliente Supabase
-supabase = None
-try:
-    if not SUPABASE_URL or not SUPABASE_KEY:
-        print("[ADVERTENCIA] Faltan SUPABASE_URL/KEY en .env (Modo Offline).")
-    else:
-        # Inicializamos el cliente web estándar
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY, options=ClientOptions(schema="public"))
-        print("[OK] Cliente Supabase inicializado.")
-except Exception as e:
-    print(f"[ERROR] Supabase Init: {e}")
+    La tarea de adquisición es la única que escribe; actuadores, LCD y envío
+    leen una copia consistente con `instantanea()`.
+    """
 
-# B. Bus I2C
-try:
-    i2c = busio.I2C(board.SCL, board.SDA)
-except ValueError:
-    print("[ERROR FATAL] I2C no disponible.")
-    exit(1)
-
-# C. Sensores I2C
-aht = None
-ens = None
-try:
-    aht = adafruit_ahtx0.AHTx0(i2c)
-    print("[OK] AHT20 listo.")
-except: print("[ERROR] AHT20 no detectado.")
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._datos = {
+            "temp": 0.0, "hum": 0.0, "co2": 0, "tvoc": 0, "aqi": 0,
+            "db": 0.0, "mov": False, "ts": 0.0,
+        }
 
-try:
-    ens = adafruit_ens160.ENS160(i2c)
-    ens.reset()
-    time.sleep(0.5)
-    ens.mode = adafruit_ens160.MODE_STANDARD
-    print("[OK] ENS160 listo.")
-except: print("[ERROR] ENS160 no detectado.")
-
-# D. Pantalla LCD (RPLCD)
-lcd = None
-try:
-    lcd = CharLCD(i2c_expander='PCF8574', address=LCD_ADDRESS, port=LCD_PORT, 
-                  cols=LCD_COLS, rows=LCD_ROWS, dotsize=8)
-    lcd.clear()
-    lcd.cursor_pos = (0, 0)
-    lcd.write_string('Skiliket IoT')
-    lcd.cursor_pos = (1, 0)
-    lcd.write_string('Conectando...')
-    print(f"[OK] LCD lista en {hex(LCD_ADDRESS)} (RPLCD).")
-except Exception as e:
-    print(f"[ERROR] LCD no detectada: {e}")
-
-# E. Actuadores y Sensores GPIO
-try:
-    led_verde = LED(PIN_LED_VERDE)
-    led_amarillo = LED(PIN_LED_AMARILLO)
-    led_rojo = LED(PIN_LED_ROJO)
-    buzzer = PWMOutputDevice(PIN_BUZZER, initial_value=0.0)
-    pir = MotionSensor(PIN_PIR, queue_len=1)
-    print(f"[OK] GPIO Configurado: LEDs(22-24), Buzzer(25), PIR({PIN_PIR}).")
-except Exception as e:
-    print(f"[ERROR] GPIO: {e}")
-
-# F. Audio
-audio = None
-stream = None
-try:
-    with no_alsa_err():
-        audio = pyaudio.PyAudio()
-        dev_index = None
-        for i in range(audio.get_device_count()):
-            info = audio.get_device_info_by_index(i)
-            if "USB" in info.get('name', '') or "PnP" in info.get('name', ''):
-                dev_index = i
-                print(f"[OK] Micrófono USB detectado: {info['name']}")
-                break
-        stream = audio.open(format=FORMAT, channels=CHANNELS, rate=RATE, input=True,
-                            input_device_index=dev_index, frames_per_buffer=CHUNK)
-        print("[OK] Audio activo.")
-except Exception as e:
-    print(f"[ERROR] Audio: {e}")
+    def actualizar(self, **valores):
+        with self._lock:
+            self._datos.update(valores)
+            self._datos["ts"] = reloj.time()
+
+    def instantanea(self):
+        with self._lock:
+            return dict(self._datos)
+
+
+lecturas = Lecturas()
+# El ruido se promedia en energía (Leq de la ventana), no como media de dB
+agregador = AgregadorVentanas(COLUMNAS_AGREGADAS, VENTANA_AGREGACION_S, logaritmicas=("db",))
+parada = threading.Event()
+estado_alarma = {"buzzer": "Silencio"}
 
 # ==============================================================================
-# --- 4. LÓGICA DE CONTROL ---
+# --- 6. LÓGICA DE CONTROL ---
 # ==============================================================================
 
-def calcular_decibeles(stream_audio):
-    if not stream_audio: return 0.0
+def calcular_decibeles(captura_audio, ventana_s=VENTANA_RUIDO_S):
+    """Leq de la ventana pedida; la captura continua no pierde bloques.
+    None si no hay micrófono o la captura falla."""
+    if not captura_audio: return None
     try:
-        data = stream_audio.read(CHUNK, exception_on_overflow=False)
-        ints = np.frombuffer(data, dtype=np.int16)
-        rms = np.sqrt(np.mean(ints.astype(np.float32)**2))
-        if rms <= 0: return 0.0
-        return round(20 * math.log10(rms) + 20, 1)
-    except: return 0.0
+        return captura_audio.estadisticas(ventana_s)["leq"]
+    except: return None
+
+def estadisticas_ruido(captura_audio, ventana_s=VENTANA_REPORTE_S):
+    if not captura_audio: return None
+    try:
+        return captura_audio.estadisticas(ventana_s)
+    except: return None
 
 def gestionar_actuadores(nivel_db, nivel_co2):
     """Controla LEDs por ruido y Buzzer por CO2"""
-    # 1. Semáforo
-    led_verde.off()
-    led_amarillo.off()
-    led_rojo.off()
-    
-    if nivel_db < UMBRAL_RUIDO_BAJO:
-        led_verde.on()
-    elif UMBRAL_RUIDO_BAJO <= nivel_db <= UMBRAL_RUIDO_ALTO:
-        led_amarillo.on()
-    else:
-        led_rojo.on()
-        
+    # 1. Semáforo (solo se escribe el estado final, sin apagar todo antes,
+    #    para que los LEDs no parpadeen al refrescar varias veces por segundo)
+    if not (led_verde and led_amarillo and led_rojo and buzzer): return "Sin GPIO"
+    nivel_bajo = nivel_db < UMBRAL_RUIDO_BAJO
+    nivel_alto = nivel_db > UMBRAL_RUIDO_ALTO
+    led_verde.value = nivel_bajo
+    led_amarillo.value = not nivel_bajo and not nivel_alto
+    led_rojo.value = nivel_alto
+
     # 2. Buzzer (Alarma CO2)
     status_buzzer = "Silencio"
     if nivel_co2 > ALERTA_CO2_PPM:
-        buzzer.frequency = 3000
-        buzzer.value = 0.5
+        if buzzer.value == 0.0:
+            buzzer.frequency = 3000
+            buzzer.value = 0.5
         status_buzzer = "ALERTA CO2"
     else:
         buzzer.value = 0.0
-        
+
     return status_buzzer
 
-def actualizar_lcd(temp, hum, co2, tvoc, aqi, db, mov):
-    if not lcd:
-        time.sleep(4)
+def paginas_lcd(datos):
+    """Devuelve las páginas de la LCD como pares de líneas de 16 caracteres.
+
+    Los valores van con ancho fijo y la resolución que se lee en pantalla: un
+    dígito que no se ve no provoca escrituras I2C.
+    """
+    mov_str = "SI" if datos["mov"] else "NO"
+    estado_ruido = "OK" if datos["db"] < 85 else "ALTO!"
+    return [
+        (f"T:{datos['temp']:4.1f}C H:{datos['hum']:3.0f}%", f"Ruido: {datos['db']:3.0f} dB"),
+        (f"CO2: {int(datos['co2']):4d} ppm", f"TVOC:{int(datos['tvoc']):4d} AQI:{datos['aqi']}"),
+        (f"Movimiento: {mov_str}", f"Nivel Ruido:{estado_ruido}"),
+    ]
+
+def imprimir_reporte(datos, estado_buzzer, ruido=None):
+    ts = time.strftime("%H:%M:%S")
+    print("-" * 60)
+    print(f"[{ts}] REPORTE DE SENSORES:")
+    print(f"   Temperatura:                 {datos['temp']:.1f} C")
+    print(f"   Humedad:                     {datos['hum']:.0f} %")
+    print(f"   CO2 (Dióxido de Carbono):    {datos['co2']} ppm")
+    print(f"   TVOC (Compuestos Orgánicos): {datos['tvoc']} ppb")
+    print(f"   AQI (Índice Calidad Aire):   {datos['aqi']} (1-5)")
+    print(f"   Ruido:                       {datos['db']} dB")
+    if ruido:
+        print(f"   Ruido (ventana {VENTANA_REPORTE_S:.0f} s):        "
+              f"Leq {ruido['leq']} | Lmax {ruido['lmax']} | Lmin {ruido['lmin']} | "
+              f"L10 {ruido['l10']} | L90 {ruido['l90']} dB")
+    print(f"   Movimiento:                  {'SI' if datos['mov'] else 'NO'}")
+    print(f"   Alarma:                      {estado_buzzer}")
+
+def iso_utc(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+def variables_ausentes():
+    """Columnas sin medición reciente: sensor ausente, caído o inexistente (uv)."""
+    ausentes = ["uv"]
+    for dispositivo, columnas in (("aht", ("temperature", "humidity")), ("ens", ("co2",))):
+        if not planificador.vigente(dispositivo):
+            ausentes.extend(columnas)
+    if not captura:
+        ausentes.append("noise")
+    return ausentes
+
+def enviar_supabase_api(temp, hum, co2, ruido, ts=None, tabla=TABLA_MEDICIONES, estimar=False):
+    """Encola la lectura; el hilo del Subidor la envía por lotes a Supabase.
+
+    Con `estimar`, las variables sin sensor se predicen con los modelos del
+    nodo y se listan en COLUMNA_ESTIMADAS. Una variable sin medición (None)
+    se sube como null, nunca como 0.
+    """
+    redondear = lambda v, d: None if v is None else round(float(v), d)
+    payload = {
+        "node": NODE_ID,
+        "temperature": redondear(temp, 2),
+        "humidity": redondear(hum, 2),
+        "co2": redondear(co2, 1),
+        "noise": redondear(ruido, 1),
+        "uv": None,
+        # La hora de la lectura viaja con ella: una fila reenviada tras un
+        # corte conserva su hora real
+        "measured_at": iso_utc(ts if ts is not None else reloj.time()),
+    }
+    if estimar and estimador:
+        # La predicción corre en el hilo del estimador; la fila se encola al terminar
+        estimador.encolar(payload, variables_ausentes(),
+                          lambda fila, estimadas: subidor.enviar(
+                              tabla, dict(fila, **{COLUMNA_ESTIMADAS: estimadas})))
         return
-    try:
-        # PÁGINA 1
-        lcd.cursor_pos = (0, 0)
-        lcd.write_string(f"T:{temp:.1f}C H:{hum:.0f}%".ljust(16))
-        lcd.cursor_pos = (1, 0)
-        lcd.write_string(f"Ruido: {db} dB".ljust(16))
-        time.sleep(2)
+    subidor.enviar(tabla, payload)
+
+def enviar_agregados(ventana):
+    """Sube el promedio de una ventana cerrada y, si se configuró, sus estadísticas"""
+    variables = ventana["variables"]
+    media = lambda v: variables[v]["mean"] if variables[v] else None
+    enviar_supabase_api(media("temp"), media("hum"), media("co2"), media("db"),
+                        ts=ventana["fin"], estimar=True)
+    if not TABLA_ESTADISTICAS: return
+    fila = {
+        "node": NODE_ID,
+        "window_start": iso_utc(ventana["inicio"]),
+        "window_end": iso_utc(ventana["fin"]),
+        "samples": max((r["n"] for r in variables.values() if r), default=0),
+    }
+    for variable, columna in COLUMNAS_AGREGADAS.items():
+        resumen = variables[variable]
+        for estadistico in ("mean", "min", "max", "std"):
+            fila[f"{columna}_{estadistico}"] = round(resumen[estadistico], 2) if resumen else None
+    subidor.enviar(TABLA_ESTADISTICAS, fila)
 
-        # PÁGINA 2
-        lcd.cursor_pos = (0, 0)
-        lcd.write_string(f"CO2: {int(co2)} ppm".ljust(16))
-        lcd.cursor_pos = (1, 0)
-        lcd.write_string(f"TVOC:{int(tvoc)} AQI:{aqi}".ljust(16))
-        time.sleep(2)
-        
-        # PÁGINA 3
-        mov_str = "SI" if mov else "NO"
-        estado_ruido = "OK" if db < 85 else "ALTO!"
-        lcd.cursor_pos = (0, 0)
-        lcd.write_string(f"Movimiento: {mov_str}".ljust(16))
-        lcd.cursor_pos = (1, 0)
-        lcd.write_string(f"Nivel Ruido:{estado_ruido}".ljust(16))
-        time.sleep(2)
-    except Exception as e:
-        print(f"[Error LCD] {e}")
-
-def enviar_supabase_api(temp, hum, co2, ruido):
-    """Envía datos usando la API REST de Supabase"""
-    if not supabase: return
+# ==============================================================================
+# --- 7. TAREAS CONCURRENTES ---
+# ==============================================================================
 
-    try:
-        payload = {
-            "node": NODE_ID,
-            "temperature": float(f"{temp:.2f}"),
-            "humidity": float(f"{hum:.2f}"),
-            "co2": float(co2),
-            "noise": float(ruido),
-            "uv": 0.0
-        }
-        # Insertar usando el cliente oficial
-        supabase.table("measures").insert(payload).execute()
-        
-    except Exception as e:
-        # Convertir error a string para detectar el código 42501
-        err_str = str(e)
-        if "42501" in err_str or "permission denied" in err_str:
-            print("[ERROR RLS] Permiso denegado en Supabase.")
-            print(" -> SOLUCIÓN: Ve a Supabase > Table Editor > measures > RLS y desactívalo.")
-        else:
-            print(f"[ERROR API] Fallo al enviar: {e}")
+def tarea_adquisicion():
+    # Valores en caché del planificador: aquí no hay transacciones I2C
+    # Los sensores sin lectura vigente vienen como None: la ventana los omite
+    # en vez de promediar ceros, y la LCD sigue mostrando el último valor
+    sensores = planificador.valores()
+    with metricas.medir("db"):
+        db = calcular_decibeles(captura)
+    mov = pir.motion_detected if pir else False
+    lecturas.actualizar(mov=mov, **{k: v for k, v in dict(sensores, db=db).items()
+                                    if v is not None})
+    ventana = agregador.agregar(reloj.time(), temp=sensores["temp"], hum=sensores["hum"],
+                                co2=sensores["co2"], tvoc=sensores["tvoc"], db=db)
+    if ventana:
+        enviar_agregados(ventana)
+
+def tarea_actuadores():
+    datos = lecturas.instantanea()
+    with metricas.medir("actuadores"):
+        estado_alarma["buzzer"] = gestionar_actuadores(datos["db"], datos["co2"])
+
+def tarea_metricas():
+    if TABLA_METRICAS:
+        fila = {"node": NODE_ID, "measured_at": iso_utc(reloj.time())}
+        fila.update(metricas.resumen())
+        subidor.enviar(TABLA_METRICAS, fila)
+
+def tarea_envio():
+    datos = lecturas.instantanea()
+    if not datos["ts"]: return  # Aún no hay lecturas
+    ruido = estadisticas_ruido(captura)
+    if not args.sin_reporte:
+        imprimir_reporte(datos, estado_alarma["buzzer"], ruido)
+    if TABLA_CRUDOS:
+        # El ruido enviado es el Leq de todo el intervalo, no una muestra de 23 ms
+        enviar_supabase_api(datos["temp"], datos["hum"], datos["co2"],
+                            ruido["leq"] if ruido else datos["db"], tabla=TABLA_CRUDOS)
+
+def ejecutar_periodicamente(nombre, periodo, funcion):
+    """Ejecuta `funcion` cada `periodo` segundos hasta que se active `parada`.
+
+    Cada tarea corre en su propio hilo: una tarea lenta (sensores, red) no retrasa
+    a las demás, en particular a la alarma de CO2.
+    """
+    etapa = f"tarea_{nombre.lower()}"
+    while not parada.is_set():
+        inicio = time.monotonic()
+        try:
+            funcion()
+        except Exception as e:
+            metricas.incrementar("errores_tarea")
+            print(f"[ERROR {nombre}] {e}")
+        duracion = time.monotonic() - inicio
+        metricas.observar(etapa, duracion)
+        if duracion > periodo:
+            # La tarea no alcanza su periodo: el nodo se está quedando atrás
+            metricas.incrementar(f"retrasos_{etapa}")
+        parada.wait(max(0.0, periodo - duracion))
+
+TAREAS = [
+    ("ADQUISICION", reloj.periodo(PERIODO_ADQUISICION), tarea_adquisicion),
+    ("ACTUADORES", reloj.periodo(PERIODO_ACTUADORES), tarea_actuadores),
+    ("ENVIO", reloj.periodo(PERIODO_ENVIO), tarea_envio),
+    ("METRICAS", reloj.periodo(PERIODO_METRICAS), tarea_metricas),
+]
+hilos = []
+inicio_ejecucion = time.monotonic()
+
+def imprimir_resumen_simulacion():
+    real_s = time.monotonic() - inicio_ejecucion
+    print("-" * 60)
+    print(f"RESUMEN SIMULACIÓN ({real_s:.1f} s reales, {real_s * reloj.escala:.0f} s simulados):")
+    if hasattr(supabase, "row_counts"):
+        subidas, inserts = supabase.row_counts(), supabase.stats["requests"]
+    else:
+        subidas, inserts = {t: len(f) for t, f in supabase.filas.items()}, supabase.inserts
+    for tabla, filas in subidas.items():
+        print(f"   Filas subidas a {tabla}: {filas}")
+    print(f"   Inserts: {inserts} | Fallos: {subidor.fallos} | En cola: {cola_envio.pendientes()}")
+    print(f"   Transacciones I2C sensores: {planificador.transacciones_i2c}")
+    if pantalla: print(f"   Caracteres enviados a la LCD: {lcd.caracteres_enviados}")
+    if captura: print(f"   Bloques de audio: {captura.niveles._escritos} | Desbordes: {captura.desbordes}")
+    if estimador: print(f"   Valores estimados: {estimador.estimaciones} "
+                        f"(ventanas sin estimar: {estimador.sin_estimar})")
+    print("   Tiempos por etapa (p50 / p95 / máx ms):")
+    resumen = metricas.resumen()
+    for etapa in sorted(metricas.histogramas):
+        print(f"      {etapa:<22} {resumen[etapa + '_p50_ms']:>8} {resumen[etapa + '_p95_ms']:>8} "
+              f"{resumen[etapa + '_max_ms']:>8}")
 
 def exit_handler(signum, frame):
     print("\n[INFO] Apagando...")
-    led_verde.off(); led_amarillo.off(); led_rojo.off()
+    parada.set()
+    for hilo in hilos:
+        hilo.join(timeout=5)
+    planificador.detener()
+    # La ventana parcial queda en la cola en disco y se sube al reiniciar
+    ventana = agregador.cerrar()
+    if ventana:
+        enviar_agregados(ventana)
+    if estimador: estimador.detener()
+    subidor.detener()
+    if args.simulado: imprimir_resumen_simulacion()
+    cola_envio.cerrar()
+    for led in (led_verde, led_amarillo, led_rojo):
+        if led: led.off()
     if buzzer: buzzer.value = 0.0; buzzer.off()
+    if pantalla: pantalla.detener()
     if lcd: 
         lcd.clear()
         lcd.backlight_enabled = False
         lcd.close()
-    if stream: stream.close()
-    if audio: audio.terminate()
+    if captura: captura.cerrar()
     exit(0)
 
 signal.signal(signal.SIGINT, exit_handler)
+signal.signal(signal.SIGTERM, exit_handler)
 
 # ==============================================================================
-# --- 5. BUCLE PRINCIPAL ---
+# --- 8. ARRANQUE ---
 # ==============================================================================
 
 print(f"Nodo: {NODE_ID} | Micrófono USB | PIR GPIO {PIN_PIR}")
-if ens: time.sleep(2) 
-
-while True:
+if ens: reloj.dormir(2)
+
+metricas.medidor("cola_pendientes", cola_envio.pendientes)
+metricas.medidor("subidas_fallidas", lambda: subidor.fallos, "counter")
+metricas.medidor("filas_descartadas", lambda: subidor.descartadas, "counter")
+metricas.medidor("filas_subidas", lambda: subidor.enviadas, "counter")
+metricas.medidor("transacciones_i2c", lambda: planificador.transacciones_i2c, "counter")
+if captura: metricas.medidor("desbordes_audio", lambda: captura.desbordes, "counter")
+if estimador: metricas.medidor("valores_estimados", lambda: estimador.estimaciones, "counter")
+if PUERTO_METRICAS:
     try:
-        # 1. Lectura
-        temp = aht.temperature if aht else 0.0
-        hum = aht.relative_humidity if aht else 0.0
-        if ens and aht:
-            ens.temperature = temp
-            ens.humidity = hum
-        co2 = ens.eCO2 if ens else 0
-        tvoc = ens.TVOC if ens else 0
-        aqi = ens.AQI if ens else 0
-        db = calcular_decibeles(stream)
-        mov = pir.motion_detected if pir else False
-
-        # 2. Control
-        estado_buzzer = gestionar_actuadores(db, co2)
-
-        # 3. Consola
-        ts = time.strftime("%H:%M:%S")
-        print("-" * 60)
-        print(f"[{ts}] REPORTE DE SENSORES:")
-        print(f"   Temperatura:                 {temp:.1f} C")
-        print(f"   Humedad:                     {hum:.0f} %")
-        print(f"   CO2 (Dióxido de Carbono):    {co2} ppm")
-        print(f"   TVOC (Compuestos Orgánicos): {tvoc} ppb")
-        print(f"   AQI (Índice Calidad Aire):   {aqi} (1-5)")
-        print(f"   Ruido:                       {db} dB")
-        print(f"   Movimiento:                  {'SI' if mov else 'NO'}")
-        print(f"   Alarma:                      {estado_buzzer}")
-
-        # 4. Envío a Nube (API)
-        enviar_supabase_api(temp, hum, co2, db)
-
-        # 5. Visualización Local
-        actualizar_lcd(temp, hum, co2, tvoc, aqi, db, mov)
-
-    except KeyboardInterrupt:
-        exit_handler(None, None)
-    except Exception as e:
-        print(f"[ERROR BUCLE] {e}")
-        time.sleep(5)
+        servir_metricas(metricas, PUERTO_METRICAS)
+        print(f"[OK] Métricas en http://0.0.0.0:{PUERTO_METRICAS}/metrics")
+    except OSError as e:
+        print(f"[ERROR] Métricas: {e}")
+
+planificador.iniciar()
+subidor.iniciar()
+if estimador: estimador.iniciar()
+if pantalla: pantalla.iniciar(lambda: paginas_lcd(lecturas.instantanea()))
+for nombre, periodo, funcion in TAREAS:
+    hilo = threading.Thread(target=ejecutar_periodicamente, args=(nombre, periodo, funcion),
+                            name=nombre, daemon=True)
+    hilo.start()
+    hilos.append(hilo)
+print(f"[OK] Tareas activas: {', '.join(nombre for nombre, _, _ in TAREAS)}, SENSORES, SUBIDOR"
+      f"{', ESTIMACION' if estimador else ''}{', LCD' if pantalla else ''}")
+
+# El hilo principal solo espera la señal de apagado (o el fin de --duracion)
+fin_ejecucion = inicio_ejecucion + args.duracion if args.duracion else None
+try:
+    while not parada.is_set():
+        if fin_ejecucion and time.monotonic() >= fin_ejecucion:
+            exit_handler(None, None)
+        parada.wait(1 if not fin_ejecucion else min(1, max(0.0, fin_ejecucion - time.monotonic())))
+except KeyboardInterrupt:
+    exit_handler(None, None)
@@ -0,0 +1,113 @@
+"""
+pantalla.py
+Renderizado de la LCD 16x2 con framebuffer.
+
+El expansor PCF8574 manda cada carácter como varias escrituras I2C y comparte
+el bus con el AHT20 y el ENS160, así que solo se envían los caracteres que
+cambiaron respecto a lo que ya muestra la pantalla, y la página visible solo
+se redibuja si su texto cambió. La rotación de páginas corre en su propio
+hilo; cada cambio de página reescribe casi toda la pantalla, así que conviene
+rotar despacio y con valores de ancho fijo.
+"""
+
+import threading
+import time
+
+# Un salto de cursor cuesta lo mismo que escribir un carácter: huecos sin
+# cambios de hasta este tamaño se reescriben en vez de saltarlos.
+HUECO_MAXIMO = 1
+
+
+def tramos_modificados(actual, nuevo, hueco_maximo=HUECO_MAXIMO):
+    """Tramos (inicio, fin) donde `nuevo` difiere de `actual`."""
+    tramos = []
+    for i, (a, n) in enumerate(zip(actual, nuevo)):
+        if a == n:
+            continue
+        if tramos and i - tramos[-1][1] <= hueco_maximo:
+            tramos[-1][1] = i + 1
+        else:
+            tramos.append([i, i + 1])
+    return [tuple(t) for t in tramos]
+
+
+class PantallaLCD:
+    """Mantiene una copia de la pantalla y escribe solo las diferencias."""
+
+    def __init__(self, lcd, columnas=16, filas=2, periodo_pagina=6.0, periodo_refresco=1.0,
+                 metricas=None):
+        self.lcd = lcd
+        self.metricas = metricas
+        self.columnas = columnas
+        self.filas = filas
+        self.periodo_pagina = periodo_pagina
+        self.periodo_refresco = periodo_refresco
+        self.caracteres_escritos = 0
+        self._lock = threading.Lock()
+        self._parada = threading.Event()
+        self._hilo = None
+        self._pagina = 0
+        self._cambio = None
+        self.invalidar()
+
+    def invalidar(self):
+        """Olvida el contenido conocido: la próxima página se escribe completa."""
+        self._framebuffer = [[None] * self.columnas for _ in range(self.filas)]
+        self._mostradas = None
+
+    def mostrar(self, lineas):
+        """Escribe una página (una cadena por fila) enviando solo los cambios."""
+        t0 = time.perf_counter()
+        with self._lock:
+            try:
+                for fila, texto in enumerate(lineas[:self.filas]):
+                    texto = texto.ljust(self.columnas)[:self.columnas]
+                    actual = self._framebuffer[fila]
+                    for inicio, fin in tramos_modificados(actual, texto):
+                        self.lcd.cursor_pos = (fila, inicio)
+                        self.lcd.write_string(texto[inicio:fin])
+                        actual[inicio:fin] = texto[inicio:fin]
+                        self.caracteres_escritos += fin - inicio
+            except Exception as e:
+                # Tras un fallo del bus no se sabe qué quedó en pantalla
+                self.invalidar()
+                print(f"[Error LCD] {e}")
+        if self.metricas:
+            self.metricas.observar("lcd", time.perf_counter() - t0)
+
+    def iniciar(self, fuente_paginas):
+        """Rota las páginas que devuelve `fuente_paginas()` en un hilo propio.
+
+        Cada `periodo_refresco` segundos (no más rápido que la adquisición)
+        se consulta la página visible, que solo se redibuja si cambió, y se
+        pasa a la siguiente cada `periodo_pagina` segundos.
+        """
+        self._hilo = threading.Thread(target=self._ciclo, args=(fuente_paginas,),
+                                      name="LCD", daemon=True)
+        self._hilo.start()
+
+    def paso(self, paginas, ahora):
+        """Rota a la página que toca en `ahora` y la muestra si su texto cambió."""
+        if self._cambio is None:
+            self._cambio = ahora + self.periodo_pagina
+        while ahora >= self._cambio:
+            self._pagina += 1
+            self._cambio += self.periodo_pagina
+        lineas = tuple(paginas[self._pagina % len(paginas)])
+        if lineas != self._mostradas:
+            self._mostradas = lineas
+            self.mostrar(lineas)
+
+    def _ciclo(self, fuente_paginas):
+        while not self._parada.is_set():
+            try:
+                self.paso(fuente_paginas(), time.monotonic())
+            except Exception as e:
+                print(f"[ERROR LCD] {e}")
+            self._parada.wait(min(self.periodo_refresco,
+                                  max(0.0, self._cambio - time.monotonic())))
+
+    def detener(self, timeout=2):
+        self._parada.set()
+        if self._hilo and self._hilo.is_alive():
+            self._hilo.join(timeout=timeout)
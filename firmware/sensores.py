@@ -0,0 +1,135 @@
+"""
+sensores.py
+Planificador de lecturas I2C: cada dispositivo se lee a su propio ritmo y
+sus valores quedan en caché con la hora de la lectura.
+
+- AHT20: una sola medición (~80 ms) entrega temperatura y humedad juntas.
+  El fabricante recomienda no medir más de una vez cada 2 s (autocalentamiento).
+- ENS160: genera datos nuevos a 1 Hz; se consulta el bit de "dato listo" y
+  solo entonces se leen eCO2/TVOC/AQI en un único bloque. La compensación
+  de temperatura/humedad solo se reescribe cuando cambia de forma apreciable.
+
+Los consumidores leen la caché y nunca disparan transacciones I2C. Los
+dispositivos son drivers de `drivers.py` (reales o simulados). Un valor
+que aún no se ha leído o que lleva más de `vencimiento` periodos sin
+renovarse se entrega como None, nunca como 0.
+"""
+
+import threading
+import time
+
+
+class PlanificadorSensores:
+    """Hilo que sondea AHT20 y ENS160 según su cadencia nativa."""
+
+    def __init__(self, aht=None, ens=None, periodo_aht=2.0, periodo_ens=1.0,
+                 reintento_ens=0.1, delta_temp_comp=0.5, delta_hum_comp=2.0, metricas=None,
+                 vencimiento=5):
+        self.aht = aht
+        self.vencimiento = vencimiento
+        self.metricas = metricas
+        self.ens = ens
+        self.periodo_aht = periodo_aht
+        self.periodo_ens = periodo_ens
+        self.reintento_ens = reintento_ens
+        self.delta_temp_comp = delta_temp_comp
+        self.delta_hum_comp = delta_hum_comp
+        self.transacciones_i2c = 0
+        self.errores = {"aht": 0, "ens": 0}
+        self._cache = {"aht": ({}, 0.0), "ens": ({}, 0.0)}
+        self._compensacion = None
+        self._lock = threading.Lock()
+        self._parada = threading.Event()
+        self._hilo = threading.Thread(target=self._ciclo, name="SENSORES", daemon=True)
+
+    def iniciar(self):
+        self._hilo.start()
+
+    def detener(self, timeout=2):
+        self._parada.set()
+        if self._hilo.is_alive():
+            self._hilo.join(timeout=timeout)
+
+    def ultima(self, dispositivo):
+        """(valores, ts) de la última lectura válida del dispositivo."""
+        with self._lock:
+            valores, ts = self._cache[dispositivo]
+            return dict(valores), ts
+
+    def vigente(self, dispositivo):
+        """True si el dispositivo tiene una lectura de hace menos de `vencimiento` periodos."""
+        _, ts = self.ultima(dispositivo)
+        periodo = self.periodo_aht if dispositivo == "aht" else self.periodo_ens
+        return bool(ts) and time.time() - ts <= self.vencimiento * periodo
+
+    def valores(self):
+        """Últimos temp, hum, co2, tvoc y aqi; None si el dispositivo no tiene
+        una lectura vigente (sin leer todavía, ausente o caído)."""
+        aht = self.ultima("aht")[0] if self.vigente("aht") else {}
+        ens = self.ultima("ens")[0] if self.vigente("ens") else {}
+        return {
+            "temp": aht.get("temp"), "hum": aht.get("hum"),
+            "co2": ens.get("co2"), "tvoc": ens.get("tvoc"), "aqi": ens.get("aqi"),
+        }
+
+    def _guardar(self, dispositivo, valores):
+        with self._lock:
+            self._cache[dispositivo] = (valores, time.time())
+
+    def _ciclo(self):
+        proxima = {"aht": time.monotonic(), "ens": time.monotonic()}
+        while not self._parada.is_set():
+            ahora = time.monotonic()
+            if self.aht and ahora >= proxima["aht"]:
+                self._leer_aht()
+                self._observar("sensor_aht", ahora)
+                proxima["aht"] = ahora + self.periodo_aht
+            if self.ens and ahora >= proxima["ens"]:
+                inicio = time.monotonic()
+                nuevo = self._leer_ens()
+                self._observar("sensor_ens", inicio)
+                proxima["ens"] = ahora + (self.periodo_ens if nuevo else self.reintento_ens)
+            activos = [t for d, t in proxima.items() if getattr(self, d)]
+            if not activos:
+                return
+            self._parada.wait(max(0.0, min(activos) - time.monotonic()))
+
+    def _observar(self, etapa, inicio):
+        if self.metricas:
+            self.metricas.observar(etapa, time.monotonic() - inicio)
+
+    def _leer_aht(self):
+        try:
+            temp, hum = self.aht.medir()
+            self.transacciones_i2c += 1
+            self._guardar("aht", {"temp": temp, "hum": hum})
+        except Exception as e:
+            self.errores["aht"] += 1
+            print(f"[ERROR AHT20] {e}")
+
+    def _leer_ens(self):
+        """Lee el ENS160 si tiene un dato nuevo; devuelve True si lo tenía."""
+        try:
+            self._compensar_ens()
+            self.transacciones_i2c += 1
+            if not self.ens.dato_nuevo():
+                return False
+            self._guardar("ens", self.ens.leer())
+            self.transacciones_i2c += 1
+            return True
+        except Exception as e:
+            self.errores["ens"] += 1
+            print(f"[ERROR ENS160] {e}")
+            return True
+
+    def _compensar_ens(self):
+        aht, ts = self.ultima("aht")
+        if not ts: return
+        temp, hum = aht["temp"], aht["hum"]
+        if self._compensacion:
+            temp_comp, hum_comp = self._compensacion
+            if abs(temp - temp_comp) < self.delta_temp_comp and abs(hum - hum_comp) < self.delta_hum_comp:
+                return
+        self.ens.compensar(temp, hum)
+        self.transacciones_i2c += 2
+        self._compensacion = (temp, hum)
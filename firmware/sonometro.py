@@ -0,0 +1,247 @@
+"""
+sonometro.py
+Captura continua del micrófono USB y motor de sonómetro: ponderación en
+frecuencia (A, C o Z), calibración por micrófono y ponderación temporal
+(Fast/Slow), con estadísticas Leq, Lmax, Lmin, L10 y L90 sobre ventanas
+configurables.
+
+PyAudio entrega cada bloque de CHUNK muestras en un callback; el bloque se
+filtra manteniendo el estado de los filtros entre bloques y sus niveles se
+guardan en un buffer circular preasignado, de modo que ningún bloque se
+descarta.
+
+Benchmark (CPU por segundo de audio, sin hardware):
+    python3 firmware/sonometro.py --bench --ponderacion A --tiempo F
+"""
+
+import math
+import threading
+import time
+import numpy as np
+from scipy import signal
+
+# Con calibración 20 dB y ponderación Z se reproduce el cálculo original:
+# 20*log10(rms) + 20
+CALIBRACION_DB = 20.0
+NIVEL_MINIMO_DB = 0.0
+
+# Constantes de tiempo IEC 61672 (s)
+CONSTANTES_TIEMPO = {"F": 0.125, "S": 1.0}
+
+# Polos analógicos (Hz) de las curvas IEC 61672
+_F1, _F2, _F3, _F4 = 20.598997, 107.65265, 737.86223, 12194.217
+
+# Columnas del buffer de niveles
+ENERGIA, PT_FIN, PT_MAX, PT_MIN = range(4)
+
+# Valores de PyAudio (paContinue, paInputOverflow) para no depender de la
+# librería en este módulo
+PA_CONTINUE = 0
+PA_INPUT_OVERFLOW = 0x2
+
+
+def diseno_ponderacion(ponderacion, rate):
+    """Filtro digital (SOS) de ponderación A o C normalizado a 0 dB en 1 kHz.
+
+    Devuelve None para ponderación Z (sin filtro).
+    """
+    ponderacion = ponderacion.upper()
+    if ponderacion == "Z":
+        return None
+    w = lambda f: -2 * math.pi * f
+    if ponderacion == "A":
+        ceros = [0, 0, 0, 0]
+        polos = [w(_F1), w(_F1), w(_F2), w(_F3), w(_F4), w(_F4)]
+    elif ponderacion == "C":
+        ceros = [0, 0]
+        polos = [w(_F1), w(_F1), w(_F4), w(_F4)]
+    else:
+        raise ValueError(f"Ponderación desconocida: {ponderacion!r} (use A, C o Z)")
+    z, p, k = signal.bilinear_zpk(ceros, polos, 1.0, rate)
+    sos = signal.zpk2sos(z, p, k)
+    _, h = signal.sosfreqz(sos, worN=[1000.0], fs=rate)
+    sos[0, :3] /= abs(h[0])
+    return sos
+
+
+class BufferNiveles:
+    """Buffer circular preasignado con los niveles de cada bloque.
+
+    Cada fila guarda la energía ponderada del bloque (base del Leq) y el
+    nivel con ponderación temporal al final, máximo y mínimo del bloque.
+    """
+
+    def __init__(self, capacidad, columnas=4):
+        self._filas = np.zeros((capacidad, columnas), dtype=np.float64)
+        self._capacidad = capacidad
+        self._escritos = 0
+        self._lock = threading.Lock()
+
+    def agregar(self, *valores):
+        with self._lock:
+            self._filas[self._escritos % self._capacidad] = valores
+            self._escritos += 1
+
+    def ultimos(self, n):
+        """Copia de las últimas `n` filas, de la más antigua a la más reciente."""
+        with self._lock:
+            n = min(n, self._escritos, self._capacidad)
+            fin = self._escritos % self._capacidad
+            if n <= fin:
+                return self._filas[fin - n:fin].copy()
+            return np.concatenate((self._filas[fin - n:], self._filas[:fin]))
+
+
+class MotorSonometro:
+    """Filtra bloques de audio consecutivos y calcula sus niveles.
+
+    Los estados de los filtros (ponderación en frecuencia y temporal) se
+    conservan entre bloques, así que procesar el audio por bloques equivale
+    a filtrarlo de una sola vez.
+    """
+
+    def __init__(self, rate=44100, chunk=1024, ponderacion="A", tiempo="F",
+                 calibracion_db=CALIBRACION_DB):
+        if tiempo.upper() not in CONSTANTES_TIEMPO:
+            raise ValueError(f"Ponderación temporal desconocida: {tiempo!r} (use F o S)")
+        self.rate = rate
+        self.ponderacion = ponderacion.upper()
+        self.tiempo = tiempo.upper()
+        self.calibracion_db = calibracion_db
+        self._sos = diseno_ponderacion(self.ponderacion, rate)
+        self._zi = np.zeros((self._sos.shape[0], 2)) if self._sos is not None else None
+        # Integrador exponencial y[n] = a*y[n-1] + (1-a)*x[n]^2
+        a = math.exp(-1.0 / (CONSTANTES_TIEMPO[self.tiempo] * rate))
+        self._b_tiempo = np.array([1.0 - a])
+        self._a_tiempo = np.array([1.0, -a])
+        self._zi_tiempo = np.zeros(1)
+        self._muestras = np.empty(chunk, dtype=np.float64)
+        self._cuadrados = np.empty(chunk, dtype=np.float64)
+
+    def procesar(self, ints):
+        """Procesa un bloque int16 y devuelve (energía, pt_fin, pt_max, pt_min)."""
+        n = len(ints)
+        if n > len(self._muestras):
+            self._muestras = np.empty(n, dtype=np.float64)
+            self._cuadrados = np.empty(n, dtype=np.float64)
+        muestras = self._muestras[:n]
+        np.copyto(muestras, ints)
+        if self._sos is not None:
+            muestras, self._zi = signal.sosfilt(self._sos, muestras, zi=self._zi)
+        cuadrados = np.multiply(muestras, muestras, out=self._cuadrados[:n])
+        energia = float(cuadrados.mean())
+        ponderado, self._zi_tiempo = signal.lfilter(self._b_tiempo, self._a_tiempo,
+                                                    cuadrados, zi=self._zi_tiempo)
+        return energia, float(ponderado[-1]), float(ponderado.max()), float(ponderado.min())
+
+    def a_db(self, energia):
+        if energia <= 0: return NIVEL_MINIMO_DB
+        return 10 * math.log10(energia) + self.calibracion_db
+
+
+class CapturaAudio:
+    """Lee el micrófono en modo callback y expone estadísticas por ventana.
+
+    `microfono` es un driver de `drivers.py` (PyAudio o simulado).
+    """
+
+    def __init__(self, microfono, rate=44100, chunk=1024, canales=1,
+                 ventana_max_s=900, ponderacion="A", tiempo="F",
+                 calibracion_db=CALIBRACION_DB, metricas=None):
+        self.microfono = microfono
+        self.metricas = metricas
+        self.rate = rate
+        self.chunk = chunk
+        self.canales = canales
+        self.motor = MotorSonometro(rate, chunk * canales, ponderacion, tiempo, calibracion_db)
+        self.niveles = BufferNiveles(math.ceil(ventana_max_s * rate / chunk))
+        self.desbordes = 0
+
+    def abrir(self):
+        self.microfono.abrir(self._callback, self.rate, self.chunk, self.canales)
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        if status & PA_INPUT_OVERFLOW:
+            self.desbordes += 1
+        inicio = time.perf_counter()
+        ints = np.frombuffer(in_data, dtype=np.int16)
+        if len(ints):
+            self.niveles.agregar(*self.motor.procesar(ints))
+        if self.metricas:
+            self.metricas.observar("db_bloque", time.perf_counter() - inicio)
+        return (None, PA_CONTINUE)
+
+    def bloques_en(self, ventana_s):
+        return max(1, int(round(ventana_s * self.rate / self.chunk)))
+
+    def estadisticas(self, ventana_s):
+        """Leq, Lmax, Lmin, L10 y L90 (dB) de los últimos `ventana_s` segundos.
+
+        Leq integra la energía ponderada en frecuencia; Lmax, Lmin y los
+        percentiles usan además la ponderación temporal (Fast/Slow).
+        """
+        filas = self.niveles.ultimos(self.bloques_en(ventana_s))
+        if not len(filas):
+            return {"leq": NIVEL_MINIMO_DB, "lmax": NIVEL_MINIMO_DB, "lmin": NIVEL_MINIMO_DB,
+                    "l10": NIVEL_MINIMO_DB, "l90": NIVEL_MINIMO_DB}
+        # log10 es monótono: los percentiles se calculan sobre la energía
+        p90, p10 = np.percentile(filas[:, PT_FIN], [90, 10])
+        a_db = self.motor.a_db
+        return {
+            "leq": round(a_db(float(filas[:, ENERGIA].mean())), 1),
+            "lmax": round(a_db(float(filas[:, PT_MAX].max())), 1),
+            "lmin": round(a_db(float(filas[:, PT_MIN].min())), 1),
+            "l10": round(a_db(float(p90)), 1),
+            "l90": round(a_db(float(p10)), 1),
+        }
+
+    def cerrar(self):
+        self.microfono.cerrar()
+
+
+# ==============================================================================
+# --- BENCHMARK ---
+# ==============================================================================
+
+def benchmark(segundos=60.0, rate=44100, chunk=1024, ponderacion="A", tiempo="F"):
+    """Mide el CPU consumido por segundo de audio procesado (un solo núcleo)."""
+    rng = np.random.default_rng(0)
+    t = np.arange(chunk) / rate
+    tono = 3000 * np.sin(2 * math.pi * 1000 * t)
+    bloques = [np.clip(tono + rng.normal(0, 800, chunk), -32768, 32767).astype(np.int16)
+               for _ in range(16)]
+    motor = MotorSonometro(rate, chunk, ponderacion, tiempo)
+    buffer = BufferNiveles(1024)
+    n_bloques = int(segundos * rate / chunk)
+    inicio = time.process_time()
+    for i in range(n_bloques):
+        buffer.agregar(*motor.procesar(bloques[i % len(bloques)]))
+    cpu = time.process_time() - inicio
+    audio_s = n_bloques * chunk / rate
+    return {
+        "audio_s": audio_s,
+        "cpu_s": cpu,
+        "cpu_pct": 100.0 * cpu / audio_s,
+        "us_por_bloque": 1e6 * cpu / n_bloques,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Motor de sonómetro Skiliket")
+    parser.add_argument("--bench", action="store_true", help="ejecutar benchmark de CPU")
+    parser.add_argument("--segundos", type=float, default=60.0, help="segundos de audio a procesar")
+    parser.add_argument("--rate", type=int, default=44100)
+    parser.add_argument("--chunk", type=int, default=1024)
+    parser.add_argument("--ponderacion", default="A", choices=["A", "C", "Z"])
+    parser.add_argument("--tiempo", default="F", choices=["F", "S"])
+    args = parser.parse_args()
+    if args.bench:
+        r = benchmark(args.segundos, args.rate, args.chunk, args.ponderacion, args.tiempo)
+        print(f"Ponderación {args.ponderacion}/{args.tiempo} @ {args.rate} Hz, bloques de {args.chunk}")
+        print(f"   Audio procesado:  {r['audio_s']:.1f} s")
+        print(f"   CPU usado:        {r['cpu_s']:.3f} s")
+        print(f"   CPU por segundo de audio: {r['cpu_pct']:.2f} %")
+        print(f"   Tiempo por bloque:        {r['us_por_bloque']:.0f} us")
+    else:
+        parser.print_help()
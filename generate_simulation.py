@@ -1,41 +1,59 @@
 """
 generate_simulation.py
-Generates 1 year of simulated IoT measures (with temperature) 
+Generates 1 year of simulated IoT measures (with temperature)
 for the campus nodes stored in the database.
+
+The timestamp x node grid is computed with NumPy array operations in shards
+(a span of days x a group of nodes) with per-node random streams derived from
+the seed, optionally across several processes. Chunks are inserted with a
+few concurrent requests (resumable with --resume) or streamed to a
+CSV/Parquet/COPY file with --output.
 """
 
 from supabase import create_client
 from dotenv import load_dotenv
 import os
-import math
+import argparse
+import collections
+import gzip
+import json
 import random
-from datetime import datetime, timedelta, time, date, timezone
-from typing import Tuple, List, Dict
+import time as timer
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+import pandas as pd
+from scipy import signal
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict
+
+from skiliket import local_backend
+from skiliket.academic_calendar import AcademicCalendar, official_holidays
 
 # ---------- CONFIG ----------
 START_DATE = datetime(2025, 11, 15)
 YEAR_LENGTH_DAYS = 18
 STEP_MINUTES = 5
 BATCH_SIZE = 1000
+INSERT_WORKERS = 4  # concurrent insert requests
+MAX_RETRIES = 5
 SCHEMA = "public"
+CHUNK_DAYS = 30  # days per time shard (bounds memory on long runs)
+SHARD_NODES = 50  # nodes per node shard
 
 
 load_dotenv()
 
-SUPABASE_URL = os.environ.get("SUPABASE_URL")
-SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise SystemExit("Set SUPABASE_URL and SUPABASE_KEY environment variables.")
+def get_client():
+    if local_backend.use_local_backend():
+        return local_backend.client_from_env()
+    SUPABASE_URL = os.environ.get("SUPABASE_URL")
+    SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 
-client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        raise SystemExit("Set SUPABASE_URL and SUPABASE_KEY environment variables.")
 
-# UPDATED NODES: join with locations and parse coordinates
-# Fetch nodes and locations separately and join in Python (filter locations with to_dt > now)
-nodes_raw = client.schema(SCHEMA).from_("nodes").select("*").execute().data or []
-print ("Fetched nodes:", len(nodes_raw))
-locations_raw = client.schema(SCHEMA).from_("locations").select("*").execute().data or []
-print ("Fetched locations:", len(locations_raw))
+    return create_client(SUPABASE_URL, SUPABASE_KEY)
 
 def parse_point(pt: str):
     pt = pt.strip("()")
@@ -63,213 +81,637 @@ def parse_dt(dt_str: str) -> datetime:
     else:
         return dt.astimezone(timezone.utc)
 
-now = datetime.now(timezone.utc)
-
-# keep only locations with to_dt > now
-current_locations = [l for l in locations_raw if (parse_dt(l.get("to_dt")) > now or l.get("to_dt") is None)]
-
-print ("Using current locations:", len(current_locations))
-
-# join nodes with their current location (if any)
-NODES = []
-for n in nodes_raw:
-    loc = next((l for l in current_locations if l.get("node") == n.get("id")), None)
-    if not loc:
-        continue
-    lat, lon = parse_point(loc.get("location", "(0,0)"))
-    NODES.append({
-        "id": n.get("id"),
-        "name": n.get("name", "Unknown"),
-        "lat": lat,
-        "lon": lon,
-    })
-
-# ---------- Helpers ----------
-def nth_monday_of_month(year: int, month: int, n: int) -> date:
-    d = date(year, month, 1)
-    days_to_mon = (0 - d.weekday()) % 7
-    first_monday = d + timedelta(days=days_to_mon)
-    return first_monday + timedelta(weeks=(n - 1))
-
-def semester_ranges_for_year(year:int) -> List[Tuple[datetime, datetime]]:
-    s1_start = datetime.combine(nth_monday_of_month(year, 2, 2), time(0,0))
-    s1_end = datetime.combine(nth_monday_of_month(year, 6, 2), time(23,59,59))
-    s2_start = datetime.combine(nth_monday_of_month(year, 8, 2), time(0,0))
-    s2_end = datetime.combine(nth_monday_of_month(year, 12, 1), time(23,59,59))
-    return [(s1_start, s1_end), (s2_start, s2_end)]
-
-TEC_PATTERN = [1,2,3,4,5,6, 1,2,3,4,5,6, 1,2,3,4,5]
-PATTERN_LEN = len(TEC_PATTERN)
-
-def week_phase_for_dt(dt: datetime, semester_ranges):
-    for (start, end) in semester_ranges:
-        if start <= dt <= end:
-            days = (dt.date() - start.date()).days
-            return TEC_PATTERN[(days // 7) % PATTERN_LEN]
-    return 0
+def load_nodes(client, schema: str = SCHEMA) -> List[Dict]:
+    """Nodes joined with their current location (locations with to_dt > now)."""
+    # Fetch nodes and locations separately and join in Python
+    nodes_raw = client.schema(schema).from_("nodes").select("*").execute().data or []
+    print ("Fetched nodes:", len(nodes_raw))
+    locations_raw = client.schema(schema).from_("locations").select("*").execute().data or []
+    print ("Fetched locations:", len(locations_raw))
+
+    now = datetime.now(timezone.utc)
+
+    # keep only locations with to_dt > now
+    current_locations = [l for l in locations_raw if (parse_dt(l.get("to_dt")) > now or l.get("to_dt") is None)]
+
+    print ("Using current locations:", len(current_locations))
+
+    nodes = []
+    for n in nodes_raw:
+        loc = next((l for l in current_locations if l.get("node") == n.get("id")), None)
+        if not loc:
+            continue
+        lat, lon = parse_point(loc.get("location", "(0,0)"))
+        nodes.append({
+            "id": n.get("id"),
+            "name": n.get("name", "Unknown"),
+            "lat": lat,
+            "lon": lon,
+        })
+    return nodes
+
+def synthetic_nodes(count: int) -> List[Dict]:
+    """`count` nodes cycling through the known locations (no database needed)."""
+    names = list(LOCATIONS) + ["Unknown"]
+    return [{"id": i + 1, "name": names[i % len(names)], "lat": 0.0, "lon": 0.0}
+            for i in range(count)]
+
+# ---------- Locations ----------
+# base: occupancy level; phase: multiplier per week phase (0-6);
+# peak: (from_hour, to_hour, multiplier); the rest are per-sensor offsets
+LOCATIONS = {
+    "Gym": {
+        "base": 0.7, "phase": [1.0, 1.2, 1.2, 1.2, 1.0, 0.7, 1.0], "peak": (17, 21, 1.3),
+        "temp_offset": 1.5, "vent": 0.9, "noise_base": 50, "uv_indoor": 0.25,
+    },
+    "Food center": {
+        "base": 0.9, "phase": [1.0, 1.15, 1.15, 1.15, 1.0, 0.8, 1.0], "peak": (12, 14, 1.8),
+        "temp_offset": 1.0, "vent": 0.8, "noise_base": 60, "uv_indoor": 0.4,
+    },
+    "Library": {
+        "base": 0.5, "phase": [0.9, 0.9, 0.9, 0.9, 1.2, 1.4, 0.9], "peak": (18, 23, 1.4),
+        "temp_offset": 0.5, "vent": 0.7, "noise_base": 35, "uv_indoor": 0.15,
+    },
+}
+DEFAULT_LOCATION = {
+    "base": 1.0, "phase": [1.0] * 7, "peak": (0, 0, 1.0),
+    "temp_offset": 1.0, "vent": 0.85, "noise_base": 45, "uv_indoor": 0.3,
+}
+
+def location_params(nodes: List[Dict]) -> Dict[str, np.ndarray]:
+    """Per-node parameter arrays (shape (N,), phase (N, 7))."""
+    locs = [LOCATIONS.get(n["name"], DEFAULT_LOCATION) for n in nodes]
+    params = {k: np.array([l[k] for l in locs], dtype=float)
+              for k in ("base", "temp_offset", "vent", "noise_base", "uv_indoor")}
+    params["phase"] = np.array([l["phase"] for l in locs], dtype=float)
+    peaks = np.array([l["peak"] for l in locs], dtype=float)
+    params["peak_from"], params["peak_to"], params["peak_mult"] = peaks.T
+    return params
+
+# ---------- Correlated noise ----------
+# Correlation time (minutes) of each model's noise: AR(1) with phi = exp(-step / tau)
+NOISE_TAU_MINUTES = {"occupancy": 30, "temperature": 60, "humidity": 90, "co2": 20,
+                     "noise": 10, "uv": 30}
+CO2_TAU_MINUTES = 25  # CO2 build-up/decay time constant at vent = 1.0
+
+def ar_noise(rng, scale, shape, tau_minutes, step_minutes) -> np.ndarray:
+    """Stationary AR(1) noise (T, N) with standard deviation `scale`.
+
+    Each node column is filtered along time in one lfilter call. The state
+    before the first step is drawn from the stationary distribution, so a
+    shard does not need the end state of the previous one.
+    """
+    phi = np.exp(-step_minutes / tau_minutes)
+    innovations = rng.normal(0, scale * np.sqrt(1 - phi ** 2), shape)
+    before = rng.normal(0, scale, (1, shape[1]))
+    # Filtering the transposed view runs along contiguous memory (faster than axis=0)
+    out, _ = signal.lfilter([1.0], [1.0, -phi], innovations.T, zi=(phi * before).T)
+    return out.T
+
+def first_order_lag(x, alpha) -> np.ndarray:
+    """y[t] = y[t-1] + alpha * (x[t] - y[t-1]) per column, starting at steady state x[0]."""
+    y = np.empty_like(x)
+    for a in np.unique(alpha):
+        cols = alpha == a
+        y[:, cols], _ = signal.lfilter([a], [1.0, a - 1.0], x[:, cols], axis=0,
+                                       zi=(1 - a) * x[:1, cols])
+    return y
 
 # ---------- Occupancy ----------
-def occupancy_multiplier(dt: datetime, location_name: str, semester_ranges) -> float:
-    weekday = dt.weekday()
-    hour = dt.hour + dt.minute / 60
-
-    if weekday == 6: dow = 0.05
-    elif weekday == 5: dow = 0.3
-    else: dow = 1.0
-
-    if 7 <= hour < 9: hour_pref = 0.9
-    elif 9 <= hour < 12: hour_pref = 1.0
-    elif 12 <= hour < 14: hour_pref = 1.2
-    elif 14 <= hour < 17: hour_pref = 0.9
-    elif 17 <= hour < 21: hour_pref = 1.1
-    else: hour_pref = 0.2
-
-    phase = week_phase_for_dt(dt, semester_ranges)
-
-    if phase == 0:
-        phase_factor = 0.6
-    elif phase in (1,2,3):
-        phase_factor = 1.0
-    elif phase == 4:
-        phase_factor = 0.9
-    elif phase == 5:
-        phase_factor = 0.6
-    elif phase == 6:
-        phase_factor = 0.5
-    else:
-        phase_factor = 1.0
-
-    if location_name == "Gym":
-        base = 0.7
-        loc_pref = base * (1.2 if phase in (1,2,3) else 0.7 if phase==5 else 1.0)
-        if 17 <= hour < 21: loc_pref *= 1.3
-    elif location_name == "Food center":
-        base = 0.9
-        loc_pref = base * (1.15 if phase in (1,2,3) else 0.8 if phase==5 else 1.0)
-        if 12 <= hour < 14: loc_pref *= 1.8
-    elif location_name == "Library":
-        base = 0.5
-        loc_pref = base * (1.4 if phase==5 else 1.2 if phase==4 else 0.9)
-        if 18 <= hour < 23: loc_pref *= 1.4
-    else:
-        loc_pref = 1.0
+PHASE_FACTOR = np.array([0.6, 1.0, 1.0, 1.0, 0.9, 0.6, 0.5])
+DAY_TYPE_FACTOR = np.array([1.0, 0.3, 0.05])             # weekday, Saturday, Sunday/holiday
+HOUR_PREF = np.array([0.2, 0.9, 1.0, 1.2, 0.9, 1.1, 0.2])  # per academic_calendar.HOUR_EDGES bucket
 
-    occ = dow * hour_pref * phase_factor * loc_pref
-    return max(0.0, min(1.5, occ + random.gauss(0, 0.05)))
+def occupancy(cal: AcademicCalendar, loc, rng) -> np.ndarray:
+    """Occupancy (T, N) from the calendar arrays (T,) and node params."""
+    h = cal.hour[:, None]
+    peak = np.where((loc["peak_from"] <= h) & (h < loc["peak_to"]), loc["peak_mult"], 1.0)
+    loc_pref = loc["base"] * loc["phase"][:, cal.phase].T * peak
+
+    occ = (DAY_TYPE_FACTOR[cal.day_type] * HOUR_PREF[cal.hour_bucket]
+           * PHASE_FACTOR[cal.phase])[:, None] * loc_pref
+    occ += ar_noise(rng, 0.05, occ.shape, NOISE_TAU_MINUTES["occupancy"], cal.step_minutes)
+    return np.clip(occ, 0.0, 1.5)
 
 # ---------- Temperature ----------
-def temperature_from_season_and_time(dt: datetime, location_name: str, occ: float) -> float:
-    # Seasonal baseline
-    month = dt.month
-    if month in (12,1,2): base = 17  # Winter
-    elif month in (3,4,5): base = 22  # Spring
-    elif month in (6,7,8): base = 26  # Summer
-    else: base = 21                   # Autumn
+# Baselines by academic_calendar season (winter Dec-Feb, spring, summer, autumn)
+SEASON_TEMP = np.array([17, 22, 26, 21], dtype=float)
+SEASON_HUMIDITY = np.array([35, 45, 50, 55], dtype=float)
 
+def temperature(cal: AcademicCalendar, occ, loc, rng) -> np.ndarray:
     # Daily curve using sine wave
-    hour = dt.hour + dt.minute / 60
-    daily_variation = 6 * math.sin((hour - 14) / 24 * 2 * math.pi)
-
-    # Indoor adjustment per location
-    indoor_factor = {"Gym": 1.5, "Food center": 1.0, "Library": 0.5}.get(location_name, 1.0)
-
+    daily_variation = 6 * np.sin((cal.hour - 14) / 24 * 2 * np.pi)
     # Occupancy warms rooms slightly
-    occ_heat = occ * 1.8
-
-    temp = base + daily_variation + occ_heat + indoor_factor
-    temp += random.gauss(0, 0.6)
-
-    return max(10, min(40, temp))
+    temp = (SEASON_TEMP[cal.season] + daily_variation)[:, None] + occ * 1.8 + loc["temp_offset"]
+    temp += ar_noise(rng, 0.6, temp.shape, NOISE_TAU_MINUTES["temperature"], cal.step_minutes)
+    return np.clip(temp, 10, 40)
 
 # ---------- Other sensors ----------
-def uv_from_time(dt: datetime, cloud_factor: float=1.0) -> float:
-    hour = dt.hour + dt.minute/60
-    angle = (hour - 13)/12 * math.pi
-    uv_base = max(0.0, math.cos(angle))
-    return uv_base * 8.0 * cloud_factor
-
-def co2_from_occ(occ: float, location_name: str) -> float:
-    base = 420
-    vent = {"Food center":0.8, "Gym":0.9, "Library":0.7}.get(location_name, 0.85)
-    rise = occ * (500/vent)
-    return base + rise + random.gauss(0,10)
-
-def humidity_from_occ(dt, occ, location_name):
-    month = dt.month
-    if month in (12,1,2): seasonal = 35
-    elif month in (3,4,5): seasonal = 45
-    elif month in (6,7,8): seasonal = 50
-    else: seasonal = 55
-    val = seasonal + occ*8 + random.gauss(0,2)
-    return max(10, min(90, val))
-
-def noise_from_occ(occ, location_name):
-    base = {"Library":35,"Gym":50,"Food center":60}.get(location_name,45)
-    val = base + occ*25 + random.gauss(0,3)
-    return max(20, min(120, val))
+def uv(cal: AcademicCalendar, occ, loc, rng) -> np.ndarray:
+    angle = (cal.hour - 13) / 12 * np.pi
+    cloud = np.where(rng.random(occ.shape) < 0.05, 0.9, 1.0)
+    uv_raw = np.maximum(0.0, np.cos(angle))[:, None] * 8.0 * cloud
+    val = uv_raw * loc["uv_indoor"] * (0.5 + 0.5 * occ)
+    val += ar_noise(rng, 0.05, occ.shape, NOISE_TAU_MINUTES["uv"], cal.step_minutes)
+    return np.maximum(0.0, val)
+
+def co2(cal: AcademicCalendar, occ, loc, rng) -> np.ndarray:
+    # The room level follows the occupancy-driven target with a first-order
+    # lag; poorly ventilated rooms fill up and clear out more slowly
+    target = 420 + occ * (500 / loc["vent"])
+    alpha = 1 - np.exp(-cal.step_minutes * loc["vent"] / CO2_TAU_MINUTES)
+    level = first_order_lag(target, alpha)
+    return level + ar_noise(rng, 10, occ.shape, NOISE_TAU_MINUTES["co2"], cal.step_minutes)
+
+def humidity(cal: AcademicCalendar, occ, rng) -> np.ndarray:
+    val = SEASON_HUMIDITY[cal.season][:, None] + occ * 8
+    val += ar_noise(rng, 2, occ.shape, NOISE_TAU_MINUTES["humidity"], cal.step_minutes)
+    return np.clip(val, 10, 90)
+
+def noise(cal: AcademicCalendar, occ, loc, rng) -> np.ndarray:
+    val = loc["noise_base"] + occ * 25
+    val += ar_noise(rng, 3, occ.shape, NOISE_TAU_MINUTES["noise"], cal.step_minutes)
+    return np.clip(val, 20, 120)
 
 # ---------- Main generation ----------
-def generate_and_insert():
-    print("Using existing nodes from DB:", len(NODES))
-
-    semester_ranges = semester_ranges_for_year(START_DATE.year)
-    semester_ranges += semester_ranges_for_year(START_DATE.year - 1)
-    semester_ranges += semester_ranges_for_year(START_DATE.year + 1)
-
-    dt = START_DATE
-    end_dt = START_DATE + timedelta(days=YEAR_LENGTH_DAYS)
-    step = timedelta(minutes=STEP_MINUTES)
-
-    batch = []
-    total = 0
-
+def simulate_sensors(nodes: List[Dict], cal: AcademicCalendar, rng) -> Dict[str, np.ndarray]:
+    """(T, N) array per sensor for every step of `cal` and node."""
+    loc = location_params(nodes)
+    occ = occupancy(cal, loc, rng)
+    spike = np.where(rng.random(occ.shape) < 0.001, 3.0, 1.0)
+    return {
+        "temperature": temperature(cal, occ, loc, rng).round(2),
+        "humidity": humidity(cal, occ, rng).round(2),
+        "co2": co2(cal, occ * spike, loc, rng).round(1),
+        "noise": noise(cal, occ * spike, loc, rng).round(2),
+        "uv": uv(cal, occ, loc, rng).round(3),
+    }
+
+def to_frame(nodes: List[Dict], cal: AcademicCalendar, sensors: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """Measures rows in time-major order from the (T, N) sensor arrays."""
+    T, N = len(cal), len(nodes)
+    df = pd.DataFrame({"node": np.tile([n["id"] for n in nodes], T)})
+    for col, values in sensors.items():
+        df[col] = values.ravel()
+    df["measured_at"] = np.repeat(np.datetime_as_string(cal.times, unit="s"), N)
+    return df
+
+def simulate(nodes: List[Dict], cal: AcademicCalendar, rng) -> pd.DataFrame:
+    """Measures of every node at every step of `cal`, time-major order."""
+    return to_frame(nodes, cal, simulate_sensors(nodes, cal, rng))
+
+def calendar_overrides(path=None, official=False, start=START_DATE, days=YEAR_LENGTH_DAYS) -> Dict:
+    """Holidays and vacations from a JSON file ({"holidays": [...], "vacations": [[first, last], ...]},
+    ISO dates) plus, if `official`, the statutory holidays of the simulated years."""
+    overrides = {"holidays": [], "vacations": []}
+    if path:
+        with open(path) as f:
+            loaded = json.load(f)
+        overrides["holidays"] += loaded.get("holidays", [])
+        overrides["vacations"] += [list(v) for v in loaded.get("vacations", [])]
+    if official:
+        years = range(start.year, (start + timedelta(days=days)).year + 1)
+        overrides["holidays"] += [d.isoformat() for d in official_holidays(years)]
+    return overrides
+
+def build_calendar(start: datetime, days: float, step_minutes: int = STEP_MINUTES,
+                   overrides: Dict = None) -> AcademicCalendar:
+    overrides = overrides or {}
+    return AcademicCalendar(start, start + timedelta(days=days), step_minutes,
+                            holidays=overrides.get("holidays", ()),
+                            vacations=overrides.get("vacations", ()))
+
+class NodeStreams:
+    """One Generator per node, seeded from (seed, shard, node id).
+
+    Draws of shape (T, N) take column j from node j's own stream, so a node's
+    values do not depend on which other nodes share its shard.
+    """
+
+    def __init__(self, seed: int, shard: int, node_ids):
+        self.generators = [np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(shard, int(n))))
+                           for n in node_ids]
+
+    def _stack(self, draw, shape):
+        T, N = shape
+        out = np.empty((T, N))
+        for j, g in enumerate(self.generators):
+            out[:, j] = draw(g, T)
+        return out
+
+    def normal(self, loc, scale, shape):
+        return self._stack(lambda g, T: g.normal(loc, scale, T), shape)
+
+    def random(self, shape):
+        return self._stack(lambda g, T: g.random(T), shape)
+
+def _simulate_shard(task):
+    # Only the numeric arrays travel back from the worker process
+    nodes, cal, seed, shard = task
+    return simulate_sensors(nodes, cal, NodeStreams(seed, shard, [n["id"] for n in nodes]))
+
+def _merge_node_shards(nodes, cal, parts: List[Dict[str, np.ndarray]]) -> pd.DataFrame:
+    """One time shard as rows, joining its node groups side by side."""
+    sensors = {col: np.concatenate([p[col] for p in parts], axis=1) for col in parts[0]}
+    return to_frame(nodes, cal, sensors)
+
+def iter_chunks(nodes, start: datetime, days: float, step_minutes: int = STEP_MINUTES,
+                seed=None, chunk_days: int = CHUNK_DAYS, calendar: AcademicCalendar = None,
+                workers: int = 1, shard_nodes: int = SHARD_NODES):
+    """Yield DataFrames of simulated measures covering [start, start + days).
+
+    The run is split into shards of `chunk_days` x `shard_nodes` nodes, each
+    with its own random streams (see NodeStreams). The data only depends on
+    the seed, the nodes and chunk_days, so any number of `workers` processes
+    gives the same rows. Chunks are yielded in time order.
+    """
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+        print("Seed:", seed)
+    cal = calendar or build_calendar(start, days, step_minutes)
+    steps = chunk_days * 24 * 60 // step_minutes
+    groups = [nodes[j:j + shard_nodes] for j in range(0, len(nodes), shard_nodes)]
+    windows = [cal[i:i + steps] for i in range(0, len(cal), steps)]
+
+    if workers <= 1:
+        for shard, window in enumerate(windows):
+            parts = [_simulate_shard((group, window, seed, shard)) for group in groups]
+            yield _merge_node_shards(nodes, window, parts)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Only a few time shards ahead are in flight, so memory stays bounded
+        # when the writer is slower than the generator
+        pending = collections.deque()
+        for shard, window in enumerate(windows):
+            pending.append((window, [pool.submit(_simulate_shard, (group, window, seed, shard))
+                                     for group in groups]))
+            if len(pending) > workers:
+                window_i, futures = pending.popleft()
+                yield _merge_node_shards(nodes, window_i, [f.result() for f in futures])
+        while pending:
+            window_i, futures = pending.popleft()
+            yield _merge_node_shards(nodes, window_i, [f.result() for f in futures])
+
+# ---------- Output ----------
+COLUMNS = ["node", "temperature", "humidity", "co2", "noise", "uv", "measured_at"]
+
+def is_data_error(e) -> bool:
+    """PostgreSQL errors that retrying will not fix (classes 22 and 23)."""
+    code = str(getattr(e, "code", "") or "")
+    return code.startswith("22") or code.startswith("23")
+
+def read_progress(path: str) -> Dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def write_progress(path: str, progress: Dict):
+    # Write-then-rename so an interrupted run never leaves a half-written file
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(progress, f, indent=2)
+    os.replace(tmp, path)
+
+def last_committed(client, schema: str, nodes: List[Dict], start: datetime, end: datetime):
+    """Latest measured_at of these nodes in [start, end) already in the table
+    (naive UTC ISO), or None. Rows outside the run's window, e.g. real gateway
+    data or another run, are not the run's progress."""
+    resp = (client.schema(schema).table("measures").select("measured_at")
+            .in_("node", [n["id"] for n in nodes])
+            .gte("measured_at", start.isoformat()).lt("measured_at", end.isoformat())
+            .order("measured_at", desc=True).limit(1).execute())
+    rows = resp.data or []
+    if not rows:
+        return None
+    return parse_dt(rows[0]["measured_at"]).replace(tzinfo=None).isoformat(timespec="seconds")
+
+def committed_steps(client, schema: str, nodes: List[Dict], since: datetime,
+                    end: datetime) -> collections.Counter:
+    """Rows per measured_at (naive UTC ISO) of these nodes in [since, end)."""
+    counts = collections.Counter()
+    offset, page = 0, 1000
+    while True:
+        resp = (client.schema(schema).table("measures").select("measured_at,id")
+                .in_("node", [n["id"] for n in nodes])
+                .gte("measured_at", since.isoformat()).lt("measured_at", end.isoformat())
+                .order("measured_at").order("id").range(offset, offset + page - 1).execute())
+        rows = resp.data or []
+        if not rows:
+            return counts
+        for r in rows:
+            counts[parse_dt(r["measured_at"]).replace(tzinfo=None).isoformat(timespec="seconds")] += 1
+        offset += len(rows)
+
+def resume_point(client, schema: str, nodes: List[Dict], start: datetime, days: int,
+                 step_minutes: int, workers: int) -> Dict:
+    """done_through / done_ahead of an interrupted run, rebuilt from its rows
+    in the table (only [start, start + days) counts).
+
+    Batches commit out of order, but at most the 2*workers batches in flight
+    behind the last committed one can be missing (`workers` must be at least
+    the interrupted run's --insert-workers). Those trailing steps are
+    counted: the watermark stops before the first incomplete step and the
+    complete steps after it go to done_ahead, so they are not inserted twice.
+    """
+    end = start + timedelta(days=days)
+    last = last_committed(client, schema, nodes, start, end)
+    if last is None:
+        return {"done_through": None, "done_ahead": []}
+    step = timedelta(minutes=step_minutes)
+    window = 2 * workers * max(1, BATCH_SIZE // len(nodes))
+    last_dt = datetime.fromisoformat(last)
+    first_dt = max(start, last_dt - (window - 1) * step)
+    first_dt = start + ((first_dt - start) // step) * step
+    counts = committed_steps(client, schema, nodes, first_dt, end)
+    grid = [(first_dt + k * step).isoformat(timespec="seconds")
+            for k in range((last_dt - first_dt) // step + 1)]
+    partial = [t for t in grid if 0 < counts[t] != len(nodes)]
+    if partial:
+        raise SystemExit(f"Cannot resume from the table: {len(partial)} time steps hold "
+                         f"neither 0 nor {len(nodes)} rows (first {partial[0]}). "
+                         f"Clean them up or resume with the run's --progress file.")
+    missing = [i for i, t in enumerate(grid) if not counts[t]]
+    if not missing:
+        return {"done_through": last, "done_ahead": []}
+    # Steps before the window are all committed
+    if missing[0]:
+        before = grid[missing[0] - 1]
+    elif first_dt > start:
+        before = (first_dt - step).isoformat(timespec="seconds")
+    else:
+        before = None
+    ahead, run = [], None
+    for i in range(missing[0], len(grid)):
+        if counts[grid[i]]:
+            run = [run[0] if run else grid[i], grid[i]]
+        elif run:
+            ahead.append(tuple(run))
+            run = None
+    if run:
+        ahead.append(tuple(run))
+    print(f"Found {len(missing)} missing time steps among the last {len(grid)}")
+    return {"done_through": before, "done_ahead": ahead}
+
+class ApiWriter:
+    """Inserts batches of whole time steps with bounded concurrency and retries.
+
+    Batches can finish out of order, so progress is kept as the last
+    timestamp up to which *every* batch committed, plus the ranges that
+    committed beyond it. Both are saved to `progress_path`; a resumed run
+    skips exactly those rows.
+    """
+
+    def __init__(self, client, schema, n_nodes, progress_path, run, done_through=None,
+                 done_ahead=(), workers=INSERT_WORKERS, retries=MAX_RETRIES):
+        self.client = client
+        self.schema = schema
+        self.batch_rows = max(1, BATCH_SIZE // n_nodes) * n_nodes
+        self.progress_path = progress_path
+        self.run = run
+        self.retries = retries
+        self.done_through = done_through
+        self.done_ahead = [tuple(r) for r in done_ahead]
+        self.rows = 0
+        self.retried = 0
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._max_pending = 2 * workers
+        self._pending = {}    # future -> sequence number
+        self._ranges = {}     # sequence number -> (first, last) measured_at
+        self._finished = set()
+        self._next_seq = 0
+        self._done_seq = 0
+        self._error = None
+        self._saved_at = 0.0
+
+    @property
+    def failed(self) -> bool:
+        return self._error is not None
+
+    def skip_mask(self, times: np.ndarray) -> np.ndarray:
+        """True for ISO timestamps already committed by an earlier run."""
+        skip = np.zeros(len(times), dtype=bool)
+        if self.done_through:
+            skip |= times <= self.done_through
+        for first, last in self.done_ahead:
+            skip |= (times >= first) & (times <= last)
+        return skip
+
+    def write(self, df: pd.DataFrame):
+        df = df[~self.skip_mask(df["measured_at"].to_numpy())]
+        for i in range(0, len(df), self.batch_rows):
+            batch = df.iloc[i:i + self.batch_rows]
+            while len(self._pending) >= self._max_pending:
+                self._collect(wait(self._pending, return_when=FIRST_COMPLETED).done)
+            if self._error:
+                return
+            seq = self._next_seq
+            self._next_seq += 1
+            self._ranges[seq] = (batch["measured_at"].iat[0], batch["measured_at"].iat[-1])
+            future = self._pool.submit(self._insert, batch.to_dict("records"))
+            self._pending[future] = seq
+
+    def _insert(self, records):
+        delay = 1.0
+        for attempt in range(self.retries + 1):
+            try:
+                resp = self.client.schema(self.schema).table("measures").insert(records).execute()
+                if resp.data is None:
+                    raise RuntimeError("Insert failed")
+                return len(records)
+            except Exception as e:
+                if attempt == self.retries or is_data_error(e):
+                    raise
+                self.retried += 1
+                # Exponential backoff with jitter so the workers do not retry in lockstep
+                timer.sleep(delay * random.uniform(0.5, 1.0))
+                delay = min(delay * 2, 60.0)
+
+    def _collect(self, done):
+        for future in done:
+            seq = self._pending.pop(future)
+            try:
+                self.rows += future.result()
+            except Exception as e:
+                first, last = self._ranges[seq]
+                print(f"Insert of {first} .. {last} failed after {self.retries} retries: {e}")
+                self._error = self._error or e
+                continue
+            self._finished.add(seq)
+        advanced = False
+        while self._done_seq in self._finished:
+            self._finished.discard(self._done_seq)
+            self.done_through = self._ranges.pop(self._done_seq)[1]
+            self._done_seq += 1
+            advanced = True
+        if advanced and timer.monotonic() - self._saved_at > 2.0:
+            self.save()
+            print(f"Inserted {self.rows} (through {self.done_through})...")
+
+    def save(self):
+        ahead = sorted(set(self.done_ahead) | {self._ranges[s] for s in self._finished})
+        # Ranges from an earlier run that the watermark has passed are redundant
+        ahead = [r for r in ahead if not self.done_through or r[1] > self.done_through]
+        write_progress(self.progress_path, dict(self.run, done_through=self.done_through,
+                                                done_ahead=ahead))
+        self._saved_at = timer.monotonic()
+
+    def close(self):
+        while self._pending:
+            self._collect(wait(self._pending).done)
+        self._pool.shutdown()
+        self.save()
+        if self._error:
+            raise RuntimeError(f"Insert failed; committed through {self.done_through}. "
+                               f"Rerun with --resume to continue.") from self._error
+
+class FileWriter:
+    """Streams the measures to a .csv[.gz], .parquet or .sql (Postgres COPY) file."""
+
+    def __init__(self, path: str, schema: str = SCHEMA):
+        self.path = path
+        self.rows = 0
+        self._parquet = None
+        if path.endswith(".parquet"):
+            self.format = "parquet"
+            self._file = None
+        elif path.endswith((".csv", ".csv.gz")):
+            self.format = "csv"
+            self._file = (gzip.open(path, "wt", newline="") if path.endswith(".gz")
+                          else open(path, "w", newline=""))
+        elif path.endswith((".sql", ".copy")):
+            # Load with: psql "$DATABASE_URL" -f <path>
+            self.format = "copy"
+            self._file = open(path, "w", newline="")
+            self._file.write(f"COPY {schema}.measures ({', '.join(COLUMNS)}) FROM stdin;\n")
+        else:
+            raise SystemExit(f"Unknown output format: {path} (use .csv, .csv.gz, .parquet or .sql)")
+
+    def write(self, df: pd.DataFrame):
+        if self.format == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            df = df.assign(measured_at=pd.to_datetime(df["measured_at"]))
+            table = pa.Table.from_pandas(df[COLUMNS], preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table)
+        else:
+            df[COLUMNS].to_csv(self._file, sep="\t" if self.format == "copy" else ",",
+                               header=self.format == "csv" and self.rows == 0, index=False)
+        self.rows += len(df)
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+        if self._file is not None:
+            if self.format == "copy":
+                self._file.write("\\.\n")
+            self._file.close()
+
+def generate_and_insert(client, nodes, schema=SCHEMA, start=START_DATE, days=YEAR_LENGTH_DAYS,
+                        step_minutes=STEP_MINUTES, seed=None, dry_run=False, output=None,
+                        workers=INSERT_WORKERS, retries=MAX_RETRIES, resume=False,
+                        progress_path=None, calendar=None, sim_workers=1):
+    """Generate the measures and write them to the API, a file (`output`) or nowhere (dry run).
+
+    `calendar` holds the holiday/vacation overrides (see calendar_overrides).
+    """
+    print("Using nodes:", len(nodes))
+    writer = None
+    if output:
+        writer = FileWriter(output, schema)
+    elif not dry_run:
+        progress_path = progress_path or f"{schema}_simulation_progress.json"
+        run = {"schema": schema, "start": start.isoformat(), "days": days,
+               "step_minutes": step_minutes, "seed": seed, "nodes": [n["id"] for n in nodes],
+               "calendar": calendar or {}}
+        done = {}
+        if resume:
+            progress = read_progress(progress_path)
+            if all(progress.get(k) == v for k, v in run.items()):
+                done = progress
+                print(f"Resuming from {progress_path}: committed through {done.get('done_through')}")
+            else:
+                # Without a matching progress file, rebuild the progress from the table
+                done = resume_point(client, schema, nodes, start, days, step_minutes, workers)
+                print(f"Resuming from the table: committed through {done['done_through']}"
+                      f" and {len(done['done_ahead'])} ranges after it")
+            if seed is None:
+                print("Warning: no --seed, resumed rows will not match an uninterrupted run")
+        writer = ApiWriter(client, schema, len(nodes), progress_path, run,
+                           done.get("done_through"), done.get("done_ahead", ()), workers, retries)
     print("Starting generation...")
 
-    while dt < end_dt:
-        for n in NODES:
-            occ = occupancy_multiplier(dt, n["name"], semester_ranges)
-
-            spike = (random.random() < 0.001)
-
-            temp = temperature_from_season_and_time(dt, n["name"], occ)
-            humidity = humidity_from_occ(dt, occ, n["name"])
-            co2 = co2_from_occ(occ*(3 if spike else 1), n["name"])
-            noise = noise_from_occ(occ*(3 if spike else 1), n["name"])
-
-            cloud = 0.9 if random.random() < 0.05 else 1.0
-            uv_raw = uv_from_time(dt, cloud)
-
-            indoor = {"Gym":0.25,"Food center":0.4,"Library":0.15}.get(n["name"],0.3)
-            uv = max(0.0, uv_raw * indoor * (0.5+0.5*occ) + random.gauss(0,0.05))
-
-            rec = {
-                "node": n["id"],
-                "temperature": round(float(temp), 2),
-                "humidity": round(float(humidity), 2),
-                "co2": round(float(co2), 1),
-                "noise": round(float(noise), 2),
-                "uv": round(float(uv), 3),
-                "measured_at": dt.isoformat()
-            }
-
-            batch.append(rec)
-
-        if len(batch) >= BATCH_SIZE:
-            resp = client.schema(SCHEMA).table("measures").insert(batch).execute()
-            if resp.data is None:
-                raise RuntimeError("Insert failed")
-            total += len(batch)
-            print(f"Inserted {total}...")
-            batch = []
-
-        dt += step
-
-    if batch:
-        resp = client.schema(SCHEMA).table("measures").insert(batch).execute()
-        if resp.data is None:
-            raise RuntimeError("Final insert failed")
-        total += len(batch)
-        print("Final inserted:", total)
+    total = 0
+    t0 = timer.perf_counter()
+    cal = build_calendar(start, days, step_minutes, calendar)
+    try:
+        for df in iter_chunks(nodes, start, days, step_minutes, seed, calendar=cal,
+                              workers=sim_workers):
+            total += len(df)
+            if writer:
+                writer.write(df)
+                if getattr(writer, "failed", False):
+                    break
+    finally:
+        if writer:
+            writer.close()
+
+    elapsed = timer.perf_counter() - t0
+    if writer is None:
+        print(f"Generated: {total} rows in {elapsed:.1f} s")
+    elif isinstance(writer, FileWriter):
+        print(f"Wrote {writer.rows} rows to {output} in {elapsed:.1f} s")
+    else:
+        print(f"Final inserted: {writer.rows} rows in {elapsed:.1f} s "
+              f"({writer.retried} retried batches)")
+    return writer.rows if writer else total
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate simulated campus measures")
+    parser.add_argument("--schema", default=SCHEMA, help=f"target schema (default: {SCHEMA})")
+    parser.add_argument("--start", type=datetime.fromisoformat, default=START_DATE,
+                        help=f"first timestamp (default: {START_DATE.isoformat()})")
+    parser.add_argument("--days", type=float, default=YEAR_LENGTH_DAYS,
+                        help=f"length of the simulated period (default: {YEAR_LENGTH_DAYS})")
+    parser.add_argument("--step-minutes", type=int, default=STEP_MINUTES,
+                        help=f"minutes between measures (default: {STEP_MINUTES})")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="random seed; the same seed gives the same data")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="simulation processes (default: all cores); does not change the data")
+    parser.add_argument("--synthetic-nodes", type=int, default=None,
+                        help="simulate this many nodes instead of reading them from the DB")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="generate without inserting (benchmark)")
+    parser.add_argument("--calendar", default=None,
+                        help='JSON with {"holidays": [dates], "vacations": [[first, last], ...]}')
+    parser.add_argument("--official-holidays", action="store_true",
+                        help="treat Mexican statutory holidays as days off")
+    parser.add_argument("--output", default=None,
+                        help="write to a .csv, .csv.gz, .parquet or .sql (COPY) file instead of the API")
+    parser.add_argument("--insert-workers", type=int, default=INSERT_WORKERS,
+                        help=f"concurrent insert requests (default: {INSERT_WORKERS})")
+    parser.add_argument("--retries", type=int, default=MAX_RETRIES,
+                        help=f"retries per batch before giving up (default: {MAX_RETRIES})")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip rows already committed by an interrupted run")
+    parser.add_argument("--progress", default=None,
+                        help="progress file for --resume (default: <schema>_simulation_progress.json)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    offline = args.dry_run or args.output
+    client = None if offline and args.synthetic_nodes else get_client()
+    nodes = synthetic_nodes(args.synthetic_nodes) if args.synthetic_nodes else load_nodes(client, args.schema)
+    generate_and_insert(client, nodes, args.schema, args.start, args.days, args.step_minutes,
+                        args.seed, args.dry_run, args.output, args.insert_workers, args.retries,
+                        args.resume, args.progress,
+                        calendar_overrides(args.calendar, args.official_holidays, args.start, args.days),
+                        args.workers)
 
 if __name__ == "__main__":
-    generate_and_insert()
+    main()
@@ -1,5 +1,7 @@
 import sys
 import skiliket.func as sk
+import skiliket.cache as skc
+from skiliket.features import FeaturePipeline
 
 def main(argv=None):
     args = sk.parse_args(argv)
@@ -16,19 +18,25 @@ def main(argv=None):
     print(f"Using Supabase schema: {chosen_schema}")
 
     client = sk.get_supabase_client(schema_name=chosen_schema)
-    all_rows = sk.fetch_all_rows(client)
+    raw = skc.load_measures(client, chosen_schema, workers=args.fetch_workers,
+                            cache_dir=None if args.no_cache else args.cache_dir)
 
-    if not all_rows:
+    if raw.empty:
         print("No rows fetched. Exiting.")
         return 1
 
-    df = sk.clean_dataframe(all_rows)
+    df = sk.clean_dataframe(raw)
 
     if df.empty:
         print("DataFrame is empty after cleaning. Exiting.")
         return 1
 
-    sk.train_and_save_models(df, models_dir=f"{chosen_schema}_models", sample_frac=(len(df) > 10000) and 0.1 or None)
+    sk.train_and_save_models(df, models_dir=f"{chosen_schema}_models", sample_frac=(len(df) > 10000) and 0.1 or None,
+                             n_jobs=args.jobs, target_workers=args.target_workers,
+                             search=args.search and {"budget_s": args.search_budget,
+                                                     "mse_tolerance": args.mse_tolerance} or None,
+                             compress=args.compress,
+                             pipeline=FeaturePipeline() if args.features else None)
     return 0
 
 
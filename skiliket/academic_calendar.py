@@ -0,0 +1,126 @@
+# academic_calendar.py
+"""Academic calendar of the campus, precomputed at the simulation step.
+
+AcademicCalendar covers [start, end) at a fixed step (5 minutes by default)
+and holds one array per time-dependent factor, computed once per calendar
+day and broadcast to the steps:
+
+- hour          fractional hour of day
+- weekday       0 = Monday ... 6 = Sunday
+- day_type      0 = weekday, 1 = Saturday, 2 = Sunday or holiday
+- season        0 = winter (Dec-Feb), 1 = spring, 2 = summer, 3 = autumn
+- hour_bucket   index into HOUR_EDGES (night, arrival, morning, lunch, ...)
+- phase         TEC week phase 1-6 inside a semester, 0 outside or on vacation
+
+Holidays and vacation ranges override the default semester calendar.
+Slicing a calendar (cal[i:j]) gives the same arrays for a sub-range, so a
+long run is indexed once and consumed in chunks.
+"""
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+
+# Week phase by week number since the start of the semester
+TEC_PATTERN = [1, 2, 3, 4, 5, 6, 1, 2, 3, 4, 5, 6, 1, 2, 3, 4, 5]
+# Hour buckets: [0, 7), [7, 9), [9, 12), [12, 14), [14, 17), [17, 21), [21, 24)
+HOUR_EDGES = np.array([0, 7, 9, 12, 14, 17, 21])
+# Month (1-12) -> season
+SEASON_OF_MONTH = np.array([0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0])
+
+WEEKDAY, SATURDAY, DAY_OFF = 0, 1, 2
+
+
+def nth_monday_of_month(year, month, n):
+    d = date(year, month, 1)
+    first_monday = d + timedelta(days=(0 - d.weekday()) % 7)
+    return first_monday + timedelta(weeks=n - 1)
+
+
+def semester_ranges_for_year(year):
+    """(start, end) datetimes of the Feb-Jun and Aug-Dec semesters."""
+    s1_start = datetime.combine(nth_monday_of_month(year, 2, 2), time(0, 0))
+    s1_end = datetime.combine(nth_monday_of_month(year, 6, 2), time(23, 59, 59))
+    s2_start = datetime.combine(nth_monday_of_month(year, 8, 2), time(0, 0))
+    s2_end = datetime.combine(nth_monday_of_month(year, 12, 1), time(23, 59, 59))
+    return [(s1_start, s1_end), (s2_start, s2_end)]
+
+
+def official_holidays(years):
+    """Mexican statutory rest days (LFT art. 74) for every year in `years`."""
+    days = []
+    for y in years:
+        days += [
+            date(y, 1, 1),
+            nth_monday_of_month(y, 2, 1),    # Constitution day
+            nth_monday_of_month(y, 3, 3),    # Benito Juárez
+            date(y, 5, 1),
+            date(y, 9, 16),
+            nth_monday_of_month(y, 11, 3),   # Revolution day
+            date(y, 12, 25),
+        ]
+    return days
+
+
+def _days(values):
+    return np.array([np.datetime64(v, "D") for v in values], dtype="datetime64[D]")
+
+
+class AcademicCalendar:
+    """Per-step calendar arrays over [start, end) at `step_minutes`."""
+
+    def __init__(self, start, end, step_minutes=5, holidays=(), vacations=(), semesters=None):
+        """`holidays` are dates; `vacations` and `semesters` are (first, last) pairs
+        of dates or datetimes, both inclusive. Semesters default to the TEC
+        calendar of every year in the span."""
+        step = np.timedelta64(step_minutes, "m")
+        self.step_minutes = step_minutes
+        self.times = np.arange(np.datetime64(start, "m"), np.datetime64(end, "m"), step)
+
+        day0 = np.datetime64(start, "D")
+        days = np.arange(day0, np.datetime64(end, "D") + 1)
+        years = range(days[0].astype(object).year - 1, days[-1].astype(object).year + 1)
+        if semesters is None:
+            semesters = [r for y in years for r in semester_ranges_for_year(y)]
+
+        # Everything below is computed per calendar day, then broadcast to the steps
+        weekday = ((days.astype(np.int64) + 3) % 7).astype(np.int8)  # 1970-01-01 was a Thursday
+        month = days.astype("datetime64[M]").astype(np.int64) % 12 + 1
+        day_type = np.select([weekday == 6, weekday == 5], [DAY_OFF, SATURDAY], WEEKDAY)
+        day_type[np.isin(days, _days(holidays))] = DAY_OFF
+        phase = self._phase(days, semesters)
+        for first, last in vacations:
+            phase[(days >= np.datetime64(first, "D")) & (days <= np.datetime64(last, "D"))] = 0
+
+        minutes = self.times.astype("datetime64[m]")
+        day_index = (minutes.astype("datetime64[D]") - day0).astype(np.int64)
+        self.hour = (minutes - minutes.astype("datetime64[D]")).astype(np.int64) / 60
+        self.hour_bucket = (np.searchsorted(HOUR_EDGES, self.hour, side="right") - 1).astype(np.int8)
+        self.weekday = weekday[day_index]
+        self.day_type = day_type.astype(np.int8)[day_index]
+        self.month = month.astype(np.int8)[day_index]
+        self.season = SEASON_OF_MONTH[month - 1].astype(np.int8)[day_index]
+        self.phase = phase.astype(np.int8)[day_index]
+
+    @staticmethod
+    def _phase(days, semesters):
+        ranges = sorted((np.datetime64(s, "D"), np.datetime64(e, "D")) for s, e in semesters)
+        starts = np.array([s for s, _ in ranges], dtype="datetime64[D]")
+        ends = np.array([e for _, e in ranges], dtype="datetime64[D]")
+        i = np.maximum(np.searchsorted(starts, days, side="right") - 1, 0)
+        inside = (days >= starts[i]) & (days <= ends[i])
+        weeks = (days - starts[i]).astype(np.int64) // 7
+        return np.where(inside, np.asarray(TEC_PATTERN)[weeks % len(TEC_PATTERN)], 0)
+
+    def __len__(self):
+        return len(self.times)
+
+    def __getitem__(self, index):
+        """The calendar restricted to a slice of its steps (arrays are views)."""
+        if not isinstance(index, slice):
+            raise TypeError("AcademicCalendar only supports slicing")
+        sub = object.__new__(AcademicCalendar)
+        sub.step_minutes = self.step_minutes
+        for name in ("times", "hour", "hour_bucket", "weekday", "day_type", "month",
+                     "season", "phase"):
+            setattr(sub, name, getattr(self, name)[index])
+        return sub
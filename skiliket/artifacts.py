@@ -0,0 +1,147 @@
+# artifacts.py
+"""Model artifacts: a joblib file per target plus a JSON metadata sidecar.
+
+<models_dir>/<target>.joblib   the estimator (zlib-compressed by default)
+<models_dir>/<target>.json     format version, feature order, training rows,
+                               schema, metrics, model parameters, the
+                               in-memory size of the trees and the feature
+                               pipeline config
+
+The sidecar is small and read eagerly; the estimator is only loaded when it
+is first used. Loading always copies the trees into memory (sklearn's Tree
+rebuilds its node arrays on unpickling), so memory-mapping an uncompressed
+file would save nothing; compressing keeps the files small instead. Directories with the old `<target>.pkl` files still load.
+"""
+import json
+import os
+import pickle
+
+import joblib
+import pandas as pd
+import sklearn
+
+from skiliket.features import FeaturePipeline
+
+FORMAT_VERSION = 1
+DEFAULT_COMPRESS = 3
+MODEL_SUFFIX = ".joblib"
+META_SUFFIX = ".json"
+LEGACY_SUFFIX = ".pkl"
+
+
+def model_nbytes(model):
+    """Bytes the tree node and value arrays of a fitted forest (or tree) take
+    once loaded; None for other estimators. A compressed file on disk can be
+    several times smaller than this."""
+    trees = getattr(model, "estimators_", None)
+    if trees is None:
+        trees = [model] if hasattr(model, "tree_") else None
+    if trees is None:
+        return None
+    total = 0
+    for tree in trees:
+        state = tree.tree_.__getstate__()
+        total += state["nodes"].nbytes + state["values"].nbytes
+    return total
+
+
+def save_model(model, models_dir, target, features, n_train_rows, schema=None,
+               metrics=None, compress=DEFAULT_COMPRESS, pipeline=None):
+    """Write the estimator and its sidecar; returns the estimator path.
+
+    `compress` is the joblib (zlib) level: 1-9 trade save/load time for size,
+    0 writes the plain pickle, about as large as the trees in memory. `pipeline` is the FeaturePipeline
+    config the features were built with, if any.
+    """
+    os.makedirs(models_dir, exist_ok=True)
+    path = os.path.join(models_dir, target + MODEL_SUFFIX)
+    joblib.dump(model, path, compress=compress)
+    params = model.get_params()
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "target": target,
+        "file": os.path.basename(path),
+        "compress": compress,
+        "features": list(features),
+        "n_train_rows": int(n_train_rows),
+        "schema": {k: str(v) for k, v in (schema or {}).items()},
+        "metrics": {k: float(v) for k, v in (metrics or {}).items()},
+        "estimator": type(model).__name__,
+        "params": {k: params[k] for k in ("n_estimators", "max_depth", "min_samples_leaf")
+                   if k in params},
+        "memory_bytes": model_nbytes(model),
+        "pipeline": pipeline,
+        "sklearn_version": sklearn.__version__,
+        "created_at": pd.Timestamp.now(tz="UTC").isoformat(),
+    }
+    tmp = os.path.join(models_dir, target + META_SUFFIX + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, os.path.join(models_dir, target + META_SUFFIX))
+    return path
+
+
+def read_metadata(models_dir, target):
+    with open(os.path.join(models_dir, target + META_SUFFIX)) as f:
+        meta = json.load(f)
+    if meta.get("format_version", 0) > FORMAT_VERSION:
+        raise ValueError(f"{target}: artifact format {meta['format_version']} is newer "
+                         f"than supported ({FORMAT_VERSION})")
+    return meta
+
+
+def list_models(models_dir):
+    """Targets with a saved model in models_dir (new artifacts and legacy .pkl)."""
+    if not os.path.isdir(models_dir):
+        return []
+    targets = set()
+    for fname in os.listdir(models_dir):
+        if fname.startswith("."):
+            continue
+        for suffix in (META_SUFFIX, LEGACY_SUFFIX):
+            if fname.endswith(suffix):
+                targets.add(fname[:-len(suffix)])
+    return sorted(targets)
+
+
+class LazyModel:
+    """A saved model whose estimator is read from disk on first use."""
+
+    def __init__(self, models_dir, target):
+        self.target = target
+        meta_path = os.path.join(models_dir, target + META_SUFFIX)
+        if os.path.exists(meta_path):
+            self.metadata = read_metadata(models_dir, target)
+            self.path = os.path.join(models_dir, self.metadata["file"])
+        else:
+            self.metadata = {}
+            self.path = os.path.join(models_dir, target + LEGACY_SUFFIX)
+        self._estimator = None
+
+    @property
+    def features(self):
+        """Feature columns in training order (None for legacy models)."""
+        return self.metadata.get("features")
+
+    @property
+    def pipeline(self):
+        """FeaturePipeline the model was trained with (None for raw columns)."""
+        config = self.metadata.get("pipeline")
+        return FeaturePipeline.from_dict(config) if config else None
+
+    @property
+    def estimator(self):
+        if self._estimator is None:
+            if self.path.endswith(LEGACY_SUFFIX):
+                with open(self.path, "rb") as f:
+                    self._estimator = pickle.load(f)
+            else:
+                self._estimator = joblib.load(self.path)
+        return self._estimator
+
+    def predict(self, X):
+        return self.estimator.predict(X)
+
+
+def load_model(models_dir, target):
+    return LazyModel(models_dir, target)
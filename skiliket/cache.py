@@ -0,0 +1,163 @@
+# cache.py
+"""Local Parquet cache of Supabase tables.
+
+Rows are stored under <cache_dir>/<schema>/<table>/date=YYYY-MM-DD/ as Parquet
+parts. `_state.json` keeps the high-water mark (the largest id) of the last
+complete sync, so the next sync only asks Supabase for rows inserted since.
+The mark is on id rather than measured_at: rows replayed from an upload queue
+or a resumed simulation arrive late with old timestamps but new ids.
+"""
+import json
+import os
+import time
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from skiliket.func import DEFAULT_CACHE_DIR, ESTIMATED_COLUMN, fetch_all_rows, iter_row_pages
+
+STATE_FILE = "_state.json"
+ORDER_COLUMN = "measured_at"
+KEY_COLUMN = "id"
+
+
+def table_dir(cache_dir, schema, table="measures"):
+    return os.path.join(cache_dir, schema, table)
+
+
+def read_state(path):
+    try:
+        with open(os.path.join(path, STATE_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _write_state(path, state):
+    # Write-then-rename so an interrupted sync never leaves a half-written mark
+    tmp = os.path.join(path, STATE_FILE + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, os.path.join(path, STATE_FILE))
+
+
+def _typed(rows):
+    """DataFrame with stable column types, so every part shares one schema."""
+    df = pd.DataFrame(rows)
+    for col in df.columns:
+        if col == ORDER_COLUMN:
+            df[col] = pd.to_datetime(df[col], utc=True, format="mixed").astype("datetime64[ns, UTC]")
+        elif col == ESTIMATED_COLUMN:
+            # Stored as "a,b" so every part has the same (string) type
+            df[col] = df[col].map(lambda v: ",".join(v) if isinstance(v, (list, tuple)) else (v or ""))
+        elif col == KEY_COLUMN:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
+        else:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+    return df
+
+
+def _write_parts(path, df):
+    stamp = f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
+    for date, part in df.groupby(df[ORDER_COLUMN].dt.strftime("%Y-%m-%d")):
+        part_dir = os.path.join(path, f"date={date}")
+        os.makedirs(part_dir, exist_ok=True)
+        table = pa.Table.from_pandas(part.reset_index(drop=True), preserve_index=False)
+        pq.write_table(table, os.path.join(part_dir, f"part-{stamp}.parquet"))
+
+
+def sync(client, schema, table="measures", cache_dir=DEFAULT_CACHE_DIR, page_size=1000,
+         workers=4, chunk_rows=100_000):
+    """Append rows with an id above the cached high-water mark; returns the rows added."""
+    path = table_dir(cache_dir, schema, table)
+    os.makedirs(path, exist_ok=True)
+    after_key = read_state(path).get(KEY_COLUMN)
+    if after_key is not None:
+        print(f"Cache mark: id {after_key}")
+
+    mark = None
+    buffered, added = [], 0
+
+    def flush():
+        nonlocal mark, buffered
+        df = _typed(buffered)
+        buffered = []
+        if df.empty:
+            return 0
+        top = int(df[KEY_COLUMN].max())
+        if mark is None or top > mark:
+            mark = top
+        _write_parts(path, df)
+        return len(df)
+
+    for batch in iter_row_pages(client, table, page_size, workers=workers,
+                                order_column=ORDER_COLUMN, key_column=KEY_COLUMN,
+                                after_key=after_key):
+        buffered.extend(batch)
+        if len(buffered) >= chunk_rows:
+            added += flush()
+            print("Cached", added, "new rows")
+    if buffered:
+        added += flush()
+
+    # The mark only moves once every slice has been fetched: if the sync dies
+    # halfway, the next run refetches and load() drops the duplicates.
+    if mark is not None:
+        _write_state(path, {KEY_COLUMN: mark,
+                            "synced_at": pd.Timestamp.now(tz="UTC").isoformat()})
+    print(f"Cache sync: {added} new rows")
+    return added
+
+
+def load(schema, table="measures", cache_dir=DEFAULT_CACHE_DIR, columns=None, since=None):
+    """Cached rows as a typed DataFrame ordered by (measured_at, id).
+
+    `since` (date or timestamp) prunes whole date partitions before reading.
+    """
+    path = table_dir(cache_dir, schema, table)
+    if not os.path.isdir(path):
+        return pd.DataFrame()
+    partitioning = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+    dataset = ds.dataset(path, format="parquet", partitioning=partitioning,
+                         exclude_invalid_files=True)
+    # The dataset schema comes from one part only; parts written before a
+    # column existed (e.g. `estimated`) would hide it everywhere. Unify them,
+    # so the column reads as null where it is missing.
+    fragments = list(dataset.get_fragments())
+    if not fragments:
+        return pd.DataFrame()
+    unified = pa.unify_schemas([f.physical_schema for f in fragments]
+                               + [pa.schema([("date", pa.string())])],
+                               promote_options="permissive")
+    dataset = ds.dataset(path, schema=unified, format="parquet", partitioning=partitioning,
+                         exclude_invalid_files=True)
+    flt = None
+    if since is not None:
+        since = pd.Timestamp(since)
+        flt = ds.field("date") >= since.strftime("%Y-%m-%d")
+    if columns:
+        columns = list(dict.fromkeys([KEY_COLUMN, ORDER_COLUMN] + list(columns)))
+    df = dataset.to_table(columns=columns, filter=flt).to_pandas()
+    df = df.drop(columns=["date"], errors="ignore")
+    if df.empty:
+        return df
+    if ESTIMATED_COLUMN in df.columns:
+        # Parts older than the column: nothing was estimated there
+        df[ESTIMATED_COLUMN] = df[ESTIMATED_COLUMN].fillna("")
+    if since is not None:
+        if since.tzinfo is None:
+            since = since.tz_localize("UTC")
+        df = df[df[ORDER_COLUMN] >= since]
+    df = df.drop_duplicates(subset=KEY_COLUMN, keep="last")
+    return df.sort_values([ORDER_COLUMN, KEY_COLUMN]).reset_index(drop=True)
+
+
+def load_measures(client, schema, table="measures", cache_dir=DEFAULT_CACHE_DIR, workers=4):
+    """Sync the cache and load it; with cache_dir=None fetch everything directly."""
+    if not cache_dir:
+        return pd.DataFrame(fetch_all_rows(client, table, workers=workers))
+    sync(client, schema, table, cache_dir, workers=workers)
+    return load(schema, table, cache_dir)
@@ -0,0 +1,275 @@
+# evaluation.py
+"""Batch evaluation of saved models.
+
+The cleaned DataFrame is turned once into a contiguous float32 matrix (the
+dtype the forests use internally); each model takes its rows and columns from
+it in one indexing step, predicts them in a single call, and all models are
+evaluated concurrently. Results go to a JSON report.
+
+walk_forward() measures forecast error honestly: it refits each model on
+past rows only and scores it on the following time window, for several
+rolling windows. Each model only sees the rows where its target and all of
+its features are present; those rows are copied once per target and every
+fold trains and tests on slices of that copy.
+"""
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+from skiliket.func import numeric_frame
+
+# Fold models are refit many times; their error only has to be comparable
+# with the deployed model, so the forest size is capped.
+WALK_FORWARD_MAX_TREES = 200
+WALK_FORWARD_PARAMS = {"n_estimators": WALK_FORWARD_MAX_TREES, "max_depth": None,
+                       "min_samples_leaf": 1}
+
+
+class EvaluationData:
+    """One float32 matrix of the whole frame, shared by every model.
+
+    Models index it with their row and column numbers; nothing is copied per
+    column set, and a target column is only widened to float64 for the rows
+    it is scored on.
+    """
+
+    def __init__(self, df, node_column="node", sort_by=None):
+        df = numeric_frame(df)
+        if sort_by:
+            # Time-ordered rows turn every walk-forward window into a
+            # contiguous slice
+            df = df.sort_values(sort_by, kind="stable").reset_index(drop=True)
+        self.timestamps = df[sort_by].to_numpy() if sort_by else None
+        self.n_rows = len(df)
+        self.columns = list(df.columns)
+        self._index = {c: i for i, c in enumerate(self.columns)}
+        self.matrix = np.ascontiguousarray(df.to_numpy(dtype=np.float32))
+        self._missing = np.isnan(self.matrix)
+        self._has_values = ~self._missing.all(axis=0)
+        self.nodes = df[node_column].to_numpy() if node_column in df.columns else None
+
+    def indices(self, columns):
+        return [self._index[c] for c in columns]
+
+    def target(self, column, rows=slice(None)):
+        return self.matrix[rows, self._index[column]].astype(np.float64)
+
+    def features(self, columns, rows=slice(None)):
+        """Matrix of `columns` (in that order) for `rows`, taken in one indexing step."""
+        idx = self.indices(columns)
+        if isinstance(rows, slice):
+            return self.matrix[rows][:, idx]
+        return self.matrix[np.ix_(rows, idx)]
+
+    def default_features(self, target):
+        """Every other column that has at least one value."""
+        return [c for c in self.columns if c != target and self._has_values[self._index[c]]]
+
+    def complete(self, target, columns):
+        """Boolean mask of rows where `target` and every one of `columns` are present."""
+        missing = self._missing[:, self._index[target]].copy()
+        for i in self.indices(columns):
+            missing |= self._missing[:, i]
+        return ~missing
+
+
+def regression_metrics(y_true, y_pred):
+    err = y_pred - y_true
+    ss_tot = float(((y_true - y_true.mean()) ** 2).sum()) if len(y_true) else 0.0
+    sse = float((err ** 2).sum())
+    return {
+        "n": int(len(y_true)),
+        "mse": sse / len(y_true) if len(y_true) else None,
+        "mae": float(np.abs(err).mean()) if len(y_true) else None,
+        "r2": 1 - sse / ss_tot if ss_tot else None,
+    }
+
+
+def metrics_by_group(groups, y_true, y_pred):
+    """regression_metrics for every group value, in one pass with bincount."""
+    keys, inv = np.unique(groups, return_inverse=True)
+    err = y_pred - y_true
+    n = np.bincount(inv)
+    sse = np.bincount(inv, weights=err ** 2)
+    sae = np.bincount(inv, weights=np.abs(err))
+    sy = np.bincount(inv, weights=y_true)
+    ss_tot = np.bincount(inv, weights=y_true ** 2) - sy ** 2 / n
+    out = {}
+    for i, key in enumerate(keys):
+        out[str(key.item() if hasattr(key, "item") else key)] = {
+            "n": int(n[i]),
+            "mse": float(sse[i] / n[i]),
+            "mae": float(sae[i] / n[i]),
+            "r2": float(1 - sse[i] / ss_tot[i]) if ss_tot[i] > 1e-12 else None,
+        }
+    return out
+
+
+def evaluate_model(model, data, target, sample_rows=5):
+    """Metrics, per-node breakdown, sample predictions and timings of one model."""
+    t0 = time.perf_counter()
+    estimator = getattr(model, "estimator", model)  # forces a LazyModel to load
+    t1 = time.perf_counter()
+    columns = getattr(model, "features", None) or data.default_features(target)
+    # Only rows where the target was measured and every feature is present
+    rows = np.flatnonzero(data.complete(target, columns))
+    X = data.features(columns, rows)
+    y_true = data.target(target, rows)
+    t2 = time.perf_counter()
+    y_pred = estimator.predict(X) if len(rows) else np.empty(0)
+    t3 = time.perf_counter()
+
+    result = regression_metrics(y_true, y_pred)
+    result["skipped_rows"] = data.n_rows - len(rows)
+    if data.nodes is not None:
+        result["by_node"] = metrics_by_group(data.nodes[rows], y_true, y_pred)
+    # Sample predictions come straight from the batch, no extra predict calls
+    idx = np.linspace(0, len(y_true) - 1, min(sample_rows, len(y_true)), dtype=int)
+    result["samples"] = [{"row": int(rows[i]), "pred": float(y_pred[i]),
+                          "real": float(y_true[i])}
+                         for i in idx]
+    result["timings_s"] = {
+        "load": t1 - t0,
+        "features": t2 - t1,
+        "predict": t3 - t2,
+        "metrics": time.perf_counter() - t3,
+    }
+    return result
+
+
+def evaluate_models(models, df, workers=4, sample_rows=5, node_column="node"):
+    """Evaluate {target: model} on df concurrently; returns the report dict.
+
+    Forest prediction runs mostly outside the GIL, so threads are enough and
+    all of them share the same feature matrices.
+    """
+    start = time.perf_counter()
+    data = EvaluationData(df, node_column)
+    prepared = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {target: pool.submit(evaluate_model, model, data, target, sample_rows)
+                   for target, model in models.items()}
+        results = {target: f.result() for target, f in futures.items()}
+    return {
+        "created_at": pd.Timestamp.now(tz="UTC").isoformat(),
+        "n_rows": data.n_rows,
+        "models": results,
+        "timings_s": {"prepare": prepared - start, "total": time.perf_counter() - start},
+    }
+
+
+def walk_forward_windows(timestamps, n_folds=5, test_window="7D", train_window=None):
+    """(train_from, test_from, test_to) int64 ns bounds of the last `n_folds` windows.
+
+    `timestamps` are sorted ascending; train_from is None for an expanding
+    training window.
+    """
+    ts = np.asarray(timestamps, dtype=np.int64)
+    if not len(ts):
+        return []
+    test = pd.Timedelta(test_window).value
+    train = None if train_window is None else pd.Timedelta(train_window).value
+    end = ts[-1] + 1
+    return [(None if train is None else lo - train, lo, lo + test)
+            for lo in (end - k * test for k in range(n_folds, 0, -1))]
+
+
+def _fold_slices(ts, window):
+    tr_t, lo_t, hi_t = window
+    lo, hi = (int(i) for i in np.searchsorted(ts, [lo_t, hi_t]))
+    tr = 0 if tr_t is None else int(np.searchsorted(ts, tr_t))
+    return (slice(tr, lo), slice(lo, hi)) if hi > lo and lo > tr else None
+
+
+def walk_forward_folds(timestamps, n_folds=5, test_window="7D", train_window=None):
+    """(train, test) row slices over int64 ns timestamps sorted ascending.
+
+    The last `n_folds` windows of length `test_window` are the test sets; each
+    trains on the `train_window` before it (all earlier rows if None). Folds
+    without training or test rows are skipped.
+    """
+    ts = np.asarray(timestamps, dtype=np.int64)
+    folds = (_fold_slices(ts, w)
+             for w in walk_forward_windows(ts, n_folds, test_window, train_window))
+    return [f for f in folds if f]
+
+
+def walk_forward(df, targets, n_folds=5, test_window="7D", train_window=None,
+                 features=None, params=None, n_jobs=None, time_column="measured_at"):
+    """Rolling-origin evaluation of a forest per target; returns the report dict.
+
+    `features` and `params` map a target to its feature columns and forest
+    parameters (e.g. from the saved artifacts); n_estimators is capped at
+    WALK_FORWARD_MAX_TREES.
+    """
+    start = time.perf_counter()
+    data = EvaluationData(df, sort_by=time_column)
+    # The windows come from every row, so all targets are scored on the same periods
+    windows = walk_forward_windows(data.timestamps, n_folds, test_window, train_window)
+    iso = lambda ns: pd.Timestamp(int(ns), tz="UTC").isoformat()
+
+    results = {}
+    for target in targets:
+        p = dict(WALK_FORWARD_PARAMS)
+        p.update({k: v for k, v in ((params or {}).get(target) or {}).items() if k in p})
+        p["n_estimators"] = min(p["n_estimators"], WALK_FORWARD_MAX_TREES)
+        columns = (features or {}).get(target) or data.default_features(target)
+        # Rows missing the target or a feature are left out of every fold. The
+        # rest are copied once, still in time order, so each fold's training
+        # and test sets are row slices (views) of this matrix.
+        rows = np.flatnonzero(data.complete(target, columns))
+        X = data.features(columns, rows)
+        y = data.target(target, rows)
+        ts = data.timestamps[rows]
+
+        fold_results, y_true, y_pred = [], [], []
+        for i, window in enumerate(windows):
+            fold = _fold_slices(ts, window)
+            if fold is None:
+                continue
+            train, test = fold
+            t0 = time.perf_counter()
+            model = RandomForestRegressor(**p, n_jobs=n_jobs, random_state=40)
+            model.fit(X[train], y[train])
+            t1 = time.perf_counter()
+            pred = model.predict(X[test])
+            t2 = time.perf_counter()
+            m = regression_metrics(y[test], pred)
+            m.update({
+                "fold": i,
+                "train_rows": train.stop - train.start,
+                "train_start": iso(ts[train.start]),
+                "test_start": iso(ts[test.start]),
+                "test_end": iso(ts[test.stop - 1]),
+                "timings_s": {"fit": t1 - t0, "predict": t2 - t1},
+            })
+            fold_results.append(m)
+            y_true.append(y[test])
+            y_pred.append(pred)
+
+        results[target] = {
+            "params": p,
+            "features": list(columns),
+            "folds": fold_results,
+            "pooled": regression_metrics(np.concatenate(y_true), np.concatenate(y_pred))
+                      if y_true else None,
+        }
+    return {
+        "n_folds": sum(_fold_slices(data.timestamps, w) is not None for w in windows),
+        "test_window": str(test_window),
+        "train_window": str(train_window) if train_window else "expanding",
+        "models": results,
+        "timings_s": {"total": time.perf_counter() - start},
+    }
+
+
+def write_report(report, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    return path
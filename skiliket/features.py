@@ -0,0 +1,98 @@
+# features.py
+"""Feature pipeline shared by training, evaluation and the gateway.
+
+From the raw measures it derives, per node and with vectorized window ops:
+- cyclical hour-of-day and day-of-week encodings (plus a weekend flag),
+- lagged sensor values (in rows, i.e. measurement steps),
+- rolling means of the sensors.
+
+A model for target T never sees T itself or anything derived from it, so it
+can estimate T on a node where that sensor is missing. The pipeline config is
+stored in the model sidecar (see artifacts.py) and rebuilt with from_dict().
+"""
+import numpy as np
+import pandas as pd
+
+SENSOR_COLUMNS = ("temperature", "humidity", "co2", "noise", "uv")
+DEFAULT_LAGS = (1, 3, 12)        # 5, 15 and 60 min at the 5-minute cadence
+DEFAULT_WINDOWS = (12, 72)       # 1 h and 6 h
+TIME_FEATURES = ("hour_sin", "hour_cos", "dow_sin", "dow_cos", "is_weekend")
+
+# Bookkeeping columns that are never features
+EXCLUDED_COLUMNS = ("id", "measured_at")
+
+
+class FeaturePipeline:
+    """Adds time, lag and rolling-mean columns to a frame of measures."""
+
+    def __init__(self, sensors=SENSOR_COLUMNS, lags=DEFAULT_LAGS, windows=DEFAULT_WINDOWS,
+                 tz="UTC", node_column="node", time_column="measured_at"):
+        self.sensors = tuple(sensors)
+        self.lags = tuple(lags)
+        self.windows = tuple(windows)
+        self.tz = tz
+        self.node_column = node_column
+        self.time_column = time_column
+
+    def to_dict(self):
+        return {
+            "sensors": list(self.sensors),
+            "lags": list(self.lags),
+            "windows": list(self.windows),
+            "tz": self.tz,
+            "node_column": self.node_column,
+            "time_column": self.time_column,
+        }
+
+    @classmethod
+    def from_dict(cls, config):
+        return cls(**config)
+
+    @property
+    def history_rows(self):
+        """Rows of history per node needed to fill every lag and window."""
+        return max(self.lags + self.windows + (1,))
+
+    def transform(self, df):
+        """Copy of `df` with the feature columns appended, in the same row order.
+
+        `measured_at` may be datetime64 or int64 nanoseconds. Lags and windows
+        only look at earlier rows of the same node; missing history gives NaN.
+        """
+        out = df.copy()
+        ts = pd.to_datetime(df[self.time_column], utc=True).dt.tz_convert(self.tz)
+
+        hour = (ts.dt.hour + ts.dt.minute / 60).to_numpy(dtype=np.float32)
+        dow = ts.dt.dayofweek.to_numpy(dtype=np.float32)
+        out["hour_sin"] = np.sin(2 * np.pi * hour / 24)
+        out["hour_cos"] = np.cos(2 * np.pi * hour / 24)
+        out["dow_sin"] = np.sin(2 * np.pi * dow / 7)
+        out["dow_cos"] = np.cos(2 * np.pi * dow / 7)
+        out["is_weekend"] = (dow >= 5).astype(np.float32)
+
+        sensors = [c for c in self.sensors if c in df.columns]
+        if not sensors:
+            return out
+        # Sort once by (node, time); groupby shift/rolling then run per node in C
+        order = np.lexsort((ts.to_numpy(), df[self.node_column].to_numpy()))
+        ordered = df.iloc[order]
+        groups = ordered.groupby(self.node_column, sort=False)[sensors]
+        derived = {}
+        for k in self.lags:
+            shifted = groups.shift(k)
+            for c in sensors:
+                derived[f"{c}_lag{k}"] = shifted[c]
+        for w in self.windows:
+            rolled = groups.rolling(w, min_periods=1).mean().reset_index(level=0, drop=True)
+            for c in sensors:
+                derived[f"{c}_mean{w}"] = rolled[c]
+        derived = pd.DataFrame(derived).astype(np.float32)
+        return pd.concat([out, derived.loc[df.index]], axis=1)
+
+    def is_derived_from(self, column, target):
+        return column == target or (column.startswith(f"{target}_") and target in self.sensors)
+
+    def columns_for(self, target, columns):
+        """Feature columns of the model for `target`, out of the transformed `columns`."""
+        return [c for c in columns
+                if c not in EXCLUDED_COLUMNS and not self.is_derived_from(c, target)]
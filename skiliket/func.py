@@ -2,15 +2,43 @@
 from supabase import create_client
 from dotenv import load_dotenv
 import os
+import time
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_squared_error
 import pickle
 import argparse
+import itertools
+import multiprocessing
+import queue
+import resource
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from skiliket import local_backend
+from skiliket.artifacts import DEFAULT_COMPRESS, save_model
 
 load_dotenv()
 
+DEFAULT_CACHE_DIR = os.environ.get("SKILIKET_CACHE_DIR", ".skiliket_cache")
+
+# Column types of the measures table; columns not listed are read as float32
+MEASURE_SCHEMA = {
+    "id": "int64",
+    "node": "int16",
+    "temperature": "float32",
+    "humidity": "float32",
+    "co2": "float32",
+    "noise": "float32",
+    "uv": "float32",
+    "measured_at": "datetime64[ns, UTC]",
+}
+TIMESTAMP_FORMAT = "ISO8601"
+# Columns a gateway filled in with a model instead of a sensor (list per row)
+ESTIMATED_COLUMN = "estimated"
+
 
 def parse_args(argv=None):
     parser = argparse.ArgumentParser(description="Train models against a Supabase schema")
@@ -18,10 +46,48 @@ def parse_args(argv=None):
     group.add_argument("--simulation", action="store_true", help="use the 'simulation' schema")
     group.add_argument("--public", action="store_true", help="use the 'public' schema (default)")
     parser.add_argument("--schema", type=str, help="explicit schema name (overrides flags)")
+    parser.add_argument("--fetch-workers", type=int, default=4,
+                        help="concurrent page requests when fetching rows (default: 4)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                        help=f"local Parquet cache of fetched rows (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="fetch the whole table from Supabase, bypassing the cache")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="CPU cores used for training (default: all)")
+    parser.add_argument("--target-workers", type=int, default=None,
+                        help="targets trained at the same time (default: as many as the "
+                             "core budget allows)")
+    parser.add_argument("--search", action="store_true",
+                        help="search tree count, depth and leaf size for compact models")
+    parser.add_argument("--search-budget", type=float, default=300,
+                        help="seconds of search per target (default: 300)")
+    parser.add_argument("--mse-tolerance", type=float, default=0.05,
+                        help="accept models up to this fraction worse than the best "
+                             "validation MSE if they are smaller (default: 0.05)")
+    parser.add_argument("--compress", type=int, default=DEFAULT_COMPRESS, choices=range(10),
+                        help="joblib (zlib) compression level for saved models; 0 writes "
+                             f"them uncompressed (default: {DEFAULT_COMPRESS})")
+    parser.add_argument("--features", action="store_true",
+                        help="train on engineered time, lag and rolling-mean features "
+                             "(skiliket.features) instead of the raw columns")
+    parser.add_argument("--report", default=None,
+                        help="evaluation report path (default: <schema>_evaluation.json)")
+    parser.add_argument("--walk-forward", action="store_true",
+                        help="also refit each model on rolling past windows and score it "
+                             "on the following one")
+    parser.add_argument("--folds", type=int, default=5,
+                        help="walk-forward test windows (default: 5)")
+    parser.add_argument("--test-window", default="7D",
+                        help="walk-forward test window length, e.g. 7D or 12h (default: 7D)")
+    parser.add_argument("--train-window", default=None,
+                        help="walk-forward training window length (default: all past rows)")
     return parser.parse_args(argv)
 
 
 def get_supabase_client(schema_name=None):
+    if local_backend.use_local_backend():
+        # SKILIKET_BACKEND=local: SQLite stand-in, see local_backend.py
+        return local_backend.client_from_env(schema_name)
     SUPABASE_URL = os.environ.get("SUPABASE_URL")
     SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
     if not SUPABASE_URL or not SUPABASE_KEY:
@@ -37,39 +103,442 @@ def get_supabase_client(schema_name=None):
     return client
 
 
-def fetch_all_rows(client, table="measures", page_size=1000):
-    all_rows = []
-    start = 0
+def _first_value(client, table, column, desc=False, key_column="id", after_key=None):
+    query = client.table(table).select(column)
+    if after_key is not None:
+        query = query.gt(key_column, after_key)
+    resp = query.order(column, desc=desc).limit(1).execute()
+    rows = resp.data or []
+    return rows[0][column] if rows else None
+
+
+def _time_slices(first, last, n_slices):
+    """Split [first, last] into n contiguous [lo, hi) ISO ranges (last one closed)."""
+    first, last = pd.Timestamp(first), pd.Timestamp(last)
+    if n_slices <= 1 or first == last:
+        return [(first.isoformat(), None)]
+    edges = pd.date_range(first, last, periods=n_slices + 1)
+    return [
+        (edges[i].isoformat(), edges[i + 1].isoformat() if i < n_slices - 1 else None)
+        for i in range(n_slices)
+    ]
+
+
+def _keyset_pages(client, table, select, lo, hi, page_size, order_column, key_column,
+                  after_key=None):
+    """Yield pages of rows with lo <= order_column < hi (hi=None: no upper bound).
+
+    Each page continues after the last (order_column, key_column) seen, so the
+    cost per page stays constant instead of growing with an OFFSET. Only an
+    empty page ends the slice: the server may cap pages below `page_size`
+    (PostgREST's max-rows), so a short page is not proof of the last one.
+    `after_key` keeps only rows whose key_column is greater than it.
+    """
+    last = None
     while True:
-        end = start + page_size - 1
-        print("Rows from", start, "to", end)
+        query = client.table(table).select(select).gte(order_column, lo)
+        if hi is not None:
+            query = query.lt(order_column, hi)
+        if after_key is not None:
+            query = query.gt(key_column, after_key)
+        if last is not None:
+            t, k = last
+            query = query.or_(
+                f'{order_column}.gt."{t}",'
+                f'and({order_column}.eq."{t}",{key_column}.gt.{k})'
+            )
         resp = (
-            client.table(table)
-            .select("*")
-            .range(start, end)
+            query.order(order_column)
+            .order(key_column)
+            .limit(page_size)
             .execute()
         )
         batch = resp.data or []
         if not batch:
-            break
+            return
+        yield batch
+        last = (batch[-1][order_column], batch[-1][key_column])
+
+
+def iter_row_pages(client, table="measures", page_size=1000, columns=None, workers=4,
+                   order_column="measured_at", key_column="id", after_key=None):
+    """Yield pages (lists of row dicts) of `table` using parallel keyset pagination.
+
+    The [min, max] range of `order_column` is split into time slices that are
+    fetched concurrently by at most `workers` threads; within a slice pages are
+    read in (order_column, key_column) order. Pages from different slices are
+    yielded as they arrive, so the overall order is not guaranteed. `columns`
+    projects the select; the two key columns are always included. `after_key`
+    restricts the fetch to rows whose key_column is greater than it, whatever
+    their order_column; the slices then only span the range of those rows.
+    """
+    if columns:
+        columns = list(dict.fromkeys(list(columns) + [order_column, key_column]))
+        select = ",".join(columns)
+    else:
+        select = "*"
+
+    first = _first_value(client, table, order_column, False, key_column, after_key)
+    if first is None:
+        return
+    last = _first_value(client, table, order_column, True, key_column, after_key)
+    if last is None or pd.Timestamp(last) < pd.Timestamp(first):
+        return
+    slices = _time_slices(first, last, max(1, workers) * 4 if workers > 1 else 1)
+
+    if workers <= 1:
+        for lo, hi in slices:
+            yield from _keyset_pages(client, table, select, lo, hi, page_size,
+                                     order_column, key_column, after_key)
+        return
+
+    # Bounded queue: workers block instead of piling pages up in memory when
+    # the consumer is slower than the network.
+    pages = queue.Queue(maxsize=workers * 2)
+    done = object()
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def fetch_slice(lo, hi):
+        try:
+            for batch in _keyset_pages(client, table, select, lo, hi, page_size,
+                                       order_column, key_column, after_key):
+                if not put(batch):
+                    return
+        except Exception as e:
+            put(e)
+        finally:
+            put(done)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for lo, hi in slices:
+            pool.submit(fetch_slice, lo, hi)
+        remaining = len(slices)
+        try:
+            while remaining:
+                item = pages.get()
+                if item is done:
+                    remaining -= 1
+                    continue
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+
+
+def iter_measure_chunks(client, table="measures", page_size=1000, columns=None, workers=4,
+                        chunk_rows=100_000):
+    """Yield DataFrame chunks of roughly `chunk_rows` rows (see iter_row_pages)."""
+    buffered, n = [], 0
+    for batch in iter_row_pages(client, table, page_size, columns, workers):
+        buffered.append(batch)
+        n += len(batch)
+        if n >= chunk_rows:
+            yield pd.DataFrame([row for page in buffered for row in page])
+            buffered, n = [], 0
+    if buffered:
+        yield pd.DataFrame([row for page in buffered for row in page])
+
+
+def fetch_all_rows(client, table="measures", page_size=1000, columns=None, workers=4):
+    all_rows = []
+    for batch in iter_row_pages(client, table, page_size, columns, workers):
         all_rows.extend(batch)
-        start += page_size
+        print("Fetched", len(all_rows), "rows")
     return all_rows
 
 
-def clean_dataframe(all_rows):
+def _to_float(values):
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        # Strings or missing values mixed in: slow path, bad values become NaN
+        return pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=np.float64)
+
+
+def clean_dataframe(all_rows, schema=MEASURE_SCHEMA):
+    """Typed DataFrame from fetched rows (a list of dicts or a DataFrame).
+
+    Each column is built straight from the rows with the dtype in `schema`;
+    timestamps are parsed with a fixed ISO 8601 format. Values the gateway
+    estimated are treated as missing, so models never train on predictions.
+    Missing or unparsable sensor values stay NaN (see complete_rows); only
+    rows missing a non-float column such as id, node or measured_at are dropped.
+    """
     print("Cleaning and parsing data...")
-    df = pd.DataFrame(all_rows)
-    # convert measured_at to integer timestamp (ns)
-    if "measured_at" in df.columns:
-        df["measured_at"] = pd.to_datetime(df["measured_at"], format="mixed").astype("int64")
-    df = df.apply(pd.to_numeric, errors="coerce")
-    df = df.dropna().reset_index(drop=True)
-    print("Finished data cleanup")
+    start = time.perf_counter()
+    if isinstance(all_rows, pd.DataFrame):
+        names = list(all_rows.columns)
+        get = lambda col: all_rows[col].to_numpy()
+    else:
+        names = list(all_rows[0]) if all_rows else []
+        get = lambda col: [row.get(col) for row in all_rows]
+
+    flags = get(ESTIMATED_COLUMN) if ESTIMATED_COLUMN in names else None
+    names = [c for c in names if c != ESTIMATED_COLUMN]
+
+    columns = {}
+    for col in names:
+        if schema.get(col, "").startswith("datetime64"):
+            columns[col] = pd.to_datetime(get(col), format=TIMESTAMP_FORMAT, utc=True,
+                                          errors="coerce")
+        else:
+            columns[col] = _to_float(get(col))
+    if flags is not None:
+        for i, estimated in enumerate(flags):
+            if isinstance(estimated, str):
+                estimated = estimated.split(",") if estimated else []
+            elif not isinstance(estimated, (list, tuple, np.ndarray)):
+                estimated = ()  # null: a row from before the column existed
+            for col in estimated:
+                if col in columns:
+                    columns[col][i] = np.nan
+    df = pd.DataFrame(columns)
+    n_rows = len(df)
+    keys = [c for c in df.columns if not schema.get(c, "float32").startswith("float")]
+    df = df.dropna(subset=keys).reset_index(drop=True)
+    df = df.astype({col: schema.get(col, "float32") for col in df.columns})
+
+    mem = df.memory_usage(deep=True).sum()
+    print(f"Finished data cleanup: {len(df)} rows ({n_rows - len(df)} dropped, "
+          f"{int(df.isna().sum().sum())} missing values), "
+          f"{mem / 2**20:.1f} MiB, {time.perf_counter() - start:.2f} s")
+    return df
+
+
+def complete_rows(df, target, features):
+    """(rows, features) to fit or score the model of `target` on `df`.
+
+    Features without a single value (e.g. a sensor no node has) are left out;
+    `rows` is the boolean mask of rows where the target and every remaining
+    feature are present.
+    """
+    features = [c for c in features if df[c].notna().any()]
+    return df[[target] + features].notna().all(axis=1).to_numpy(), features
+
+
+def numeric_frame(df):
+    """Copy of `df` with datetime columns as int64 nanoseconds, as the models expect."""
+    df = df.copy()
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].dt.tz_localize(None).astype("datetime64[ns]").astype("int64")
     return df
 
 
-def train_and_save_models(df, models_dir="models", sample_frac=None):
+def _peak_rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _reset_peak_rss():
+    """Restart the peak RSS from the current RSS and return it in MiB.
+
+    ru_maxrss is a process-wide high-water mark: a forked worker inherits its
+    parent's and an in-process run keeps every earlier peak. Linux resets it
+    on "5" to /proc/self/clear_refs; elsewhere the old mark stays, and the
+    growth reported against it is a lower bound.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+    return _peak_rss_mb()
+
+
+# Search space of the compact-model mode, from the smallest trees to the largest
+SEARCH_MAX_DEPTH = (6, 10, 14, None)
+SEARCH_MIN_SAMPLES_LEAF = (20, 5, 1)
+SEARCH_MIN_TREES = 25
+SEARCH_MAX_TREES = 2000
+OOB_PLATEAU = 0.01  # stop growing once OOB MSE improves less than 1%
+
+
+def _model_size(model):
+    return len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _predict_latency(model, X, repeats=20):
+    """Median seconds to predict one row, the way the gateway would."""
+    row = X[:1]
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict(row)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def _grow_forest(X, Y, max_depth, min_samples_leaf, tree_jobs, deadline):
+    """Add trees (warm start, doubling) until the OOB error plateaus or time runs out.
+
+    A doubling only starts if its estimated cost (the seconds per tree of the
+    previous fit) still fits before `deadline`. Returns (model, OOB MSE,
+    seconds per tree).
+    """
+    model = RandomForestRegressor(
+        n_estimators=SEARCH_MIN_TREES, max_depth=max_depth, min_samples_leaf=min_samples_leaf,
+        oob_score=True, warm_start=True, n_jobs=tree_jobs, random_state=40,
+    )
+    var = float(np.var(Y))
+    best = None
+    grown = 0
+    while True:
+        start = time.perf_counter()
+        model.fit(X, Y)
+        tree_s = (time.perf_counter() - start) / (model.n_estimators - grown)
+        grown = model.n_estimators
+        oob_mse = (1 - model.oob_score_) * var
+        if best is not None and oob_mse > best * (1 - OOB_PLATEAU):
+            break
+        best = oob_mse
+        n_next = min(grown * 2, SEARCH_MAX_TREES)
+        if grown >= SEARCH_MAX_TREES or time.perf_counter() + tree_s * (n_next - grown) > deadline:
+            break
+        model.set_params(n_estimators=n_next)
+    model.set_params(warm_start=False, n_jobs=None)
+    return model, oob_mse, tree_s
+
+
+def search_model(X, Y, tree_jobs=1, budget_s=300, mse_tolerance=0.05):
+    """Pick a compact forest for X -> Y.
+
+    Each (max_depth, min_samples_leaf) candidate is grown with warm start until
+    its out-of-bag error stops improving, then scored on a validation split for
+    MSE, pickled size and single-row prediction latency. Among the candidates
+    within `mse_tolerance` of the best MSE the smallest one wins (then the
+    fastest). Candidates are tried from cheap to expensive; no fit is started
+    that is not expected to end within `budget_s`, judging by the cost per tree
+    measured so far. The budget includes refitting the winner on all of X: if
+    that would not fit, the winner is returned as fit on the search split.
+    Returns (model, candidates).
+    """
+    deadline = time.perf_counter() + budget_s
+    X_fit, X_val, Y_fit, Y_val = train_test_split(
+        X, Y, test_size=0.2, shuffle=True, random_state=41
+    )
+    candidates = []
+    tree_s = 0.0
+    for max_depth, min_samples_leaf in itertools.product(SEARCH_MAX_DEPTH, SEARCH_MIN_SAMPLES_LEAF):
+        # Candidates only get more expensive: the last cost per tree is a lower bound
+        if candidates and time.perf_counter() + tree_s * SEARCH_MIN_TREES > deadline:
+            break
+        model, oob_mse, tree_s = _grow_forest(X_fit, Y_fit, max_depth, min_samples_leaf,
+                                              tree_jobs, deadline)
+        candidates.append({
+            "model": model,
+            "max_depth": max_depth,
+            "min_samples_leaf": min_samples_leaf,
+            "n_estimators": model.n_estimators,
+            "oob_mse": oob_mse,
+            "val_mse": mean_squared_error(Y_val, model.predict(X_val)),
+            "size_bytes": _model_size(model),
+            "latency_s": _predict_latency(model, X_val),
+            "tree_s": tree_s,
+        })
+
+    best_mse = min(c["val_mse"] for c in candidates)
+    accepted = [c for c in candidates if c["val_mse"] <= best_mse * (1 + mse_tolerance)]
+    chosen = min(accepted, key=lambda c: (c["size_bytes"], c["latency_s"]))
+    model = chosen["model"]
+    refit_s = chosen["tree_s"] * chosen["n_estimators"] * len(X) / len(X_fit)
+    if time.perf_counter() + refit_s <= deadline:
+        # Refit the winner on the whole training split with the same settings
+        model = RandomForestRegressor(
+            n_estimators=chosen["n_estimators"], max_depth=chosen["max_depth"],
+            min_samples_leaf=chosen["min_samples_leaf"], n_jobs=tree_jobs, random_state=40,
+        )
+        model.fit(X, Y)
+        model.set_params(n_jobs=None)
+    else:
+        print(f"Search budget spent: keeping the winner fit on {len(X_fit)} of {len(X)} rows")
+    for c in candidates:
+        del c["model"]
+    return model, candidates
+
+
+def _train_target(task):
+    """Fit, score and save the model of one target column (runs in a pool worker)."""
+    df, model_name, features, pipeline, models_dir, tree_jobs, search, compress = task
+    start = time.perf_counter()
+    rss_start = _reset_peak_rss()
+    rows, features = complete_rows(df, model_name, features)
+    X = df.loc[rows, features]
+    Y = df.loc[rows, model_name]
+
+    X_train, X_test, Y_train, Y_test = train_test_split(
+        X, Y, test_size=0.2, shuffle=True, random_state=40
+    )
+
+    candidates = None
+    if search:
+        model, candidates = search_model(X_train, Y_train, tree_jobs, **search)
+    else:
+        model = RandomForestRegressor(n_estimators=2000, n_jobs=tree_jobs)
+        model.fit(X_train, Y_train)
+
+    preds = model.predict(X_test)
+    mse = mean_squared_error(Y_test, preds)
+
+    out_path = save_model(model, models_dir, model_name, X.columns, len(X_train),
+                          schema=df.dtypes.to_dict(), metrics={"mse": mse}, compress=compress,
+                          pipeline=pipeline)
+    return {
+        "target": model_name,
+        "mse": mse,
+        "path": out_path,
+        "wall_s": time.perf_counter() - start,
+        "peak_rss_mb": _peak_rss_mb() - rss_start,
+        "size_bytes": os.path.getsize(out_path),
+        "latency_s": _predict_latency(model, X_test),
+        "params": {k: model.get_params()[k]
+                   for k in ("n_estimators", "max_depth", "min_samples_leaf")},
+        "candidates": candidates,
+    }
+
+
+def _core_split(n_targets, n_jobs, target_workers=None):
+    """(targets trained at once, tree jobs per target) within a budget of n_jobs cores."""
+    n_jobs = max(1, n_jobs or os.cpu_count() or 1)
+    workers = max(1, min(n_targets, target_workers or n_jobs, n_jobs))
+    return workers, max(1, n_jobs // workers)
+
+
+def train_and_save_models(df, models_dir="models", sample_frac=None, n_jobs=None,
+                          target_workers=None, search=None, compress=DEFAULT_COMPRESS,
+                          pipeline=None):
+    """Train one RandomForestRegressor per column and save it into models_dir.
+
+    Targets run in parallel in a process pool and each forest builds its trees
+    with the cores left over, so the whole run uses at most `n_jobs` cores.
+    The peak RSS reported per target is how far memory grew above the RSS
+    the task started with (the data it received included), so it does not
+    count the parent's memory or the peaks of earlier targets.
+    `search`, a dict of search_model options (budget_s, mse_tolerance), switches
+    from the fixed 2000-tree forest to the compact-model search. Models are
+    written as skiliket.artifacts files. With a skiliket.features pipeline the
+    sensor columns are trained on engineered features instead of raw columns.
+    """
+    df = numeric_frame(df)
+    models = df.columns[1:]  # assume first column is target index or time
+    if pipeline is not None:
+        # Lags need the full time series, so features come before sampling
+        models = [c for c in models if c in pipeline.sensors]
+        df = pipeline.transform(df)
+    empty = [c for c in models if not df[c].notna().any()]
+    if empty:
+        print("Skipping targets without any measured value:", ", ".join(empty))
+        models = [c for c in models if c not in empty]
     # optionally sample to reduce size
     if sample_frac:
         n_sample = max(1, int(len(df) * sample_frac))
@@ -78,32 +547,53 @@ def train_and_save_models(df, models_dir="models", sample_frac=None):
     else:
         df_sample = df
 
-    models = df.columns[1:]  # assume first column is target index or time
-
     os.makedirs(models_dir, exist_ok=True)
 
-    for model_name in models:
-        print("\n-----------------------------------")
-        print(f"Training model for {model_name}...")
-        X = df_sample.drop(columns=[model_name])
-        Y = df_sample[model_name]
+    workers, tree_jobs = _core_split(len(models), n_jobs, target_workers)
+    print(f"Training {len(models)} models: {workers} at a time, {tree_jobs} cores each")
+    config = pipeline.to_dict() if pipeline is not None else None
+    tasks = [
+        (df_sample, name,
+         pipeline.columns_for(name, df.columns) if pipeline is not None
+         else [c for c in df.columns if c != name],
+         config, models_dir, tree_jobs, search, compress)
+        for name in models
+    ]
 
-        X_train, X_test, Y_train, Y_test = train_test_split(
-            X, Y, test_size=0.2, shuffle=True, random_state=40
-        )
-
-        print("Started regression model")
-        model = RandomForestRegressor(n_estimators=2000)
-        model.fit(X_train, Y_train)
-        print("Finished regression model")
-
-        preds = model.predict(X_test)
-        mse = mean_squared_error(Y_test, preds)
-        print("MSE:", mse)
+    start = time.perf_counter()
+    results = []
+    if workers == 1:
+        done = map(_train_target, tasks)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(workers, maxtasksperchild=1)
+        done = pool.imap_unordered(_train_target, tasks)
+    try:
+        for r in done:
+            results.append(r)
+            print("\n-----------------------------------")
+            print(f"Model for {r['target']}")
+            if r["candidates"]:
+                print(f"{'depth':>5} | {'leaf':>4} | {'trees':>5} | {'val MSE':>12} | "
+                      f"{'size (KiB)':>10} | {'1-row ms':>8}")
+                for c in r["candidates"]:
+                    print(f"{str(c['max_depth']):>5} | {c['min_samples_leaf']:>4} | "
+                          f"{c['n_estimators']:>5} | {c['val_mse']:>12.6g} | "
+                          f"{c['size_bytes'] / 1024:>10.0f} | {c['latency_s'] * 1e3:>8.2f}")
+                print("Chosen:", r["params"])
+            print("MSE:", r["mse"])
+            print(f"Model saved as {r['path']} ({r['size_bytes'] / 2**20:.1f} MiB, "
+                  f"{r['latency_s'] * 1e3:.2f} ms per row)")
+            print(f"Wall time: {r['wall_s']:.1f} s, peak RSS: +{r['peak_rss_mb']:.0f} MiB")
+            print("-----------------------------------\n")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
 
-        out_path = os.path.join(models_dir, f"{model_name}.pkl")
-        with open(out_path, "wb") as f:
-            pickle.dump(model, f)
-        print(f"Model saved as {out_path}")
-        print("-----------------------------------\n")
+    print(f"{'Target':<15} | {'Wall (s)':>9} | {'Peak RSS +MiB':>14}")
+    for r in sorted(results, key=lambda r: r["target"]):
+        print(f"{r['target']:<15} | {r['wall_s']:>9.1f} | {r['peak_rss_mb']:>14.0f}")
+    print(f"Total training time: {time.perf_counter() - start:.1f} s")
+    return results
 
@@ -0,0 +1,416 @@
+# local_backend.py
+"""SQLite stand-in for the Supabase (PostgREST) client.
+
+LocalClient serves the subset of the supabase-py query builder this
+repository uses:
+
+    client.schema(s).table(t).select(cols).gte/gt/lt/lte/eq/neq/in_/or_(...)
+          .order(col, desc=...).limit(n) / .range(a, b).execute()
+    client.table(t).insert(rows).execute()
+
+so fetching, pagination, batching and retries can be exercised and
+benchmarked offline and reproducibly. Each (schema, table) is a SQLite table
+created by its first insert, with the columns of that insert plus an `id` key
+like the Postgres serial columns. After that the schema is fixed, as in
+production: inserting an unknown column fails with PostgREST's PGRST204, and
+reading a table that was never created fails with PGRST205. Timestamps are stored in a fixed-width
+UTC form so they sort and compare like timestamptz, and come back as
+PostgREST returns them (`2025-11-15T00:00:00+00:00`). Responses are capped at
+`max_rows` rows, like the hosted project.
+
+`latency_s` (plus up to `jitter_s`) delays every request outside the database
+lock, so concurrent requests overlap as they would over the network, and
+`failure_rate` makes requests fail with ConnectionError before touching the
+data.
+
+Select it with SKILIKET_BACKEND=local; SKILIKET_LOCAL_DB, SKILIKET_LOCAL_LATENCY_S,
+SKILIKET_LOCAL_JITTER_S and SKILIKET_LOCAL_FAILURE_RATE configure it (see
+client_from_env).
+"""
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+BACKEND_ENV = "SKILIKET_BACKEND"
+DEFAULT_DB_PATH = ".skiliket_local.db"
+MAX_ROWS = 1000  # PostgREST max-rows of the hosted project
+KEY_COLUMN = "id"
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_TIMESTAMP = re.compile(r"^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}")
+_OPERATORS = {"eq": "=", "neq": "<>", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+
+class APIError(Exception):
+    """Request rejected by the backend; `code` is a PostgREST or PostgreSQL SQLSTATE code."""
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+def use_local_backend():
+    return os.environ.get(BACKEND_ENV, "").lower() == "local"
+
+
+def client_from_env(schema=None, **overrides):
+    """LocalClient configured from the SKILIKET_LOCAL_* environment variables."""
+    options = {
+        "path": os.environ.get("SKILIKET_LOCAL_DB", DEFAULT_DB_PATH),
+        "latency_s": float(os.environ.get("SKILIKET_LOCAL_LATENCY_S", 0)),
+        "jitter_s": float(os.environ.get("SKILIKET_LOCAL_JITTER_S", 0)),
+        "failure_rate": float(os.environ.get("SKILIKET_LOCAL_FAILURE_RATE", 0)),
+    }
+    options.update(overrides)
+    client = LocalClient(**options)
+    return client.schema(schema) if schema else client
+
+
+def _quote(name):
+    if not _IDENTIFIER.match(name):
+        raise APIError(f"invalid identifier: {name!r}", code="42602")
+    return f'"{name}"'
+
+
+def _to_timestamp(value):
+    """Fixed-width UTC text for an ISO timestamp (naive values are UTC)."""
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    dt = dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.%f+00:00")
+
+
+def _from_timestamp(value):
+    # Drop zero microseconds, as Postgres does
+    return value[:19] + value[26:] if value[19:26] == ".000000" else value
+
+
+def _sql_value(value):
+    if isinstance(value, str) and _TIMESTAMP.match(value):
+        try:
+            return _to_timestamp(value)
+        except ValueError:
+            return value
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def _literal(text):
+    """Value of an unquoted filter operand, typed like PostgREST would cast it."""
+    if text == "null":
+        return None
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return _sql_value(text)
+
+
+class _Database:
+    """Connection, lock and column metadata shared by every client of one file."""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS _columns "
+                          "(tbl TEXT, col TEXT, kind TEXT, PRIMARY KEY (tbl, col))")
+        self.lock = threading.Lock()
+        self.columns = {}   # table -> {column: kind}; kind is "", "json" or "timestamp"
+        self.refresh()
+
+    def refresh(self):
+        # Other processes may share the file and add tables or columns
+        for tbl, col, kind in self.conn.execute("SELECT tbl, col, kind FROM _columns"):
+            self.columns.setdefault(tbl, {})[col] = kind
+
+    def ensure_table(self, table, rows):
+        """Create `table` with the columns of `rows`, or check them against it.
+
+        Caller holds the lock. Columns the existing table lacks raise PGRST204,
+        like PostgREST's schema cache.
+        """
+        if table not in self.columns or any(c not in self.columns[table] for r in rows for c in r):
+            self.refresh()
+        known = self.columns.get(table)
+        if known is not None:
+            unknown = [c for r in rows for c in r if c not in known]
+            if unknown:
+                raise APIError(f"Could not find the '{unknown[0]}' column of "
+                               f"'{table.split('__', 1)[-1]}' in the schema cache",
+                               code="PGRST204")
+            return
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS {_quote(table)} "
+                          f"({_quote(KEY_COLUMN)} INTEGER PRIMARY KEY AUTOINCREMENT)")
+        known = self.columns[table] = {KEY_COLUMN: ""}
+        self._remember(table, KEY_COLUMN, "")
+        for row in rows:
+            for col, value in row.items():
+                if col in known:
+                    continue
+                kind = ("json" if isinstance(value, (list, dict)) else
+                        "timestamp" if isinstance(value, str) and _TIMESTAMP.match(value) else "")
+                self.conn.execute(f"ALTER TABLE {_quote(table)} ADD COLUMN {_quote(col)}")
+                known[col] = kind
+                self._remember(table, col, kind)
+
+    def _remember(self, table, col, kind):
+        self.conn.execute("INSERT OR REPLACE INTO _columns VALUES (?, ?, ?)", (table, col, kind))
+
+
+class LocalClient:
+    """Drop-in for the supabase-py client, backed by a SQLite file."""
+
+    def __init__(self, path=DEFAULT_DB_PATH, latency_s=0.0, jitter_s=0.0, failure_rate=0.0,
+                 seed=None, max_rows=MAX_ROWS, schema_name="public", _shared=None):
+        self.path = path
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self.failure_rate = failure_rate
+        self.max_rows = max_rows
+        self.schema_name = schema_name
+        if _shared is None:
+            _shared = SimpleNamespace(db=_Database(path), rng=random.Random(seed),
+                                      stats={"requests": 0, "failures": 0,
+                                             "rows_read": 0, "rows_written": 0})
+        self._shared = _shared
+
+    @property
+    def stats(self):
+        """Request, injected-failure and row counters (shared across schemas)."""
+        return self._shared.stats
+
+    def schema(self, name):
+        return LocalClient(self.path, self.latency_s, self.jitter_s, self.failure_rate,
+                           max_rows=self.max_rows, schema_name=name, _shared=self._shared)
+
+    def table(self, name):
+        return LocalQuery(self, f"{self.schema_name}__{name}")
+
+    from_ = table
+
+    def row_counts(self):
+        """{"schema.table": rows} of every table in the database."""
+        db = self._shared.db
+        with db.lock:
+            return {tbl.replace("__", ".", 1): db.conn.execute(
+                        f"SELECT COUNT(*) FROM {_quote(tbl)}").fetchone()[0]
+                    for tbl in db.columns}
+
+    def _request(self):
+        """Injected latency and failures of one request."""
+        shared = self._shared
+        with shared.db.lock:
+            shared.stats["requests"] += 1
+            delay = self.latency_s + (shared.rng.uniform(0, self.jitter_s) if self.jitter_s else 0)
+            failed = self.failure_rate and shared.rng.random() < self.failure_rate
+            if failed:
+                shared.stats["failures"] += 1
+        if delay:
+            time.sleep(delay)
+        if failed:
+            raise ConnectionError("injected failure (local backend)")
+
+
+class LocalQuery:
+    """One request, built with the same chained calls as postgrest-py."""
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self._columns = "*"
+        self._count = None
+        self._rows = None
+        self._where = []
+        self._params = []
+        self._order = []
+        self._limit = None
+        self._offset = 0
+
+    # --- request type ---
+    def select(self, columns="*", count=None):
+        self._columns = columns
+        self._count = count
+        return self
+
+    def insert(self, rows, **kwargs):
+        self._rows = rows if isinstance(rows, list) else [rows]
+        return self
+
+    # --- filters ---
+    def _filter(self, column, op, value):
+        if op == "in":
+            values = [_sql_value(v) for v in value]
+            self._where.append(f"{_quote(column)} IN ({', '.join('?' * len(values))})")
+            self._params += values
+        elif op == "is":
+            self._where.append(f"{_quote(column)} IS {'NULL' if value is None else '?'}")
+            self._params += [] if value is None else [int(value)]
+        else:
+            self._where.append(f"{_quote(column)} {_OPERATORS[op]} ?")
+            self._params.append(_sql_value(value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, "eq", value)
+
+    def neq(self, column, value):
+        return self._filter(column, "neq", value)
+
+    def gt(self, column, value):
+        return self._filter(column, "gt", value)
+
+    def gte(self, column, value):
+        return self._filter(column, "gte", value)
+
+    def lt(self, column, value):
+        return self._filter(column, "lt", value)
+
+    def lte(self, column, value):
+        return self._filter(column, "lte", value)
+
+    def in_(self, column, values):
+        return self._filter(column, "in", list(values))
+
+    def is_(self, column, value):
+        return self._filter(column, "is", value)
+
+    def or_(self, filters):
+        """PostgREST logic tree, e.g. 'a.gt."x",and(a.eq."x",id.gt.5)'."""
+        sql, params, _ = _parse_conditions(filters, 0, "OR")
+        self._where.append(sql)
+        self._params += params
+        return self
+
+    # --- modifiers ---
+    def order(self, column, desc=False, **kwargs):
+        self._order.append(f"{_quote(column)} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def range(self, start, end):
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    # --- execution ---
+    def execute(self):
+        self.client._request()
+        db = self.client._shared.db
+        with db.lock:
+            if self._rows is not None:
+                return self._insert(db)
+            return self._select(db)
+
+    def _insert(self, db):
+        db.ensure_table(self.table, self._rows)
+        kinds = db.columns[self.table]
+        inserted = []
+        db.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for row in self._rows:
+                cols = list(row)
+                values = [json.dumps(v) if kinds[c] == "json" and v is not None else _sql_value(v)
+                          for c, v in row.items()]
+                cur = db.conn.execute(
+                    f"INSERT INTO {_quote(self.table)} ({', '.join(map(_quote, cols))}) "
+                    f"VALUES ({', '.join('?' * len(cols))})", values)
+                # Returned as stored, like PostgREST's return=representation
+                inserted.append({KEY_COLUMN: cur.lastrowid, **{
+                    c: _from_timestamp(s) if kinds[c] == "timestamp" and isinstance(s, str) else v
+                    for (c, v), s in zip(row.items(), values)}})
+            db.conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            db.conn.execute("ROLLBACK")
+            raise APIError(str(e), code="23000" if isinstance(e, sqlite3.IntegrityError) else None)
+        self.client._shared.stats["rows_written"] += len(inserted)
+        return SimpleNamespace(data=inserted, count=None)
+
+    def _select(self, db):
+        if self.table not in db.columns:
+            db.refresh()
+        kinds = db.columns.get(self.table)
+        if kinds is None:
+            raise APIError(f"Could not find the table '{self.table.replace('__', '.', 1)}' "
+                           f"in the schema cache", code="PGRST205")
+        columns = list(kinds) if self._columns.strip() == "*" else \
+            [c.strip() for c in self._columns.split(",") if c.strip()]
+        where = f" WHERE {' AND '.join(self._where)}" if self._where else ""
+        order = f" ORDER BY {', '.join(self._order)}" if self._order else ""
+        limit = min(self._limit, self.client.max_rows) if self._limit is not None \
+            else self.client.max_rows
+        try:
+            cur = db.conn.execute(
+                f"SELECT {', '.join(map(_quote, columns))} FROM {_quote(self.table)}"
+                f"{where}{order} LIMIT ? OFFSET ?", self._params + [limit, self._offset])
+            rows = cur.fetchall()
+            count = db.conn.execute(f"SELECT COUNT(*) FROM {_quote(self.table)}{where}",
+                                    self._params).fetchone()[0] if self._count else None
+        except sqlite3.OperationalError as e:
+            raise APIError(str(e), code="42703" if "no such column" in str(e) else None)
+
+        decoders = [json.loads if kinds.get(c) == "json" else
+                    _from_timestamp if kinds.get(c) == "timestamp" else None for c in columns]
+        data = [{c: (d(v) if d and v is not None else v) for c, d, v in zip(columns, decoders, row)}
+                for row in rows]
+        self.client._shared.stats["rows_read"] += len(data)
+        return SimpleNamespace(data=data, count=count)
+
+
+def _parse_conditions(text, i, joiner):
+    """Parse comma-separated conditions from text[i:] up to ')' or the end.
+
+    Returns (sql, params, next index).
+    """
+    parts, params = [], []
+    while i < len(text):
+        if text[i] == ")":
+            i += 1
+            break
+        if text[i] == ",":
+            i += 1
+            continue
+        group = re.match(r"(and|or)\(", text[i:])
+        if group:
+            sql, sub_params, i = _parse_conditions(text, i + len(group.group(0)),
+                                                   group.group(1).upper())
+            parts.append(f"({sql})")
+            params += sub_params
+            continue
+        m = re.match(r"([A-Za-z_][A-Za-z0-9_]*)\.(eq|neq|gt|gte|lt|lte|is|in)\.", text[i:])
+        if not m:
+            raise APIError(f"unsupported filter: {text[i:]!r}", code="PGRST100")
+        column, op = m.groups()
+        i += len(m.group(0))
+        if op == "in":
+            end = text.index(")", i)
+            values = [_literal(v.strip('"')) for v in text[i + 1:end].split(",")]
+            parts.append(f"{_quote(column)} IN ({', '.join('?' * len(values))})")
+            params += values
+            i = end + 1
+            continue
+        if text[i] == '"':
+            end = text.index('"', i + 1)
+            value, i = _sql_value(text[i + 1:end]), end + 1
+        else:
+            end = re.search(r"[,)]|$", text[i:]).start() + i
+            value, i = _literal(text[i:end]), end
+        if op == "is":
+            parts.append(f"{_quote(column)} IS NULL" if value is None else
+                         f"{_quote(column)} IS ?")
+            params += [] if value is None else [value]
+        else:
+            parts.append(f"{_quote(column)} {_OPERATORS[op]} ?")
+            params.append(value)
+    return f" {joiner} ".join(parts), params, i
@@ -1,33 +1,22 @@
-import os
-import pickle
-import argparse
-import numpy as np
-import pandas as pd
-from sklearn.metrics import mean_squared_error
 import warnings
 warnings.filterwarnings("ignore", message="X does not have valid feature names")
 
 
 import skiliket.func as sk
+import skiliket.cache as skc
+import skiliket.artifacts as skart
+import skiliket.evaluation as skev
 
 MODELS_DIR = "models"
 
 
-def load_model(path):
-    with open(path, "rb") as f:
-        return pickle.load(f)
+def load_model(models_dir, target):
+    return skart.load_model(models_dir, target)
 
 
 def test_model(model, df, target_column):
-    X = df.drop(columns=[target_column])
-    y_true = df[target_column]
-
-    preds = model.predict(X)
-
-    mse = mean_squared_error(y_true, preds)
-    mae = np.mean(np.abs(y_true - preds))
-
-    return mse, mae
+    result = skev.evaluate_model(model, skev.EvaluationData(df), target_column)
+    return result["mse"], result["mae"]
 
 
 def main(argv=None):
@@ -42,9 +31,10 @@ def main(argv=None):
 
     # --- fetch rows ---
     print("Fetching data...")
-    rows = sk.fetch_all_rows(client, table="measures")
+    rows = skc.load_measures(client, schema, table="measures", workers=args.fetch_workers,
+                             cache_dir=None if args.no_cache else args.cache_dir)
 
-    if not rows:
+    if rows.empty:
         print("No rows found in table 'measures'. Exiting.")
         return
 
@@ -54,58 +44,71 @@ def main(argv=None):
 
     # --- test each model ---
     print("\n=== Testing stored models ===")
-    for fname in os.listdir(f"{schema}_{MODELS_DIR}"):
-        if not fname.endswith(".pkl") or fname.startswith(".") or fname.startswith("measured_at"):
+    models_dir = f"{schema}_{MODELS_DIR}"
+    models = {}
+    for target_name in skart.list_models(models_dir):
+        if target_name.startswith("measured_at"):
             continue
 
-        target_name = fname[:-4]  # remove .pkl
-        model_path = os.path.join(f"{schema}_{MODELS_DIR}", fname)
-
         if target_name not in df.columns:
-            print(f"[SKIP] Model {fname}: column '{target_name}' not in dataframe")
+            print(f"[SKIP] Model {target_name}: column '{target_name}' not in dataframe")
             continue
 
-        print(f"\n--- Model: {target_name} ---")
-        model = load_model(model_path)
+        models[target_name] = load_model(models_dir, target_name)
+
+    # Models trained with --features share one pipeline: build its columns once
+    pipeline = next((m.pipeline for m in models.values() if m.pipeline), None)
+    if pipeline is not None:
+        df = pipeline.transform(df)
 
-        mse, mae = test_model(model, df, target_name)
+    report = skev.evaluate_models(models, df, workers=args.jobs)
+    report["schema"] = schema
 
-        print(f"MSE: {mse:.6f}")
-        print(f"MAE: {mae:.6f}")
+    for target_name, r in report["models"].items():
+        print(f"\n--- Model: {target_name} ---")
+        print(f"MSE: {r['mse']:.6f}")
+        print(f"MAE: {r['mae']:.6f}")
+        if r["r2"] is not None:
+            print(f"R2:  {r['r2']:.4f}")
+        t = r["timings_s"]
+        print(f"Load {t['load']:.3f} s, predict {len(df)} rows {t['predict']:.3f} s")
 
         # --- Demonstration of predictions on sample inputs ---
         print("\nSample predictions:")
 
-        # Pick 5 evenly spaced rows to show variety
-        sample_indices = np.linspace(0, len(df) - 1, 5, dtype=int)
-
-        # Collect table rows
-        table_rows = []
-
-        for idx in sample_indices:
-            row = df.iloc[idx]
-
-            X_input = row.drop(labels=[target_name])
-            real_value = row[target_name]
-            pred_value = model.predict([X_input.to_numpy()])[0]  # ensure no feature-name warning
-
-            table_rows.append({
-                "index": idx,
-                "pred": pred_value,
-                "real": real_value,
-            })
-
         # Pretty print table
         print("\n" + "-" * 46)
         print(f"{'Row':<6} | {'Predicted':<15} | {'Real':<15}")
         print("-" * 46)
 
-        for r in table_rows:
-            print(f"{r['index']:<6} | {r['pred']:<15.4f} | {r['real']:<15.4f}")
+        for row in r["samples"]:
+            print(f"{row['row']:<6} | {row['pred']:<15.4f} | {row['real']:<15.4f}")
 
         print("-" * 46)
 
-
+    if args.walk_forward:
+        print(f"\n=== Walk-forward evaluation ({args.folds} x {args.test_window}) ===")
+        wf = skev.walk_forward(
+            df, list(models), n_folds=args.folds, test_window=args.test_window,
+            train_window=args.train_window, n_jobs=args.jobs,
+            features={t: m.features for t, m in models.items()},
+            params={t: m.metadata.get("params") for t, m in models.items()},
+        )
+        report["walk_forward"] = wf
+        # The batch total above was taken before the walk-forward refits
+        report["timings_s"]["walk_forward"] = wf["timings_s"]["total"]
+        report["timings_s"]["total"] += wf["timings_s"]["total"]
+        for target_name, r in wf["models"].items():
+            print(f"\n--- Model: {target_name} ---")
+            print(f"{'Fold':<5} | {'Test from':<25} | {'Train rows':>10} | {'MSE':>12} | {'MAE':>10}")
+            for f in r["folds"]:
+                print(f"{f['fold']:<5} | {f['test_start']:<25} | {f['train_rows']:>10} | "
+                      f"{f['mse']:>12.6f} | {f['mae']:>10.6f}")
+            if r["pooled"]:
+                print(f"Pooled MSE: {r['pooled']['mse']:.6f}  MAE: {r['pooled']['mae']:.6f}")
+
+    report_path = skev.write_report(report, args.report or f"{schema}_evaluation.json")
+    print(f"\nReport written to {report_path} ({report['timings_s']['total']:.2f} s)")
     print("\nDone.")
 
 
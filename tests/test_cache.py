@@ -0,0 +1,28 @@
+"""Parquet cache: parts written before and after a column was added."""
+import os
+
+import numpy as np
+
+from skiliket import cache
+from skiliket.func import clean_dataframe
+
+
+def _row(id_, day, uv, **extra):
+    return dict({"id": id_, "node": 1, "temperature": 20.0, "humidity": 50.0, "co2": 400.0,
+                 "noise": 40.0, "uv": uv, "measured_at": f"2025-01-0{day}T00:00:00+00:00"},
+                **extra)
+
+
+def test_load_keeps_columns_missing_from_old_partitions(tmp_path):
+    path = cache.table_dir(str(tmp_path), "s")
+    os.makedirs(path)
+    # An old partition from before `estimated` existed, then a newer one with it
+    cache._write_parts(path, cache._typed([_row(1, 1, 1.0)]))
+    cache._write_parts(path, cache._typed([_row(2, 2, 3.0, estimated=["uv"])]))
+
+    df = cache.load("s", cache_dir=str(tmp_path))
+    assert list(df["estimated"]) == ["", "uv"]
+
+    clean = clean_dataframe(df)
+    assert clean.loc[0, "uv"] == 1.0
+    assert np.isnan(clean.loc[1, "uv"])  # the estimate never reaches training
@@ -0,0 +1,75 @@
+"""Subidor ante errores de la API que no se arreglan reintentando."""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                "firmware"))
+from envio import ColaPersistente, Subidor  # noqa: E402
+
+
+class ErrorAPI(Exception):
+    def __init__(self, code):
+        super().__init__(f"error {code}")
+        self.code = code
+
+
+class ClienteFalso:
+    def __init__(self, *errores):
+        self.errores = list(errores)
+        self.insertadas = []
+
+    def table(self, tabla):
+        return self
+
+    def insert(self, filas):
+        self._filas = filas
+        return self
+
+    def execute(self):
+        if self.errores:
+            raise ErrorAPI(self.errores.pop(0))
+        self.insertadas.extend(self._filas)
+
+
+def _subidor(tmp_path, cliente):
+    subidor = Subidor(cliente, ColaPersistente(str(tmp_path / "cola.db")),
+                      columnas_opcionales=("estimated",))
+    for i in range(3):
+        subidor.enviar("measures", {"node": 1, "temperature": 20.0 + i, "estimated": []})
+    return subidor
+
+
+def _lote(subidor):
+    return subidor._subir(*subidor.cola.siguiente_lote(10))
+
+
+def test_tabla_inexistente_conserva_las_filas(tmp_path):
+    for codigo in ("PGRST205", "42P01"):
+        cliente = ClienteFalso(codigo, codigo)
+        os.makedirs(tmp_path / codigo)
+        subidor = _subidor(tmp_path / codigo, cliente)
+        assert _lote(subidor) is False  # espera exponencial, sin descartar
+        assert _lote(subidor) is False
+        assert subidor.cola.pendientes() == 3 and subidor.descartadas == 0
+        assert _lote(subidor) is True  # la tabla ya existe
+        assert len(cliente.insertadas) == 3 and subidor.cola.pendientes() == 0
+
+
+def test_columna_desconocida_se_omite_y_luego_se_descarta(tmp_path):
+    cliente = ClienteFalso("PGRST204", "PGRST204")
+    subidor = _subidor(tmp_path, cliente)
+    assert _lote(subidor) is True  # se deja de enviar `estimated`
+    assert subidor.columnas_omitidas == {"estimated"} and subidor.cola.pendientes() == 3
+    assert _lote(subidor) is True  # otra columna desconocida: sin arreglo posible
+    assert subidor.descartadas == 3 and subidor.cola.pendientes() == 0
+
+
+def test_tabla_sin_columna_opcional_en_el_backend_local(tmp_path):
+    from skiliket.local_backend import LocalClient
+
+    cliente = LocalClient(str(tmp_path / "db.sqlite"))
+    cliente.table("measures").insert([{"node": 1, "temperature": 19.0}]).execute()
+    subidor = _subidor(tmp_path, cliente)
+    assert _lote(subidor) is True and _lote(subidor) is True
+    assert subidor.columnas_omitidas == {"estimated"} and subidor.descartadas == 0
+    assert cliente.row_counts() == {"public.measures": 4}
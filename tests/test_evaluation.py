@@ -0,0 +1,71 @@
+"""Evaluation on one shared matrix: rows with missing values per model."""
+import numpy as np
+import pandas as pd
+
+from skiliket import evaluation as skev
+
+
+class Media:
+    """Stand-in model: predicts the sum of its features."""
+
+    def __init__(self, features):
+        self.features = features
+        self.seen = None
+
+    def predict(self, X):
+        self.seen = X
+        return X.sum(axis=1).astype(np.float64)
+
+
+def _frame():
+    return pd.DataFrame({
+        "node": [1, 1, 2, 2, 2],
+        "temperature": [20.0, np.nan, 22.0, 23.0, 24.0],
+        "humidity": [50.0, 51.0, np.nan, 53.0, 54.0],
+        "co2": [400.0, 410.0, 420.0, np.nan, 440.0],
+    })
+
+
+def test_each_model_gets_only_its_complete_rows_and_columns():
+    data = skev.EvaluationData(_frame())
+    model = Media(["temperature", "humidity"])
+    result = skev.evaluate_model(model, data, "co2")
+
+    # Rows 1-3 each lack the target or a feature
+    assert model.seen.dtype == np.float32
+    assert model.seen.flags.c_contiguous
+    np.testing.assert_array_equal(model.seen, [[20.0, 50.0], [24.0, 54.0]])
+    assert result["skipped_rows"] == 3
+    assert [s["row"] for s in result["samples"]] == [0, 4]
+    assert not np.shares_memory(model.seen, data.matrix)
+    assert data.target("co2", [0, 4]).dtype == np.float64
+
+
+def test_walk_forward_folds_are_views_of_one_copy_per_target(monkeypatch):
+    n = 24 * 8
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "node": 1,
+        "measured_at": pd.date_range("2025-01-01", periods=n, freq="h", tz="UTC"),
+        "temperature": rng.normal(20, 2, n),
+        "humidity": rng.normal(50, 5, n),
+    })
+    df.loc[::5, "humidity"] = np.nan
+    bases, fits = [], []
+
+    class Forest(skev.RandomForestRegressor):
+        def fit(self, X, y):
+            fits.append(len(X))
+            bases.append(X.base)
+            return super().fit(X, y)
+
+    monkeypatch.setattr(skev, "RandomForestRegressor", Forest)
+    report = skev.walk_forward(df, ["temperature"], n_folds=3, test_window="1D",
+                               params={"temperature": {"n_estimators": 5}})
+
+    folds = report["models"]["temperature"]["folds"]
+    assert len(folds) == report["n_folds"] == 3
+    assert fits == [f["train_rows"] for f in folds] and fits[0] < fits[1] < fits[2]
+    # Every training set is a slice of the same per-target copy
+    assert bases[0] is not None and all(b is bases[0] for b in bases)
+    assert fits[-1] == 7 * 24 - len(range(0, 7 * 24, 5))
@@ -0,0 +1,20 @@
+"""LocalClient errors match what PostgREST returns for the hosted project."""
+import pytest
+
+from skiliket.local_backend import APIError, LocalClient
+
+
+def test_schema_is_fixed_by_the_first_insert(tmp_path):
+    client = LocalClient(str(tmp_path / "db.sqlite")).schema("s")
+    with pytest.raises(APIError) as missing:
+        client.table("measures").select("*").execute()
+    assert missing.value.code == "PGRST205"
+
+    client.table("measures").insert([{"node": 1, "temperature": 20.0}]).execute()
+    with pytest.raises(APIError) as unknown:
+        client.table("measures").insert(
+            [{"node": 1, "temperature": 21.0}, {"node": 2, "estimated": ["uv"]}]).execute()
+    assert unknown.value.code == "PGRST204"
+
+    rows = client.table("measures").select("*").execute().data
+    assert rows == [{"id": 1, "node": 1, "temperature": 20.0}]  # nothing was written
@@ -0,0 +1,43 @@
+"""Escrituras de la LCD con lecturas que no cambian."""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                "firmware"))
+from pantalla import PantallaLCD  # noqa: E402
+
+
+class LCDFalsa:
+    def __init__(self):
+        self.cursor_pos = (0, 0)
+        self.escrituras = 0
+        self.caracteres = 0
+
+    def write_string(self, texto):
+        self.escrituras += 1
+        self.caracteres += len(texto)
+
+
+PAGINAS = [
+    ("T:21.5C H: 54%", "Ruido:  38 dB"),
+    ("CO2:  420 ppm", "TVOC:  12 AQI:1"),
+    ("Movimiento: NO", "Nivel Ruido:OK"),
+]
+
+
+def test_lecturas_sin_cambios_solo_escriben_al_rotar():
+    lcd = LCDFalsa()
+    pantalla = PantallaLCD(lcd, periodo_pagina=6.0, periodo_refresco=1.0)
+    por_segundo = []
+    # 60 s de refrescos a 1 Hz con las mismas lecturas
+    for segundo in range(60):
+        antes = lcd.caracteres
+        pantalla.paso(PAGINAS, float(segundo))
+        por_segundo.append(lcd.caracteres - antes)
+
+    rotaciones = [s for s in range(1, 60) if s % 6 == 0]
+    assert por_segundo[0] == 32  # primera página completa
+    assert all(por_segundo[s] == 0 for s in range(1, 60) if s not in rotaciones)
+    assert all(por_segundo[s] > 0 for s in rotaciones)
+    assert lcd.caracteres == sum(por_segundo) <= 32 * (1 + len(rotaciones))
+    assert lcd.caracteres / 60 < 6
@@ -0,0 +1,46 @@
+"""--resume without a progress file, against the local SQLite backend."""
+import collections
+import sqlite3
+from datetime import datetime
+
+import generate_simulation as gs
+from skiliket.local_backend import LocalClient
+
+NODES = [{"id": i, "lat": 20.6, "lon": -103.4, "name": f"n{i}"} for i in range(1, 4)]
+RUN = dict(schema="synthetic", start=datetime(2025, 11, 15), days=2, step_minutes=5, seed=7,
+           workers=3)
+
+
+def _rows(db):
+    return db.execute("SELECT node, measured_at, temperature FROM synthetic__measures "
+                      "WHERE measured_at < '2025-11-17' ORDER BY measured_at, node").fetchall()
+
+
+def test_resume_fills_gaps_and_ignores_rows_outside_the_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(gs, "BATCH_SIZE", 30)  # 10 time steps per batch
+    client = LocalClient(str(tmp_path / "db.sqlite"))
+    gs.generate_and_insert(client, NODES, progress_path=str(tmp_path / "first.json"), **RUN)
+    db = sqlite3.connect(str(tmp_path / "db.sqlite"))
+    expected = _rows(db)
+
+    # The run died with batch 36 lost while 37-38 committed; a later row of
+    # the same node (real data, another run) lies outside the run's window
+    times = [r[0] for r in db.execute(
+        "SELECT DISTINCT measured_at FROM synthetic__measures ORDER BY 1")]
+    gap = times[360:370]
+    db.execute(f"DELETE FROM synthetic__measures WHERE measured_at IN "
+               f"({','.join('?' * len(gap))})", gap)
+    db.execute("DELETE FROM synthetic__measures WHERE measured_at >= ?", (times[390],))
+    db.commit()
+    committed = len(_rows(db))
+    client.schema("synthetic").table("measures").insert(
+        [{"node": 1, "temperature": 1.0, "measured_at": "2026-09-22T06:00:00"}]).execute()
+
+    inserted = gs.generate_and_insert(client, NODES, resume=True,
+                                      progress_path=str(tmp_path / "missing.json"), **RUN)
+
+    rows = _rows(db)
+    assert inserted == len(expected) - committed
+    assert rows == expected
+    per_step = collections.Counter(r[1] for r in rows)
+    assert set(per_step.values()) == {len(NODES)}